@@ -1,25 +1,63 @@
 from aiogram import Bot, Dispatcher
-from config import BOT_TOKEN
+from config import BOT_TOKEN, BOT_MODE, HANDLER_CONCURRENCY, WEBAPP_HOST, WEBAPP_PORT
+from utils.logging_setup import setup_logging
+
+# До импорта модулей, которые пишут в лог при загрузке (миграции БД и т.п.)
+setup_logging()
+
 from handlers.user_form import router as user_router
 from handlers.admin import router as admin_router
+from database import async_db
+from database.backup import backup_scheduler
+from utils.reports import report_jobs
+from utils.photos import photo_ingestor
+from utils.fsm_storage import create_fsm_storage
+from utils.metrics import setup_metrics, metrics_server
+from utils.replies import setup_replies
+from utils.sender import rate_limiter
+from utils.broadcast import broadcaster
 import asyncio
 import logging
 
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 
 bot = Bot(token=BOT_TOKEN)
+# Все исходящие запросы проходят через лимитер под ограничения Telegram
+bot.session.middleware(rate_limiter)
 
-dp = Dispatcher()
+# Состояния анкеты хранятся вне процесса и переживают перезапуск
+dp = Dispatcher(storage=create_fsm_storage())
 
 
 dp.include_router(admin_router)
 dp.include_router(user_router)
+setup_metrics(dp, [admin_router, user_router])
+setup_replies(admin_router, user_router)
+
+dp.startup.register(backup_scheduler.start)
+dp.startup.register(broadcaster.resume)
+dp.shutdown.register(backup_scheduler.stop)
+dp.shutdown.register(broadcaster.shutdown)
+dp.shutdown.register(photo_ingestor.shutdown)
+dp.shutdown.register(report_jobs.shutdown)
+dp.shutdown.register(async_db.shutdown)
 
 async def main():
-    await dp.start_polling(bot)
+    dp.startup.register(metrics_server.start)
+    dp.shutdown.register(metrics_server.stop)
+    await dp.start_polling(bot, tasks_concurrency_limit=HANDLER_CONCURRENCY)
+
+def run_webhook():
+    from aiohttp import web
+    from utils.webhook import build_webhook_app, set_webhook
+
+    dp.startup.register(set_webhook)
+    web.run_app(build_webhook_app(dp, bot), host=WEBAPP_HOST, port=WEBAPP_PORT)
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    if BOT_MODE == 'webhook':
+        run_webhook()
+    else:
+        asyncio.run(main())
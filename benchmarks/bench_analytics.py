@@ -0,0 +1,93 @@
+"""Бенчмарк сводной аналитики (лист «Сводка») на больших таблицах.
+
+Запуск из корня проекта:
+    python benchmarks/bench_analytics.py [--sizes 100000 1000000]
+
+Для каждого размера создаётся временная БД с синтетическими заявками и
+замеряется build_summary(): чтение колонок и расчёт агрегатов. Для
+сравнения — те же агрегаты через ORM-объекты и цикл по каждой записи.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TYPES = ['Школа', 'Техникум / Колледж', 'Университет']
+DISTRICTS = ['Юнусабадский', 'Чиланзарский', 'Мирзо-Улугбекский', 'Сергелийский', 'Яккасарайский']
+
+
+def fill(db, size: int):
+    now = datetime.utcnow()
+    rows = [
+        {
+            'telegram_id': random.randint(1, size // 3 + 1),
+            'institution_type': random.choice(TYPES),
+            'institution_name': f'Школа №{i}',
+            'address': f'{random.choice(DISTRICTS)} район, ул. {random.randint(1, 500)}, дом {random.randint(1, 90)}',
+            'photo_path': 'photos/x.jpg' if random.random() < 0.7 else None,
+            'created_at': now - timedelta(minutes=random.randint(0, 60 * 24 * 365)),
+        }
+        for i in range(size)
+    ]
+    with db.engine.begin() as conn:
+        conn.execute(db.UserData.__table__.insert(), rows)
+
+
+def orm_loop(db, extract_district):
+    by_type, by_district, by_day, submitters = Counter(), Counter(), Counter(), Counter()
+    photos = 0
+    for record in db.iter_all_data(batch_size=5000):
+        by_type[record.institution_type] += 1
+        by_district[extract_district(record.address or '')] += 1
+        by_day[record.created_at.date()] += 1
+        submitters[record.telegram_id] += 1
+        photos += bool(record.photo_path)
+    return photos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--skip-orm', action='store_true', help="не замерять ORM-цикл (он медленный)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ses_bench_')
+    os.environ['DB_PATH'] = os.path.join(workdir, 'bench.db')
+    os.chdir(workdir)
+
+    import logging
+    logging.disable(logging.INFO)
+    from database import db
+    from utils import analytics
+
+    print(f"backend: {'numpy' if analytics.np is not None else 'array + Counter'}")
+    print(f"{'rows':>10} | {'load, s':>8} | {'compute, s':>10} | {'ORM loop, s':>11}")
+    loaded = 0
+    for size in sorted(args.sizes):
+        fill(db, size - loaded)
+        loaded = size
+
+        started = time.perf_counter()
+        columns = analytics.load_columns()
+        load_time = time.perf_counter() - started
+        started = time.perf_counter()
+        analytics.compute(columns)
+        compute_time = time.perf_counter() - started
+
+        orm_time = '-'
+        if not args.skip_orm:
+            started = time.perf_counter()
+            orm_loop(db, analytics.extract_district)
+            orm_time = f"{time.perf_counter() - started:.2f}"
+
+        print(f"{size:>10} | {load_time:>8.2f} | {compute_time:>10.2f} | {orm_time:>11}")
+
+
+if __name__ == '__main__':
+    main()
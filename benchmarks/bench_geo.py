@@ -0,0 +1,92 @@
+"""Бенчмарк поиска учреждений по координатам от размера таблицы.
+
+Запуск из корня проекта:
+    python benchmarks/bench_geo.py [--sizes 1000 10000 100000] [--lookups 500]
+
+Для каждого размера создаётся временная БД со случайными точками в
+прямоугольнике размером с Ташкентскую область и замеряется:
+- find_nearby() по R*Tree-индексу против полного перебора с гаверсинусом;
+- find_duplicate_locations() (самосоединение индекса).
+С индексом время поиска соседей почти не растёт с размером таблицы.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LAT_RANGE = (40.8, 41.6)
+LON_RANGE = (68.8, 70.2)
+
+
+def fill(db, size: int):
+    rows = [
+        {
+            'telegram_id': random.randint(1, size * 10),
+            'institution_name': f'Школа №{i}',
+            'latitude': random.uniform(*LAT_RANGE),
+            'longitude': random.uniform(*LON_RANGE),
+        }
+        for i in range(size)
+    ]
+    with db.engine.begin() as conn:
+        conn.execute(db.UserData.__table__.insert(), rows)
+
+
+def random_points(count: int) -> list[tuple[float, float]]:
+    return [(random.uniform(*LAT_RANGE), random.uniform(*LON_RANGE)) for _ in range(count)]
+
+
+def measure_index(db, points, radius_m: float) -> float:
+    started = time.perf_counter()
+    for lat, lon in points:
+        db.find_nearby(lat, lon, radius_m)
+    return (time.perf_counter() - started) / len(points) * 1e3
+
+
+def measure_scan(db, points, radius_m: float) -> float:
+    from utils.geo import haversine_m
+
+    started = time.perf_counter()
+    for lat, lon in points:
+        with db.engine.connect() as conn:
+            rows = conn.exec_driver_sql("SELECT id, latitude, longitude FROM user_data").all()
+        [row for row in rows if haversine_m(lat, lon, row[1], row[2]) <= radius_m]
+    return (time.perf_counter() - started) / len(points) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--lookups', type=int, default=500)
+    parser.add_argument('--radius', type=float, default=1000, help="радиус поиска, м")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ses_bench_')
+    os.environ['DB_PATH'] = os.path.join(workdir, 'bench.db')
+    os.chdir(workdir)
+
+    import logging
+    logging.disable(logging.INFO)
+    from database import db
+
+    print(f"{'rows':>10} | {'R*Tree, ms':>10} | {'full scan, ms':>13} | {'duplicates <50 m, s':>19}")
+    loaded = 0
+    for size in sorted(args.sizes):
+        fill(db, size - loaded)
+        loaded = size
+
+        with_index = measure_index(db, random_points(args.lookups), args.radius)
+        full_scan = measure_scan(db, random_points(max(args.lookups // 50, 5)), args.radius)
+        started = time.perf_counter()
+        pairs = len(db.find_duplicate_locations(50))
+        duplicates = time.perf_counter() - started
+
+        print(f"{size:>10} | {with_index:>10.2f} | {full_scan:>13.2f} | {duplicates:>12.2f} ({pairs} pairs)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Бенчмарк проверки лимита «раз в 24 часа» (can_add_data) от размера таблицы.
+
+Запуск из корня проекта:
+    python benchmarks/bench_rate_limit.py [--sizes 1000 10000 100000] [--lookups 2000]
+
+Для каждого размера создаётся временная БД, заполняется синтетическими
+записями и замеряется среднее время can_add_data() с индексом
+(telegram_id, created_at) и без него. С индексом время должно оставаться
+примерно постоянным, без индекса — расти линейно. Для честного сравнения
+снимаются все индексы, которыми может воспользоваться этот запрос, в том
+числе ix_user_data_created из фильтров отчётов.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Индексы, которые снимаются для замера «без индекса»
+INDEXES = {
+    'ix_user_data_telegram_created': "CREATE INDEX ix_user_data_telegram_created ON user_data (telegram_id, created_at)",
+    'ix_user_data_created': "CREATE INDEX ix_user_data_created ON user_data (created_at)",
+}
+
+
+def fill(db, size: int):
+    now = datetime.utcnow()
+    rows = [
+        {
+            'telegram_id': random.randint(1, size * 10),
+            'institution_type': 'Школа',
+            'institution_name': f'Школа №{i}',
+            'created_at': now - timedelta(minutes=random.randint(0, 60 * 24 * 365)),
+        }
+        for i in range(size)
+    ]
+    with db.engine.begin() as conn:
+        conn.execute(db.UserData.__table__.insert(), rows)
+
+
+def measure(db, size: int, lookups: int) -> float:
+    ids = [random.randint(1, size * 10) for _ in range(lookups)]
+    started = time.perf_counter()
+    for telegram_id in ids:
+        db.can_add_data(telegram_id)
+    return (time.perf_counter() - started) / lookups * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--lookups', type=int, default=2_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ses_bench_')
+    os.environ['DB_PATH'] = os.path.join(workdir, 'bench.db')
+    os.chdir(workdir)
+
+    import logging
+    logging.disable(logging.INFO)
+    from database import db
+
+    print(f"{'rows':>10} | {'with index, us':>15} | {'no index, us':>13}")
+    loaded = 0
+    for size in sorted(args.sizes):
+        fill(db, size - loaded)
+        loaded = size
+
+        with_index = measure(db, size, args.lookups)
+        with db.engine.begin() as conn:
+            for name in INDEXES:
+                conn.exec_driver_sql(f"DROP INDEX {name}")
+        without_index = measure(db, size, max(args.lookups // 10, 10))
+        with db.engine.begin() as conn:
+            for ddl in INDEXES.values():
+                conn.exec_driver_sql(ddl)
+
+        print(f"{size:>10} | {with_index:>15.1f} | {without_index:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
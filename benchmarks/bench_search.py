@@ -0,0 +1,82 @@
+"""Бенчмарк полнотекстового поиска (/search) от размера таблицы.
+
+Запуск из корня проекта:
+    python benchmarks/bench_search.py [--sizes 10000 100000 1000000] [--lookups 200]
+
+Для каждого размера создаётся временная БД с синтетическими названиями и
+адресами и замеряется первая страница search_data() по FTS5-индексу против
+перебора всей таблицы через LIKE (фильтр текст= у /find).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+KINDS = ['Школа', 'Лицей', 'Гимназия', 'Колледж', 'Университет', 'Президентская школа']
+DISTRICTS = ['Юнусабадский', 'Чиланзарский', 'Мирзо-Улугбекский', 'Сергелийский', 'Яккасарайский']
+STREETS = ['Амира Темура', 'Бунёдкор', 'Буюк Ипак Йули', 'Богишамол', 'Катартал', 'Мукими']
+QUERIES = ['лицей', 'ЮНУСАБАД', 'гимн 12', 'бунёд', 'школа мукими', 'сергел катартал']
+
+
+def fill(db, size: int, offset: int):
+    rows = [
+        {
+            'telegram_id': random.randint(1, 10 ** 6),
+            'institution_name': f'{random.choice(KINDS)} №{offset + i}',
+            'address': f'{random.choice(DISTRICTS)} район, ул. {random.choice(STREETS)}, {random.randint(1, 200)}',
+            'landmark': random.choice(['рядом с метро', 'напротив парка', None]),
+        }
+        for i in range(size)
+    ]
+    with db.engine.begin() as conn:
+        conn.execute(db.UserData.__table__.insert(), rows)
+
+
+def measure(search, count: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        search(QUERIES[i % len(QUERIES)])
+    return (time.perf_counter() - started) / count * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ses_bench_')
+    os.environ['DB_PATH'] = os.path.join(workdir, 'bench.db')
+    os.chdir(workdir)
+
+    import logging
+    logging.disable(logging.INFO)
+    from database import db
+    from utils.search import match_query
+    from utils.filters import parse_filter
+
+    def fts(query):
+        return db.search_data(match_query(query), limit=10)
+
+    def like(query):
+        return db.get_data_page(parse_filter(f'текст="{query.split()[0]}"'), limit=10)
+
+    print(f"{'rows':>10} | {'FTS5 page, ms':>13} | {'FTS5 count, ms':>14} | {'LIKE page, ms':>13}")
+    loaded = 0
+    for size in sorted(args.sizes):
+        fill(db, size - loaded, loaded)
+        loaded = size
+
+        page = measure(fts, args.lookups)
+        count = measure(lambda query: db.count_search(match_query(query)), args.lookups)
+        # Первая страница LIKE быстра для частых слов; редкое слово — честный худший случай
+        scan = measure(lambda query: like('несуществующее'), max(args.lookups // 20, 3))
+        print(f"{size:>10} | {page:>13.2f} | {count:>14.2f} | {scan:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
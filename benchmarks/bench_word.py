@@ -0,0 +1,116 @@
+"""Бенчмарк сборки Word-отчёта от числа записей.
+
+Запуск из корня проекта:
+    python benchmarks/bench_word.py [--sizes 500 2000] [--volume-mb 45]
+
+Для каждого размера создаётся временная БД с синтетическими заявками
+(треть — без фото) и замеряется export_to_word(): время, пиковая память
+Python (tracemalloc) и число томов. Для сравнения — построение таблиц
+через add_table() и оформление каждой записи заново, без фото.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def fill(db, size: int, photos: list[str]):
+    rows = [
+        {
+            'telegram_id': i,
+            'institution_type': 'Школа',
+            'institution_name': f'Школа №{i}',
+            'address': f'ул. {i}',
+            'latitude': 41.3,
+            'longitude': 69.2,
+            'photo_path': photos[i % len(photos)] if photos and i % 3 else None,
+        }
+        for i in range(size)
+    ]
+    with db.engine.begin() as conn:
+        conn.execute(db.UserData.__table__.insert(), rows)
+
+
+def add_table_per_record(exporter, records) -> float:
+    from docx import Document
+
+    started = time.perf_counter()
+    doc = Document()
+    for idx, record in enumerate(records, 1):
+        doc.add_heading(f'{idx}. {record.institution_name}', level=1)
+        table = doc.add_table(rows=len(exporter.WORD_FIELDS), cols=2)
+        table.style = 'Light Grid Accent 1'
+        for row, label, value in zip(table.rows, exporter.WORD_FIELDS, exporter._word_values(record) + ['']):
+            row.cells[0].text = label
+            row.cells[1].text = value
+        doc.add_paragraph()
+    return time.perf_counter() - started
+
+
+def template_per_record(exporter, records) -> float:
+    from docx import Document
+
+    started = time.perf_counter()
+    doc = Document()
+    template = exporter._record_table_template(doc)
+    for idx, record in enumerate(records, 1):
+        exporter._add_word_record(doc, template, idx, record, None)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2_000])
+    parser.add_argument('--volume-mb', type=int, default=45, help="порог размера тома, МБ")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ses_bench_')
+    os.environ['DB_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ['WORD_VOLUME_MAX_MB'] = str(args.volume_mb)
+    os.chdir(workdir)
+    os.makedirs('photos')
+    photos = []
+    source_dir = os.path.join(PROJECT_DIR, 'photos')
+    if os.path.isdir(source_dir):
+        for name in sorted(os.listdir(source_dir))[:20]:
+            if name.endswith('.jpg'):
+                shutil.copy(os.path.join(source_dir, name), 'photos')
+                photos.append(os.path.join('photos', name))
+
+    import logging
+    logging.disable(logging.INFO)
+    from database import db
+    from utils import exporter
+
+    print(f"photos: {len(photos)}, volume limit: {args.volume_mb} MB")
+    print(f"{'rows':>8} | {'export, s':>9} | {'peak, MB':>8} | {'files':>5} | "
+          f"{'add_table, s':>12} | {'template, s':>11}")
+    loaded = 0
+    for size in sorted(args.sizes):
+        fill(db, size - loaded, photos)
+        loaded = size
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        paths = exporter.export_to_word()
+        export_time = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        for path in paths:
+            os.remove(path)
+
+        records = list(db.iter_all_data())
+        naive = add_table_per_record(exporter, records)
+        template = template_per_record(exporter, records)
+        print(f"{size:>8} | {export_time:>9.2f} | {peak:>8.1f} | {len(paths):>5} | "
+              f"{naive:>12.2f} | {template:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
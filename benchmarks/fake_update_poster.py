@@ -0,0 +1,79 @@
+"""Локальная проверка webhook-режима: шлёт синтетические апдейты на сервер бота.
+
+Запуск (в одном терминале бот, в другом — скрипт):
+    BOT_MODE=webhook python app.py
+    python benchmarks/fake_update_poster.py --updates 2000 --concurrency 50
+
+Без WEBHOOK_BASE_URL бот не регистрирует webhook в Telegram, поэтому
+принимает только эти локальные запросы. Ответы обработчиков в Bot API при
+тестовом токене завершатся ошибкой — здесь измеряется только приём апдейтов.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import WEBAPP_PORT, WEBHOOK_PATH, WEBHOOK_SECRET  # noqa: E402
+
+TEXTS = ["👁 Посмотреть мои данные", "📝 Добавить учреждение", "/start"]
+
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+            'text': text,
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=f"http://127.0.0.1:{WEBAPP_PORT}")
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+
+    headers = {'X-Telegram-Bot-Api-Secret-Token': WEBHOOK_SECRET} if WEBHOOK_SECRET else {}
+    counter = itertools.count(1)
+    latencies, statuses = [], {}
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        async def worker():
+            while (update_id := next(counter)) <= args.updates:
+                update = make_update(update_id, 100_000 + update_id % args.users, TEXTS[update_id % len(TEXTS)])
+                started = time.perf_counter()
+                async with session.post(f"{args.url}{WEBHOOK_PATH}", json=update) as response:
+                    await response.read()
+                    statuses[response.status] = statuses.get(response.status, 0) + 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        async with session.get(f"{args.url}/health") as response:
+            health = await response.json()
+
+    latencies.sort()
+    print(f"updates: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s)")
+    print(f"statuses: {statuses}")
+    print(f"latency ms: p50={statistics.median(latencies):.1f} "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1]:.1f} max={latencies[-1]:.1f}")
+    print(f"health: {health}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,410 @@
+"""Нагрузочный тест: синтетические пользователи проходят всю анкету через настоящий Dispatcher.
+
+Запуск из корня проекта:
+    python benchmarks/load_test.py [--users 2000] [--concurrency 2000] [--api-latency-ms 0]
+    python benchmarks/load_test.py --repeat 3 --json baseline.json      # сохранить базовую линию
+    python benchmarks/load_test.py --repeat 3 --baseline baseline.json  # сравнить (код 1 при регрессии)
+
+Берутся dp и bot из app.py со всеми роутерами и middleware, а сессия бота
+заменяется поддельной: запросы к Bot API не уходят в сеть, а сразу
+(или через --api-latency-ms) получают правдоподобный ответ, фото
+«скачиваются» из заранее сгенерированных JPEG. Каждый пользователь
+проходит все состояния Form из states/form.py: меню → контакт → тип →
+название → адрес → ориентир → геолокация → фото или «Пропустить» →
+подтверждение → просмотр своих данных.
+
+Отчёт: задержка обработки апдейта (p50/p95/p99) по шагам и в целом,
+пропускная способность, запросы к Bot API и конкуренция за БД —
+ожидание в очереди к потоку SQLite, его загрузка и размер пачек записи.
+Всё работает во временной папке; --seed делает прогон воспроизводимым.
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TYPES = ['Школа', 'Техникум / Колледж', 'Университет']
+DISTRICTS = ['Юнусабадский', 'Чиланзарский', 'Мирзо-Улугбекский', 'Сергелийский', 'Яккасарайский']
+LAT_RANGE = (41.2, 41.4)
+LON_RANGE = (69.1, 69.4)
+PHOTO_VARIANTS = 20
+FIRST_USER_ID = 7_000_000_000
+# Шаги, по которым сравнивается p95 с базовой линией
+COMPARED = ('all', 'confirm', 'photo')
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def make_jpegs(count: int) -> list[bytes]:
+    """Разные (по хешу) JPEG среднего размера — как фото с телефона после сжатия Telegram"""
+    from PIL import Image
+
+    images = []
+    for i in range(count):
+        image = Image.effect_noise((1280, 960), 40 + i).convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=80)
+        images.append(buffer.getvalue())
+    return images
+
+
+def build_session_class():
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import GetFile, SendDocument, SendMessage, SendPhoto
+    from aiogram.types import File, Message
+
+    class FakeSession(BaseSession):
+        """Bot API без сети: считает запросы и отвечает правдоподобными объектами"""
+
+        def __init__(self, latency: float, photos: list[bytes]):
+            super().__init__()
+            self.latency = latency
+            self.photos = photos
+            self.calls = Counter()
+            self._message_ids = itertools.count(1)
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls[type(method).__name__] += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if isinstance(method, GetFile):
+                return File(file_id=method.file_id, file_unique_id=method.file_id, file_path=f"photos/{method.file_id}.jpg")
+            if isinstance(method, (SendMessage, SendPhoto, SendDocument)):
+                message = {
+                    'message_id': next(self._message_ids),
+                    'date': int(time.time()),
+                    'chat': {'id': method.chat_id, 'type': 'private'},
+                    'text': getattr(method, 'text', None),
+                }
+                if isinstance(method, SendPhoto):
+                    file_id = method.photo if isinstance(method.photo, str) else f"uploaded{message['message_id']}"
+                    message['photo'] = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 1280, 'height': 960}]
+                return Message.model_validate(message, context={'bot': bot})
+            return True
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            self.calls['download'] += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            # .../photos/photo<N>.jpg -> вариант N
+            variant = int(url.rsplit('photo', 1)[1].split('.')[0])
+            data = self.photos[variant % len(self.photos)]
+            for start in range(0, len(data), chunk_size):
+                yield data[start:start + chunk_size]
+
+        async def close(self):
+            pass
+
+    return FakeSession
+
+
+class LoadTest:
+    def __init__(self, dp, bot, args):
+        from aiogram.types import Update
+
+        self.Update = Update
+        self.dp = dp
+        self.bot = bot
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.update_ids = itertools.count(1)
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.unhandled = 0
+        self.errors = Counter()
+
+    def _update(self, user_id: int, **content) -> object:
+        update_id = next(self.update_ids)
+        message = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}', 'username': f'user{user_id}'},
+            **content,
+        }
+        return self.Update.model_validate({'update_id': update_id, 'message': message}, context={'bot': self.bot})
+
+    def scenario(self, user_id: int, rnd: random.Random) -> list[tuple[str, dict]]:
+        n = user_id - FIRST_USER_ID
+        steps = [
+            ('menu', {'text': "📝 Добавить учреждение"}),
+            ('contact', {'contact': {'phone_number': f"+99890{n:07d}", 'first_name': f'User{user_id}', 'user_id': user_id}}),
+            ('type', {'text': rnd.choice(TYPES)}),
+            ('name', {'text': f"Школа №{n}"}),
+            ('address', {'text': f"{rnd.choice(DISTRICTS)} район, ул. {rnd.randint(1, 300)}, дом {rnd.randint(1, 90)}"}),
+            ('landmark', {'text': "рядом с рынком"}),
+            ('location', {'location': {'latitude': rnd.uniform(*LAT_RANGE), 'longitude': rnd.uniform(*LON_RANGE)}}),
+        ]
+        if rnd.random() < self.args.photo_ratio:
+            file_id = f"photo{rnd.randrange(PHOTO_VARIANTS)}"
+            steps.append(('photo', {'photo': [{'file_id': file_id, 'file_unique_id': file_id, 'width': 1280, 'height': 960}]}))
+        else:
+            steps.append(('skip_photo', {'text': "⏭ Пропустить"}))
+        steps.append(('confirm', {'text': "✅ Подтвердить"}))
+        steps.append(('view', {'text': "👁 Посмотреть мои данные"}))
+        return steps
+
+    async def run_user(self, user_id: int, semaphore: asyncio.Semaphore):
+        from aiogram.dispatcher.event.bases import UNHANDLED
+
+        rnd = random.Random(f"{self.args.seed}:{user_id}")
+        async with semaphore:
+            for step, content in self.scenario(user_id, rnd):
+                if self.args.think_ms:
+                    await asyncio.sleep(rnd.uniform(0, self.args.think_ms) / 1000)
+                update = self._update(user_id, **content)
+                started = time.perf_counter()
+                try:
+                    result = await self.dp.feed_update(self.bot, update)
+                except Exception as e:
+                    self.errors[f"{step}: {type(e).__name__}"] += 1
+                    continue
+                finally:
+                    self.latencies[step].append(time.perf_counter() - started)
+                if result is UNHANDLED:
+                    self.unhandled += 1
+
+    async def run(self) -> float:
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        users = [FIRST_USER_ID + i for i in range(self.args.users)]
+        started = time.perf_counter()
+        await asyncio.gather(*(self.run_user(user_id, semaphore) for user_id in users))
+        return time.perf_counter() - started
+
+
+def summarize(test: LoadTest, session, elapsed: float) -> dict:
+    from database import db
+    from utils.metrics import DB_CALL_SECONDS, DB_QUEUE_SECONDS, DB_WRITE_BATCH, HANDLER_ERRORS
+
+    steps = {}
+    all_latencies = []
+    for step, values in test.latencies.items():
+        values = sorted(values)
+        all_latencies.extend(values)
+        steps[step] = {
+            'count': len(values),
+            'p50_ms': percentile(values, 0.50) * 1e3,
+            'p95_ms': percentile(values, 0.95) * 1e3,
+            'p99_ms': percentile(values, 0.99) * 1e3,
+            'max_ms': values[-1] * 1e3,
+        }
+    all_latencies.sort()
+    steps['all'] = {
+        'count': len(all_latencies),
+        'p50_ms': percentile(all_latencies, 0.50) * 1e3,
+        'p95_ms': percentile(all_latencies, 0.95) * 1e3,
+        'p99_ms': percentile(all_latencies, 0.99) * 1e3,
+        'max_ms': all_latencies[-1] * 1e3 if all_latencies else 0.0,
+    }
+
+    db_busy = sum(state[1] for state in DB_CALL_SECONDS._values.values())
+    db_calls = sum(sum(state[0]) for state in DB_CALL_SECONDS._values.values())
+    return {
+        'config': {name: value for name, value in vars(test.args).items() if name not in ('json', 'baseline')},
+        'elapsed_s': elapsed,
+        'updates': len(all_latencies),
+        'updates_per_s': len(all_latencies) / elapsed,
+        'forms_per_s': steps.get('confirm', {}).get('count', 0) / elapsed,
+        'saved': db.count_data(),
+        'unhandled': test.unhandled,
+        'errors': dict(test.errors),
+        'handler_errors': sum(HANDLER_ERRORS._values.values()),
+        'steps': steps,
+        'api_calls': dict(session.calls),
+        'db': {
+            'calls': db_calls,
+            'executor_busy': db_busy / elapsed,
+            'queue_p50_ms': DB_QUEUE_SECONDS.quantile(0.50) * 1e3,
+            'queue_p95_ms': DB_QUEUE_SECONDS.quantile(0.95) * 1e3,
+            'queue_p99_ms': DB_QUEUE_SECONDS.quantile(0.99) * 1e3,
+            'write_batches': DB_WRITE_BATCH.count(),
+            'write_batch_avg': DB_WRITE_BATCH.total() / max(DB_WRITE_BATCH.count(), 1),
+        },
+    }
+
+
+def print_report(result: dict):
+    db = result['db']
+    print(f"users: {result['config']['users']}, concurrency: {result['config']['concurrency']}, "
+          f"api latency: {result['config']['api_latency_ms']} ms, fsm: {result['config']['fsm']}")
+    print(f"updates: {result['updates']} in {result['elapsed_s']:.2f}s "
+          f"({result['updates_per_s']:.0f} updates/s, {result['forms_per_s']:.1f} forms/s)")
+    print(f"saved: {result['saved']}, unhandled: {result['unhandled']}, "
+          f"errors: {result['errors'] or 0}, handler errors: {result['handler_errors']:.0f}")
+    print()
+    print(f"{'step':>10} | {'count':>6} | {'p50, ms':>8} | {'p95, ms':>8} | {'p99, ms':>8} | {'max, ms':>8}")
+    for step, stats in result['steps'].items():
+        print(f"{step:>10} | {stats['count']:>6} | {stats['p50_ms']:>8.1f} | {stats['p95_ms']:>8.1f} | "
+              f"{stats['p99_ms']:>8.1f} | {stats['max_ms']:>8.1f}")
+    print()
+    print(f"DB: {db['calls']} calls, executor busy {db['executor_busy']:.0%}, queue wait "
+          f"p50={db['queue_p50_ms']:.2f} p95={db['queue_p95_ms']:.2f} p99={db['queue_p99_ms']:.2f} ms, "
+          f"{db['write_batches']} write batches of {db['write_batch_avg']:.1f} on average")
+    print(f"Bot API: {sum(result['api_calls'].values())} calls "
+          f"({sum(result['api_calls'].values()) / max(result['updates'], 1):.2f} per update): "
+          + ", ".join(f"{name}={count}" for name, count in sorted(result['api_calls'].items())))
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    """Сравнить с базовой линией; False — есть регрессия больше tolerance"""
+    ok = True
+    print(f"\nvs baseline (tolerance {tolerance:.0%}):")
+    ignored = ('repeat', 'tolerance')
+    differs = sorted(
+        name for name in set(result['config']) | set(baseline['config'])
+        if name not in ignored and result['config'].get(name) != baseline['config'].get(name)
+    )
+    if differs:
+        print(f"  warning: baseline was run with different {', '.join(differs)}")
+    checks = [('throughput', baseline['updates_per_s'], result['updates_per_s'], True)]
+    checks += [
+        (f"{step} p95", baseline['steps'][step]['p95_ms'], result['steps'][step]['p95_ms'], False)
+        for step in COMPARED if step in baseline['steps'] and step in result['steps']
+    ]
+    for name, before, after, higher_is_better in checks:
+        change = (after - before) / before if before else 0.0
+        regressed = -change > tolerance if higher_is_better else change > tolerance
+        ok &= not regressed
+        print(f"  {name:>14}: {before:10.2f} -> {after:10.2f} ({change:+.0%}){'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+async def main_async(args) -> dict:
+    import logging
+
+    import app
+    from database import async_db
+    from utils.photos import photo_ingestor
+    from utils.sender import rate_limiter
+
+    # Логи обработчиков не должны мерить скорость вывода в консоль
+    logging.disable(logging.WARNING)
+
+    session = build_session_class()(args.api_latency_ms / 1000, make_jpegs(PHOTO_VARIANTS))
+    if args.telegram_limits:
+        # Лимиты Telegram (SEND_RATE и т.д.) — тогда меряется в основном сам лимитер
+        session.middleware(rate_limiter)
+    app.bot.session = session
+
+    test = LoadTest(app.dp, app.bot, args)
+    elapsed = await test.run()
+    # Дописать очередь записи, чтобы «saved» был окончательным
+    await async_db._writer.close()
+    result = summarize(test, session, elapsed)
+    await photo_ingestor.shutdown()
+    await async_db.shutdown()
+    return result
+
+
+def run_once(args) -> dict:
+    """Один прогон в чистой временной папке со своей БД; папка удаляется после прогона"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='ses_load_', ignore_cleanup_errors=True) as workdir:
+        os.environ.update({
+            'BOT_TOKEN': os.getenv('BOT_TOKEN', '123456:LOADTEST'),
+            'DB_PATH': os.path.join(workdir, 'load.db'),
+            'FSM_STORAGE': args.fsm,
+            'LOG_LEVEL': 'WARNING',
+            'LOG_FORMAT': 'text',
+            'METRICS_PORT': '0',
+            'BACKUP_INTERVAL_MIN': '0',
+        })
+        # Фото, миниатюры и кэш отчётов — относительные пути, тоже внутри workdir
+        os.chdir(workdir)
+        try:
+            random.seed(args.seed)
+            result = asyncio.run(main_async(args))
+        finally:
+            os.chdir(cwd)
+    result['date'] = datetime.now().isoformat(timespec='seconds')
+    return result
+
+
+def run_repeated(args) -> dict:
+    """Несколько прогонов в отдельных процессах; берётся медианный по пропускной способности.
+
+    Состояние app.py (БД, метрики, кэши) живёт в модулях, поэтому каждый
+    прогон — свежий процесс. Медиана сглаживает шум машины, и сравнение
+    с базовой линией не срабатывает на случайном выбросе.
+    """
+    results = []
+    for i in range(args.repeat):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            path = f.name
+        command = [
+            sys.executable, os.path.abspath(__file__),
+            '--users', str(args.users), '--concurrency', str(args.concurrency),
+            '--photo-ratio', str(args.photo_ratio), '--api-latency-ms', str(args.api_latency_ms),
+            '--think-ms', str(args.think_ms), '--fsm', args.fsm, '--seed', str(args.seed),
+            '--json', path,
+        ]
+        if args.telegram_limits:
+            command.append('--telegram-limits')
+        try:
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+            with open(path, encoding='utf-8') as f:
+                results.append(json.load(f))
+        finally:
+            os.remove(path)
+        print(f"run {i + 1}/{args.repeat}: {results[-1]['updates_per_s']:.0f} updates/s, "
+              f"p95 {results[-1]['steps']['all']['p95_ms']:.1f} ms")
+    print()
+    results.sort(key=lambda result: result['updates_per_s'])
+    result = results[len(results) // 2]
+    result['config']['repeat'] = args.repeat
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2_000)
+    parser.add_argument('--concurrency', type=int, default=None, help="одновременно активных пользователей (по умолчанию все)")
+    parser.add_argument('--photo-ratio', type=float, default=0.5, help="доля пользователей, отправляющих фото")
+    parser.add_argument('--api-latency-ms', type=float, default=0, help="задержка ответа поддельного Bot API")
+    parser.add_argument('--think-ms', type=float, default=0, help="случайная пауза пользователя перед шагом, до N мс")
+    parser.add_argument('--fsm', choices=['sqlite', 'memory'], default='sqlite', help="хранилище FSM")
+    parser.add_argument('--telegram-limits', action='store_true', help="включить лимитер исходящих запросов")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=1, help="число прогонов, в отчёт идёт медианный")
+    parser.add_argument('--json', help="сохранить результат в JSON (базовая линия)")
+    parser.add_argument('--baseline', help="JSON прошлого прогона для сравнения")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="допустимое ухудшение относительно базовой линии")
+    args = parser.parse_args()
+    args.concurrency = args.concurrency or args.users
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    if args.repeat > 1:
+        result = run_repeated(args)
+    else:
+        result = run_once(args)
+    print_report(result)
+
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nresult saved to {json_path}")
+    if baseline is not None and not compare(result, baseline, args.tolerance):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
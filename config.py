@@ -6,8 +6,107 @@ load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
+# Логирование: формат json или text, общий уровень и уровни отдельных модулей
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO').upper()
+LOG_LEVELS = {
+    'aiogram.event': 'INFO',
+    'aiosqlite': 'WARNING',
+    'sqlalchemy.engine': 'WARNING',
+    'PIL': 'INFO',
+}
+# Переопределение через окружение: LOG_LEVELS="utils.exporter=DEBUG,aiogram=WARNING"
+for _item in filter(None, os.getenv('LOG_LEVELS', '').split(',')):
+    _name, _, _level = _item.partition('=')
+    LOG_LEVELS[_name.strip()] = _level.strip().upper()
+# Построчные сообщения экспорта пишутся раз в столько повторов (1 — все)
+LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', '100'))
+
+# Режим получения апдейтов: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', '')  # например https://bot.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', '8080'))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+WEBHOOK_MAX_PENDING = int(os.getenv('WEBHOOK_MAX_PENDING', '1000'))
+HANDLER_CONCURRENCY = int(os.getenv('HANDLER_CONCURRENCY', '100'))
+SHUTDOWN_DRAIN_TIMEOUT = int(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', '30'))
+
+# Метрики Prometheus: в webhook-режиме /metrics на WEBAPP_PORT,
+# в polling-режиме — отдельный сервер на METRICS_PORT (0 — не поднимать)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+
+# Исходящие сообщения: общий лимит бота и лимит на один чат (сообщений в секунду)
+SEND_RATE = float(os.getenv('SEND_RATE', '28'))
+CHAT_SEND_RATE = float(os.getenv('CHAT_SEND_RATE', '1'))
+CHAT_SEND_BURST = int(os.getenv('CHAT_SEND_BURST', '5'))
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '3'))  # повторов после RetryAfter
+
+# Рассылка: свой темп ниже SEND_RATE, прогресс сохраняется после каждой порции
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '20'))
+BROADCAST_CHUNK = int(os.getenv('BROADCAST_CHUNK', '50'))
+BROADCAST_MAX_RETRIES = int(os.getenv('BROADCAST_MAX_RETRIES', '3'))
+# Захват рассылки процессом истекает, если он столько секунд не сохранял прогресс
+BROADCAST_LEASE_SEC = int(os.getenv('BROADCAST_LEASE_SEC', '300'))
+
+# Поиск по координатам: радиус «возможного дубля» и выдача /nearby
+DUPLICATE_RADIUS_M = int(os.getenv('DUPLICATE_RADIUS_M', '50'))
+NEARBY_DEFAULT_KM = float(os.getenv('NEARBY_DEFAULT_KM', '1'))
+NEARBY_LIMIT = int(os.getenv('NEARBY_LIMIT', '20'))
+# Записей на странице /find и /search
+FIND_PAGE_SIZE = int(os.getenv('FIND_PAGE_SIZE', '10'))
+
 # Список админ-ID, добавь свои
 ADMINS = [5111968766]  # Пример, замени на реальные Telegram ID
 
 # Путь к БД
-DB_PATH = 'ses_database.db'
\ No newline at end of file
+DB_PATH = os.getenv('DB_PATH', 'ses_database.db')
+
+# Хранилище состояний анкеты (FSM): sqlite, redis или memory
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite')
+FSM_DB_PATH = os.getenv('FSM_DB_PATH', DB_PATH)
+FSM_REDIS_URL = os.getenv('FSM_REDIS_URL', 'redis://localhost:6379/0')
+FSM_TTL = int(os.getenv('FSM_TTL', str(24 * 3600)))  # Брошенная анкета живёт сутки
+
+# Настройки SQLite, применяются к каждому новому соединению
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_MB', '256')) * 1024 * 1024,
+    'cache_size': -int(os.getenv('SQLITE_CACHE_MB', '64')) * 1024,  # отрицательное — в КиБ
+    'foreign_keys': 'ON',
+}
+
+# Резервные копии БД (онлайн-снимки по расписанию)
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+BACKUP_INTERVAL_MIN = int(os.getenv('BACKUP_INTERVAL_MIN', '360'))  # 0 — отключить
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '14'))
+BACKUP_COMPRESS = os.getenv('BACKUP_COMPRESS', 'True') == 'True'
+
+# Кэш последней заявки пользователя: сколько пользователей и сколько секунд держать
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '300'))
+
+# Максимум заявок, которые очередь записи объединяет в одну транзакцию
+DB_WRITE_BATCH_MAX = int(os.getenv('DB_WRITE_BATCH_MAX', '100'))
+
+# Хранилище фото: длинная сторона уменьшается до PHOTO_MAX_SIDE (0 — хранить как есть)
+PHOTOS_DIR = os.getenv('PHOTOS_DIR', 'photos')
+PHOTO_MAX_SIDE = int(os.getenv('PHOTO_MAX_SIDE', '1600'))
+PHOTO_JPEG_QUALITY = int(os.getenv('PHOTO_JPEG_QUALITY', '85'))
+PHOTO_WORKERS = int(os.getenv('PHOTO_WORKERS', '4'))
+PHOTO_QUEUE_SIZE = int(os.getenv('PHOTO_QUEUE_SIZE', '100'))
+
+# Кэш миниатюр фото для экспорта
+THUMBS_DIR = os.getenv('THUMBS_DIR', 'thumbs')
+THUMBS_MAX_BYTES = int(os.getenv('THUMBS_MAX_MB', '512')) * 1024 * 1024
+
+# Word-отчёт делится на тома такого размера (лимит документа от бота — 50 МБ)
+WORD_VOLUME_MAX_BYTES = int(os.getenv('WORD_VOLUME_MAX_MB', '45')) * 1024 * 1024
+
+# Кэш базовых полных отчётов (для инкрементальной сборки)
+REPORTS_CACHE_DIR = os.getenv('REPORTS_CACHE_DIR', 'reports_cache')
@@ -0,0 +1,248 @@
+"""Асинхронный слой доступа к БД для обработчиков aiogram.
+
+Синхронные функции из database.db выполняются в отдельном потоке-исполнителе,
+который единолично владеет соединением SQLite. Event loop только ждёт
+результат и продолжает обрабатывать апдейты других пользователей.
+
+Заявки (save_data) идут через очередь записи: всё, что накопилось, пока
+предыдущая транзакция была занята, сохраняется следующей одной транзакцией.
+
+Последняя заявка пользователя кэшируется (database.cache), поэтому
+просмотр своих данных и проверка лимита обычно вообще не трогают БД.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from config import DB_WRITE_BATCH_MAX
+from database import bulk, db
+from database.cache import user_cache
+from utils.metrics import DB_CALL_SECONDS, DB_QUEUE_SECONDS, DB_WRITE_BATCH
+
+logger = logging.getLogger(__name__)
+
+# Один поток = одно соединение SQLite, запросы выполняются строго по очереди
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+
+
+async def run_db(func, *args, **kwargs):
+    """Выполнить синхронную функцию БД в потоке-исполнителе"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(_timed, time.perf_counter(), func, *args, **kwargs))
+
+
+def _timed(queued_at: float, func, *args, **kwargs):
+    # Ожидание в очереди к потоку БД (конкуренция за него) и сама работа — отдельно
+    DB_QUEUE_SECONDS.observe(time.perf_counter() - queued_at)
+    with DB_CALL_SECONDS.time(func=func.__name__):
+        return func(*args, **kwargs)
+
+
+class WriteBatcher:
+    """Очередь записи заявок с групповым коммитом.
+
+    Отдельного окна ожидания нет: одиночная заявка пишется сразу, а при
+    всплеске заявки копятся, пока идёт текущая транзакция, и уходят следующей.
+    """
+
+    def __init__(self, max_batch: int = DB_WRITE_BATCH_MAX):
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._worker())
+
+    async def submit(self, data: dict) -> bool:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((data, future))
+        return await future
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                # Ошибка вне БД (кэш, метрики) не должна останавливать воркер
+                # и оставлять отправителей ждать вечно
+                logger.exception("Write batch of %s entries failed", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: list):
+        DB_WRITE_BATCH.observe(len(batch))
+        try:
+            results = await run_db(db.save_data_batch, [data for data, _ in batch])
+        except Exception as e:
+            # Сохраняем по одной, чтобы ошибка одной заявки не потеряла остальные
+            logger.error("Batch write of %s entries failed, retrying one by one: %s", len(batch), e)
+            for data, future in batch:
+                user_cache.invalidate(data['telegram_id'])
+                try:
+                    result = await run_db(db.save_data, data)
+                except Exception as single_error:
+                    if not future.done():
+                        future.set_exception(single_error)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+            return
+
+        # Отклонённая заявка значит, что кэш пользователя мог устареть;
+        # сохранённая — сама становится последней записью (пишем после сбросов)
+        for (data, _), entry in zip(batch, results):
+            if entry is None:
+                user_cache.invalidate(data['telegram_id'])
+        for (data, future), entry in zip(batch, results):
+            if entry is not None:
+                user_cache.put(data['telegram_id'], entry)
+            if not future.done():
+                future.set_result(entry is not None)
+
+    async def close(self):
+        """Дописать всё, что уже в очереди, и остановить воркер"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        self._task = None
+
+
+_writer = WriteBatcher()
+
+
+async def save_data(data: dict) -> bool:
+    return await _writer.submit(data)
+
+
+async def get_user_data(telegram_id: int):
+    found, record = user_cache.get(telegram_id)
+    if found:
+        return record
+    record = await run_db(db.get_user_data, telegram_id)
+    user_cache.put(telegram_id, record)
+    return record
+
+
+async def can_add_data(telegram_id: int) -> bool:
+    """Тот же лимит, что и db.can_add_data, но по закэшированной последней заявке"""
+    latest = await get_user_data(telegram_id)
+    return latest is None or latest.created_at <= datetime.utcnow() - db.SUBMISSION_COOLDOWN
+
+
+async def get_all_data() -> list:
+    return await run_db(db.get_all_data)
+
+
+async def set_photo_file_id(record, file_id: str):
+    """Сохранить file_id фото в БД и в закэшированной записи"""
+    record.photo_file_id = file_id
+    await run_db(db.set_photo_file_id, record.id, file_id)
+
+
+async def max_data_id() -> int:
+    return await run_db(db.max_data_id)
+
+
+async def get_stats(days: int = 7) -> dict:
+    return await run_db(db.get_stats, days)
+
+
+async def get_export_watermark(admin_id: int, report_kind: str) -> int:
+    return await run_db(db.get_export_watermark, admin_id, report_kind)
+
+
+async def set_export_watermark(admin_id: int, report_kind: str, last_id: int):
+    return await run_db(db.set_export_watermark, admin_id, report_kind, last_id)
+
+
+async def broadcast_recipients(after_telegram_id: int, limit: int) -> list[int]:
+    return await run_db(db.broadcast_recipients, after_telegram_id, limit)
+
+
+async def create_broadcast(admin_id: int, text: str, owner: str = None):
+    return await run_db(db.create_broadcast, admin_id, text, owner)
+
+
+async def claim_broadcast(broadcast_id: int, owner: str, lease) -> bool:
+    return await run_db(db.claim_broadcast, broadcast_id, owner, lease)
+
+
+async def checkpoint_broadcast(broadcast_id: int, owner: str, **fields) -> str | None:
+    return await run_db(db.checkpoint_broadcast, broadcast_id, owner, **fields)
+
+
+async def finish_broadcast(broadcast_id: int, owner: str) -> str | None:
+    return await run_db(db.finish_broadcast, broadcast_id, owner)
+
+
+async def release_broadcast(broadcast_id: int, owner: str):
+    return await run_db(db.release_broadcast, broadcast_id, owner)
+
+
+async def cancel_broadcast(broadcast_id: int) -> bool:
+    return await run_db(db.cancel_broadcast, broadcast_id)
+
+
+async def get_unfinished_broadcasts() -> list:
+    return await run_db(db.get_unfinished_broadcasts)
+
+
+async def find_nearby(latitude: float, longitude: float, radius_m: float, limit: int = None) -> list:
+    return await run_db(db.find_nearby, latitude, longitude, radius_m, limit)
+
+
+async def find_duplicate_locations(radius_m: float) -> list:
+    return await run_db(db.find_duplicate_locations, radius_m)
+
+
+async def get_data_by_id(record_id: int):
+    return await run_db(db.get_data_by_id, record_id)
+
+
+async def search_data(match: str, before_id: int = None, limit: int = 20) -> list:
+    return await run_db(db.search_data, match, before_id, limit)
+
+
+async def count_search(match: str) -> int:
+    return await run_db(db.count_search, match)
+
+
+async def count_data(flt: db.DataFilter = None) -> int:
+    return await run_db(db.count_data, flt=flt)
+
+
+async def get_data_page(flt: db.DataFilter = None, after_id: int = None, limit: int = 20) -> list:
+    return await run_db(db.get_data_page, flt, after_id=after_id, limit=limit)
+
+
+async def bulk_dump(fmt: str, flt: db.DataFilter = None) -> tuple[str | None, int]:
+    # Только чтение: отдельное соединение в своём потоке (WAL), очередь записи не ждёт выгрузку
+    return await asyncio.to_thread(bulk.dump, fmt, flt=flt)
+
+
+async def bulk_load(path: str, keep_ids: bool = True) -> tuple[int, int]:
+    result = await run_db(bulk.load, path, keep_ids)
+    # Последние заявки пользователей могли смениться
+    user_cache.clear()
+    return result
+
+
+async def shutdown():
+    """Дождаться завершения запросов и остановить поток БД"""
+    await _writer.close()
+    await asyncio.get_running_loop().run_in_executor(None, partial(_executor.shutdown, wait=True))
+    logger.info("DB executor stopped")
@@ -0,0 +1,115 @@
+"""Резервные копии БД по расписанию.
+
+Снимок делается через онлайн-backup API SQLite: страницы копируются
+порциями, между порциями писатели продолжают работать, а результат всегда
+согласован (в отличие от копирования живого файла вместе с -wal).
+Копии складываются в BACKUP_DIR, при желании сжимаются gzip, старые
+удаляются по BACKUP_KEEP. Запускается фоновой задачей бота, а не из экспорта.
+"""
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+
+from config import DB_PATH, BACKUP_DIR, BACKUP_INTERVAL_MIN, BACKUP_KEEP, BACKUP_COMPRESS
+
+logger = logging.getLogger(__name__)
+
+PAGES_PER_STEP = 1024  # Сколько страниц копировать за один шаг backup()
+STEP_SLEEP = 0.005     # Пауза между шагами, чтобы не отнимать блокировку у писателей
+
+_last_signature = None
+
+
+def _db_signature() -> tuple:
+    """Размер и время изменения файла БД и его WAL — если не менялись, снимок не нужен"""
+    signature = []
+    for path in (DB_PATH, f"{DB_PATH}-wal"):
+        try:
+            st = os.stat(path)
+            signature.append((st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def create_snapshot(compress: bool = BACKUP_COMPRESS, force: bool = False) -> str | None:
+    """Сделать согласованный снимок БД, вернуть путь (None — БД не менялась)"""
+    global _last_signature
+    signature = _db_signature()
+    if not force and signature == _last_signature:
+        logger.debug("DB unchanged since last backup, skipping")
+        return None
+
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    name = f"{os.path.splitext(os.path.basename(DB_PATH))[0]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+    path = os.path.join(BACKUP_DIR, name)
+    tmp = f"{path}.tmp"
+
+    src = sqlite3.connect(DB_PATH)
+    dst = sqlite3.connect(tmp)
+    try:
+        src.backup(dst, pages=PAGES_PER_STEP, sleep=STEP_SLEEP)
+    finally:
+        dst.close()
+        src.close()
+
+    if compress:
+        with open(tmp, 'rb') as f_in, gzip.open(f"{tmp}.gz", 'wb', compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(tmp)
+        tmp, path = f"{tmp}.gz", f"{path}.gz"
+    os.replace(tmp, path)
+
+    _last_signature = signature
+    logger.info("DB backed up to %s", path)
+    rotate()
+    return path
+
+
+def rotate(keep: int = BACKUP_KEEP):
+    """Оставить только keep самых свежих снимков"""
+    snapshots = sorted(
+        (entry for entry in os.scandir(BACKUP_DIR)
+         if entry.is_file() and (entry.name.endswith('.db') or entry.name.endswith('.db.gz'))),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in snapshots[keep:]:
+        try:
+            os.remove(entry.path)
+            logger.info("Old backup removed: %s", entry.path)
+        except OSError as e:
+            logger.error("Не удалось удалить старую копию %s: %s", entry.path, e)
+
+
+class BackupScheduler:
+    """Фоновая задача: снимок БД раз в BACKUP_INTERVAL_MIN минут"""
+
+    def __init__(self, interval_min: int = BACKUP_INTERVAL_MIN):
+        self.interval = interval_min * 60
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info("Backup scheduler started, every %s min", self.interval // 60)
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(create_snapshot)
+            except Exception as e:
+                logger.error("Backup failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+backup_scheduler = BackupScheduler()
@@ -0,0 +1,194 @@
+"""Быстрая выгрузка и загрузка user_data без оформления и фото.
+
+В отличие от отчётов (utils/exporter.py) это сырой канал данных для
+резервного переноса и внешних систем. Строки читаются курсором драйвера
+пачками по FETCH_SIZE и сразу пишутся в файл, поэтому память не зависит
+от размера таблицы. Форматы:
+- csv / csv.gz — заголовок с именами колонок, затем строки;
+- columns — колоночный файл в духе Parquet без внешних зависимостей:
+  gzip-JSONL, первая строка — описание колонок, каждая следующая —
+  группа строк, где значения лежат по колонкам.
+
+Загрузка читает те же файлы и вставляет строки пачками через executemany
+в одной транзакции. INSERT OR IGNORE с исходными id делает повторную
+загрузку той же выгрузки безопасной. R*Tree-индекс координат ведут
+триггеры, daily_counters пересчитываются после загрузки.
+
+Из командной строки:
+    python -m database.bulk dump csv.gz [--out FILE]
+    python -m database.bulk load FILE [--new-ids]
+"""
+import argparse
+import csv
+import gzip
+import json
+import logging
+import os
+from contextlib import closing
+from datetime import datetime
+
+from database.db import DataFilter, engine, rebuild_counters
+from database.models import UserData
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = [column.name for column in UserData.__table__.columns]
+FETCH_SIZE = 10_000
+INSERT_BATCH = 5_000
+COLUMNS_FORMAT = 'ses-columns'
+EXTENSIONS = {
+    'csv': '.csv',
+    'csv.gz': '.csv.gz',
+    'columns': '.columns.jsonl.gz',
+}
+
+
+def _open_text(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, f'{mode}t', encoding='utf-8', newline='', compresslevel=6)
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def _format_of(path: str) -> str:
+    for fmt, ext in sorted(EXTENSIONS.items(), key=lambda item: -len(item[1])):
+        if path.endswith(ext):
+            return fmt
+    raise ValueError(f"Неизвестный формат файла: {os.path.basename(path)}")
+
+
+def _iter_chunks(after_id: int = None, until_id: int = None, flt: DataFilter = None):
+    """Пачки кортежей user_data в порядке id, только строки из (after_id, until_id] под фильтром"""
+    sql = f"SELECT {', '.join(COLUMNS)} FROM user_data WHERE 1"
+    params = {}
+    if flt:
+        clauses, params = flt.conditions()
+        sql += "".join(f" AND {clause}" for clause in clauses)
+    if after_id is not None:
+        sql += " AND id > :after_id"
+        params['after_id'] = after_id
+    if until_id is not None:
+        sql += " AND id <= :until_id"
+        params['until_id'] = until_id
+    sql += " ORDER BY id"
+
+    with engine.connect() as conn:
+        # Курсор драйвера напрямую: обычные кортежи без Row-обёрток SQLAlchemy
+        with closing(conn.connection.driver_connection.cursor()) as cursor:
+            cursor.execute(sql, params)
+            while rows := cursor.fetchmany(FETCH_SIZE):
+                yield rows
+
+
+def _write_csv(f, chunks) -> int:
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    total = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        total += len(rows)
+    return total
+
+
+def _write_columns(f, chunks) -> int:
+    f.write(json.dumps({'format': COLUMNS_FORMAT, 'version': 1, 'columns': COLUMNS}) + '\n')
+    total = 0
+    for rows in chunks:
+        group = {'rows': len(rows), 'data': [list(values) for values in zip(*rows)]}
+        f.write(json.dumps(group, ensure_ascii=False, separators=(',', ':')) + '\n')
+        total += len(rows)
+    return total
+
+
+def dump(fmt: str = 'csv.gz', path: str = None, after_id: int = None, until_id: int = None,
+         flt: DataFilter = None) -> tuple[str | None, int]:
+    """Выгрузить user_data в файл формата fmt; вернуть (путь, строк). Пустая выгрузка — (None, 0)"""
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    path = path or f"user_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}{EXTENSIONS[fmt]}"
+    writer = _write_columns if fmt == 'columns' else _write_csv
+    with _open_text(path, 'w') as f:
+        total = writer(f, _iter_chunks(after_id, until_id, flt))
+    if not total:
+        os.remove(path)
+        return None, 0
+    logger.info("Dumped %s user_data rows to %s (%s bytes)", total, path, os.path.getsize(path))
+    return path, total
+
+
+def _read_csv(f):
+    reader = csv.reader(f)
+    header = next(reader, None) or []
+    yield header
+    batch = []
+    for row in reader:
+        # В CSV NULL и пустая строка неразличимы: пустое значение загружается как NULL
+        batch.append([None if value == '' else value for value in row])
+        if len(batch) >= INSERT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _read_columns(f):
+    meta = json.loads(f.readline() or '{}')
+    if meta.get('format') != COLUMNS_FORMAT:
+        raise ValueError("Файл не является колоночной выгрузкой user_data")
+    yield meta['columns']
+    for line in f:
+        group = json.loads(line)
+        yield list(zip(*group['data']))
+
+
+def load(path: str, keep_ids: bool = True) -> tuple[int, int]:
+    """Загрузить выгрузку в user_data; вернуть (вставлено, пропущено).
+
+    keep_ids=True сохраняет исходные id, строки с уже занятым id пропускаются;
+    keep_ids=False вставляет строки как новые записи.
+    """
+    reader = _read_columns if _format_of(path) == 'columns' else _read_csv
+    inserted = skipped = 0
+    with _open_text(path, 'r') as f, engine.begin() as conn:
+        batches = reader(f)
+        header = next(batches)
+        unknown = set(header) - set(COLUMNS)
+        if unknown or 'telegram_id' not in header:
+            raise ValueError(f"Колонки не совпадают с user_data: {', '.join(sorted(unknown)) or 'нет telegram_id'}")
+        keep = [i for i, name in enumerate(header) if keep_ids or name != 'id']
+        names = [header[i] for i in keep]
+        sql = (f"INSERT OR IGNORE INTO user_data ({', '.join(names)}) "
+               f"VALUES ({', '.join('?' * len(names))})")
+        for rows in batches:
+            if len(keep) != len(header):
+                rows = [[row[i] for i in keep] for row in rows]
+            result = conn.exec_driver_sql(sql, [tuple(row) for row in rows])
+            inserted += result.rowcount
+            skipped += len(rows) - result.rowcount
+
+    if inserted:
+        rebuild_counters()
+    logger.info("Loaded %s user_data rows from %s, skipped %s", inserted, path, skipped)
+    return inserted, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Выгрузка и загрузка user_data")
+    commands = parser.add_subparsers(dest='command', required=True)
+    dump_parser = commands.add_parser('dump', help="выгрузить user_data в файл")
+    dump_parser.add_argument('format', choices=list(EXTENSIONS), nargs='?', default='csv.gz')
+    dump_parser.add_argument('--out', help="путь к файлу (по умолчанию user_data_<дата>)")
+    load_parser = commands.add_parser('load', help="загрузить выгрузку в user_data")
+    load_parser.add_argument('path')
+    load_parser.add_argument('--new-ids', action='store_true', help="не сохранять исходные id")
+    args = parser.parse_args()
+
+    if args.command == 'dump':
+        path, total = dump(args.format, args.out)
+        print(f"{total} rows -> {path}" if path else "user_data is empty")
+    else:
+        inserted, skipped = load(args.path, keep_ids=not args.new_ids)
+        print(f"{inserted} rows loaded, {skipped} skipped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Кэш последней записи пользователя в памяти процесса.
+
+Меню «Посмотреть мои данные» и проверка лимита перед «Добавить учреждение»
+читают одно и то же — последнюю заявку пользователя. Она кэшируется с TTL
+и LRU-вытеснением, а очередь записи обновляет кэш сразу после сохранения.
+Отсутствие записи тоже кэшируется, чтобы новые пользователи не били в БД.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from config import USER_CACHE_SIZE, USER_CACHE_TTL
+
+
+class UserCache:
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()  # telegram_id -> (expires_at, record | None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, telegram_id: int) -> tuple[bool, object]:
+        """(найдено, запись); запись может быть None — «у пользователя нет заявок»"""
+        with self._lock:
+            entry = self._entries.get(telegram_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[telegram_id]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(telegram_id)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, telegram_id: int, record):
+        with self._lock:
+            self._entries[telegram_id] = (time.monotonic() + self.ttl, record)
+            self._entries.move_to_end(telegram_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, telegram_id: int):
+        with self._lock:
+            self._entries.pop(telegram_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+user_cache = UserCache()
@@ -1,84 +1,569 @@
 import os
-from sqlalchemy import create_engine, func
+from sqlalchemy import create_engine, event, func, select, insert, delete, update, text, false, or_, case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker
-from .models import Base, UserData
-from config import DB_PATH, DEBUG
+from .models import UserData, ExportWatermark, DailyCounter, Broadcast
+from .migrations import migrate
+from config import DB_PATH, SQLITE_PRAGMAS, PHOTOS_DIR
+from utils.metrics import DB_QUERY_SECONDS
+from utils.geo import bounding_box, haversine_m, lat_delta, lon_delta
 from datetime import datetime, timedelta
+import hashlib
+import json
 import logging
-import shutil
+import time
 
-logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Создаем папку для фото
-PHOTOS_DIR = 'photos'
 if not os.path.exists(PHOTOS_DIR):
     os.makedirs(PHOTOS_DIR)
 
-# ✅ СОЗДАЁМ БД ТОЛЬКО ЕСЛИ ЕЁ НЕТ
-engine = create_engine(f'sqlite:///{DB_PATH}')
+engine = create_engine(
+    f'sqlite:///{DB_PATH}',
+    connect_args={'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000},
+)
+
+@event.listens_for(engine, 'connect')
+def _apply_pragmas(dbapi_connection, connection_record):
+    """WAL + synchronous=NORMAL: читатели не блокируют писателя, fsync только на чекпойнтах"""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+@event.listens_for(engine, 'connect')
+def _register_functions(dbapi_connection, connection_record):
+    # Встроенный lower() SQLite меняет регистр только у латиницы
+    dbapi_connection.create_function('unicode_lower', 1, str.lower, deterministic=True)
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    # Время храним в контексте выполнения: упавший запрос уходит вместе с ним,
+    # ничего не накапливая в соединении
+    context._query_started = time.perf_counter()
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    DB_QUERY_SECONDS.observe(elapsed, statement=statement.lstrip().split(None, 1)[0].upper())
 
 # Проверяем, существует ли файл БД
 db_exists = os.path.exists(DB_PATH)
 
+# Создаём недостающие таблицы и обновляем схему существующей БД на месте
+schema_version = migrate(engine)
+
 if not db_exists:
-    # Создаём БД только если её нет
-    Base.metadata.create_all(engine)
-    logger.info("✅ База данных создана с нуля")
+    logger.info("✅ База данных создана с нуля (схема v%s)", schema_version)
 else:
-    # Если БД существует, просто проверяем структуру
-    # Это создаст недостающие таблицы, но не удалит существующие данные
-    Base.metadata.create_all(engine)
-    logger.info("✅ База данных загружена")
+    logger.info("✅ База данных загружена (схема v%s)", schema_version)
 
 Session = sessionmaker(bind=engine)
 
+# Одна заявка от пользователя раз в сутки
+SUBMISSION_COOLDOWN = timedelta(hours=24)
+
+def _insert_entry(session, data: dict) -> UserData | None:
+    """Проверить лимит и добавить заявку в текущую транзакцию (None — лимит не пускает)"""
+    last_entry = session.query(UserData).filter(
+        UserData.telegram_id == data['telegram_id'],
+        UserData.created_at > datetime.utcnow() - SUBMISSION_COOLDOWN
+    ).first()
+
+    if last_entry:
+        logger.warning("Duplicate entry attempt for user %s", data['telegram_id'])
+        return None
+
+    new_entry = UserData(
+        telegram_id=data['telegram_id'],
+        full_name=data['full_name'],
+        username=data['username'],
+        phone_number=data['phone_number'],
+        institution_type=data['institution_type'],
+        institution_name=data['institution_name'],
+        address=data['address'],
+        landmark=data['landmark'],
+        latitude=data['latitude'],
+        longitude=data['longitude'],
+        photo_path=data.get('photo_path'),
+        photo_hash=data.get('photo_hash'),
+        photo_width=data.get('photo_width'),
+        photo_height=data.get('photo_height'),
+        photo_bytes=data.get('photo_bytes'),
+        photo_file_id=data.get('photo_file_id')
+    )
+    session.add(new_entry)
+    session.flush()
+    _bump_counter(session, new_entry)
+    return new_entry
+
 def save_data(data: dict) -> bool:
     with Session() as session:
-        last_entry = session.query(UserData).filter(
-            UserData.telegram_id == data['telegram_id'],
-            UserData.created_at > datetime.utcnow() - timedelta(hours=24)
-        ).first()
-        
-        if last_entry:
-            logger.warning(f"Duplicate entry attempt for user {data['telegram_id']}")
-            return False
-        
-        new_entry = UserData(
-            telegram_id=data['telegram_id'],
-            full_name=data['full_name'],
-            username=data['username'],
-            phone_number=data['phone_number'],
-            institution_type=data['institution_type'],
-            institution_name=data['institution_name'],
-            address=data['address'],
-            landmark=data['landmark'],
-            latitude=data['latitude'],
-            longitude=data['longitude'],
-            photo_path=data.get('photo_path')
-        )
-        session.add(new_entry)
+        saved = _insert_entry(session, data) is not None
+        session.commit()
+    if saved:
+        logger.info("Data saved for user %s", data['telegram_id'])
+    return saved
+
+def save_data_batch(items: list[dict]) -> list[UserData | None]:
+    """Сохранить несколько заявок одной транзакцией (одна блокировка и один fsync).
+
+    Повторная заявка того же пользователя внутри пачки тоже отсекается:
+    предыдущая уже видна запросу после flush. Возвращает сохранённые записи
+    (уже отсоединённые от сессии) или None для отклонённых.
+    """
+    with Session(expire_on_commit=False) as session:
+        results = [_insert_entry(session, data) for data in items]
         session.commit()
-        logger.info(f"Data saved for user {data['telegram_id']}")
-        return True
+    logger.info("Batch saved: %s/%s entries", sum(r is not None for r in results), len(items))
+    return results
+
+def _bump_counter(session, entry: UserData):
+    """Увеличить счётчик дня/типа в той же транзакции, что и вставка"""
+    stmt = sqlite_insert(DailyCounter).values(
+        day=entry.created_at.date(), institution_type=entry.institution_type or '', count=1
+    )
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=[DailyCounter.day, DailyCounter.institution_type],
+        set_={'count': DailyCounter.count + 1}
+    ))
+
+def rebuild_counters():
+    """Пересчитать daily_counters одним GROUP BY по user_data"""
+    with Session() as session:
+        day = func.date(UserData.created_at)
+        rows = session.execute(
+            select(day, func.coalesce(UserData.institution_type, ''), func.count())
+            .group_by(day, UserData.institution_type)
+        ).all()
+        session.execute(delete(DailyCounter))
+        if rows:
+            session.execute(insert(DailyCounter), [
+                {'day': datetime.strptime(d, '%Y-%m-%d').date(), 'institution_type': t, 'count': c}
+                for d, t, c in rows if d
+            ])
+        session.commit()
+    logger.info("Daily counters rebuilt: %s rows", len(rows))
+
+def get_stats(days: int = 7) -> dict:
+    """Статистика из таблицы счётчиков: всего, по типам и по последним дням.
+
+    Таблица daily_counters маленькая (дни × типы), поэтому ответ не зависит
+    от размера user_data.
+    """
+    since = (datetime.utcnow() - timedelta(days=days - 1)).date()
+    with Session() as session:
+        by_type = dict(session.execute(
+            select(DailyCounter.institution_type, func.sum(DailyCounter.count))
+            .group_by(DailyCounter.institution_type)
+        ).all())
+        by_day = session.execute(
+            select(DailyCounter.day, DailyCounter.institution_type, DailyCounter.count)
+            .where(DailyCounter.day >= since)
+            .order_by(DailyCounter.day.desc())
+        ).all()
+
+    per_day = {}
+    for day, institution_type, count in by_day:
+        per_day.setdefault(day, {})[institution_type] = count
+    return {
+        'total': sum(by_type.values()),
+        'by_type': by_type,
+        'by_day': per_day,
+    }
 
 def get_all_data() -> list:
     with Session() as session:
         return session.query(UserData).all()
 
+class DataFilter:
+    """Фильтр выборки user_data для отчётов, выгрузок и просмотра.
+
+    Условия собираются в один SQL-фрагмент с именованными параметрами
+    (conditions()), поэтому и ORM-запросы, и чтение курсором драйвера
+    (utils/analytics.py, database/bulk.py) фильтруют на стороне SQLite.
+    created_before — граница «строго раньше». Объект передаётся в процесс
+    отчётов и хранится в FSM, поэтому он простой и сериализуется в dict.
+    """
+
+    FIELDS = ('institution_type', 'created_from', 'created_before', 'telegram_id', 'text')
+
+    def __init__(self, institution_type: str = None, created_from: datetime = None,
+                 created_before: datetime = None, telegram_id: int = None, text: str = None):
+        self.institution_type = institution_type
+        self.created_from = created_from
+        self.created_before = created_before
+        self.telegram_id = telegram_id
+        self.text = text
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, field) is not None for field in self.FIELDS)
+
+    def conditions(self) -> tuple[list[str], dict]:
+        """SQL-условия (для WHERE ... AND ...) и их параметры"""
+        clauses, params = [], {}
+        if self.institution_type is not None:
+            clauses.append("institution_type = :f_type")
+            params['f_type'] = self.institution_type
+        # created_at хранится строкой 'YYYY-MM-DD HH:MM:SS.ffffff', строки сравниваются как даты
+        if self.created_from is not None:
+            clauses.append("created_at >= :f_from")
+            params['f_from'] = self.created_from.strftime('%Y-%m-%d %H:%M:%S')
+        if self.created_before is not None:
+            clauses.append("created_at < :f_before")
+            params['f_before'] = self.created_before.strftime('%Y-%m-%d %H:%M:%S')
+        if self.telegram_id is not None:
+            clauses.append("telegram_id = :f_telegram_id")
+            params['f_telegram_id'] = self.telegram_id
+        if self.text:
+            clauses.append(
+                "(unicode_lower(institution_name) LIKE :f_text ESCAPE '\\' "
+                "OR unicode_lower(address) LIKE :f_text ESCAPE '\\')"
+            )
+            escaped = self.text.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params['f_text'] = f"%{escaped}%"
+        return clauses, params
+
+    def apply(self, query):
+        clauses, params = self.conditions()
+        if not clauses:
+            return query
+        return query.where(text(" AND ".join(clauses)).bindparams(**params))
+
+    def to_dict(self) -> dict:
+        data = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value.isoformat() if isinstance(value, datetime) else value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'DataFilter':
+        values = dict(data)
+        for field in ('created_from', 'created_before'):
+            if values.get(field):
+                values[field] = datetime.fromisoformat(values[field])
+        return cls(**values)
+
+    def key(self) -> str:
+        """Короткий стабильный ключ фильтра (для ключей отчётов и кэша документов)"""
+        return hashlib.sha1(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()[:10]
+
+    def describe(self) -> str:
+        parts = []
+        if self.institution_type is not None:
+            parts.append(f"тип: {self.institution_type}")
+        if self.created_from is not None:
+            parts.append(f"с {self.created_from.strftime('%d.%m.%Y')}")
+        if self.created_before is not None:
+            last_day = self.created_before - timedelta(microseconds=1)
+            parts.append(f"по {last_day.strftime('%d.%m.%Y')}")
+        if self.telegram_id is not None:
+            parts.append(f"Telegram ID {self.telegram_id}")
+        if self.text:
+            parts.append(f"текст «{self.text}»")
+        return ", ".join(parts) or "все записи"
+
+
+def _id_range(query, after_id: int = None, until_id: int = None):
+    if after_id is not None:
+        query = query.where(UserData.id > after_id)
+    if until_id is not None:
+        query = query.where(UserData.id <= until_id)
+    return query
+
+def _date_id_bounds(session, flt: DataFilter) -> tuple[int, int] | None:
+    """(min id, max id) записей в диапазоне дат фильтра по индексу created_at; None — записей нет"""
+    dates = DataFilter(created_from=flt.created_from, created_before=flt.created_before)
+    low, high = session.execute(dates.apply(select(func.min(UserData.id), func.max(UserData.id)))).one()
+    return None if low is None else (low, high)
+
+def _filtered(session, query, flt: DataFilter = None):
+    """Применить фильтр; диапазон дат дополнительно сужается до диапазона id.
+
+    id и created_at растут вместе, поэтому границы id внутри диапазона дат
+    ограничивают чтение по первичному ключу только нужным участком таблицы.
+    Само условие по датам остаётся в запросе, так что записи, загруженные
+    не по порядку, тоже отбираются верно.
+    """
+    if not flt:
+        return query
+    if flt.created_from is not None or flt.created_before is not None:
+        bounds = _date_id_bounds(session, flt)
+        if bounds is None:
+            return query.where(false())
+        query = query.where(UserData.id.between(*bounds))
+    return flt.apply(query)
+
+def count_data(after_id: int = None, until_id: int = None, flt: DataFilter = None) -> int:
+    with Session() as session:
+        query = _id_range(select(func.count(UserData.id)), after_id, until_id)
+        return session.scalar(_filtered(session, query, flt))
+
+def max_data_id() -> int:
+    with Session() as session:
+        return session.scalar(select(func.max(UserData.id))) or 0
+
+def iter_all_data(batch_size: int = 500, after_id: int = None, until_id: int = None,
+                  flt: DataFilter = None):
+    """Потоковое чтение user_data страницами по первичному ключу.
+
+    В отличие от get_all_data() не загружает всю таблицу в память. Каждая
+    страница — отдельный короткий запрос «id > последний прочитанный
+    ORDER BY id LIMIT batch_size» (keyset-пагинация): читаются только нужные
+    строки, а транзакция чтения не держится всё время экспорта.
+    after_id/until_id ограничивают выборку диапазоном (after_id, until_id],
+    flt — фильтр по полям.
+    """
+    if flt and (flt.created_from is not None or flt.created_before is not None):
+        # Границы id по датам считаются один раз, а не на каждой странице
+        with Session() as session:
+            bounds = _date_id_bounds(session, flt)
+        if bounds is None:
+            return
+        after_id = bounds[0] - 1 if after_id is None else max(after_id, bounds[0] - 1)
+        until_id = bounds[1] if until_id is None else min(until_id, bounds[1])
+
+    last_id = after_id
+    while True:
+        with Session() as session:
+            query = _id_range(select(UserData), last_id, until_id)
+            if flt:
+                query = flt.apply(query)
+            page = session.scalars(query.order_by(UserData.id).limit(batch_size)).all()
+        yield from page
+        if len(page) < batch_size:
+            return
+        last_id = page[-1].id
+
+def get_data_page(flt: DataFilter = None, after_id: int = None, until_id: int = None,
+                  limit: int = 20) -> list[UserData]:
+    """Страница записей с id > after_id по возрастанию id"""
+    with Session() as session:
+        query = _filtered(session, _id_range(select(UserData), after_id, until_id), flt)
+        return session.scalars(query.order_by(UserData.id).limit(limit)).all()
+
+def get_export_watermark(admin_id: int, report_kind: str) -> int:
+    """id последней записи, которую админ уже выгружал в этом формате (0 — ничего)"""
+    with Session() as session:
+        mark = session.get(ExportWatermark, (admin_id, report_kind))
+        return mark.last_id if mark else 0
+
+def set_export_watermark(admin_id: int, report_kind: str, last_id: int):
+    """Сдвинуть отметку выгрузки. Ключ — id (монотонный), дата хранится для справки."""
+    with Session() as session:
+        last_created_at = session.scalar(select(UserData.created_at).where(UserData.id == last_id))
+        mark = session.get(ExportWatermark, (admin_id, report_kind))
+        if mark is None:
+            mark = ExportWatermark(admin_id=admin_id, report_kind=report_kind)
+            session.add(mark)
+        mark.last_id = last_id
+        mark.last_created_at = last_created_at
+        session.commit()
+
 def get_user_data(telegram_id: int) -> UserData:
     with Session() as session:
         return session.query(UserData).filter(UserData.telegram_id == telegram_id).order_by(UserData.created_at.desc()).first()
 
-def backup_db():
-    backup_path = f"{DB_PATH}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    shutil.copy(DB_PATH, backup_path)
-    logger.info(f"DB backed up to {backup_path}")
+def get_data_by_id(record_id: int) -> UserData | None:
+    with Session() as session:
+        return session.get(UserData, record_id)
+
+def set_photo_file_id(record_id: int, file_id: str):
+    """Запомнить file_id, который Telegram вернул после первой загрузки фото"""
+    with Session() as session:
+        session.execute(update(UserData).where(UserData.id == record_id).values(photo_file_id=file_id))
+        session.commit()
 
 def can_add_data(telegram_id: int) -> bool:
     with Session() as session:
         last_entry = session.query(UserData).filter(
             UserData.telegram_id == telegram_id,
-            UserData.created_at > datetime.utcnow() - timedelta(hours=24)
+            UserData.created_at > datetime.utcnow() - SUBMISSION_COOLDOWN
         ).first()
-        return last_entry is None
\ No newline at end of file
+        return last_entry is None
+
+def broadcast_recipients(after_telegram_id: int = 0, limit: int = 100) -> list[int]:
+    """Следующая порция уникальных telegram_id по возрастанию (по индексу telegram_id)"""
+    with Session() as session:
+        return list(session.scalars(
+            select(UserData.telegram_id).distinct()
+            .where(UserData.telegram_id > after_telegram_id)
+            .order_by(UserData.telegram_id)
+            .limit(limit)
+        ))
+
+def count_broadcast_recipients(after_telegram_id: int = 0) -> int:
+    with Session() as session:
+        return session.scalar(
+            select(func.count(UserData.telegram_id.distinct()))
+            .where(UserData.telegram_id > after_telegram_id)
+        )
+
+def create_broadcast(admin_id: int, text: str, owner: str = None) -> Broadcast:
+    with Session(expire_on_commit=False) as session:
+        broadcast = Broadcast(admin_id=admin_id, text=text, total=count_broadcast_recipients(), owner=owner)
+        session.add(broadcast)
+        session.commit()
+        return broadcast
+
+def claim_broadcast(broadcast_id: int, owner: str, lease: timedelta) -> bool:
+    """Атомарно захватить незавершённую рассылку: свободную или брошенную владельцем.
+
+    Владелец считается пропавшим, если не сохранял прогресс дольше lease.
+    True — рассылка теперь принадлежит owner и её можно продолжать.
+    """
+    now = datetime.utcnow()
+    with Session() as session:
+        result = session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.status == 'running')
+            .where(or_(Broadcast.owner.is_(None), Broadcast.owner == owner, Broadcast.updated_at < now - lease))
+            .values(owner=owner, updated_at=now)
+        )
+        session.commit()
+        return result.rowcount == 1
+
+def checkpoint_broadcast(broadcast_id: int, owner: str, **fields) -> str | None:
+    """Сохранить прогресс рассылки (контрольная точка) и продлить захват.
+
+    Возвращает текущий статус ('running', 'cancelled'); None — рассылку
+    перехватил другой процесс, и этот должен остановиться.
+    """
+    with Session() as session:
+        status = session.scalar(
+            update(Broadcast).where(Broadcast.id == broadcast_id, Broadcast.owner == owner)
+            .values(updated_at=datetime.utcnow(), **fields)
+            .returning(Broadcast.status)
+        )
+        session.commit()
+        return status
+
+def finish_broadcast(broadcast_id: int, owner: str) -> str | None:
+    """Отметить рассылку завершённой, если её не отменили, и освободить захват.
+
+    Возвращает итоговый статус ('done', 'cancelled'); None — рассылка уже чужая.
+    """
+    with Session() as session:
+        status = session.scalar(
+            update(Broadcast).where(Broadcast.id == broadcast_id, Broadcast.owner == owner)
+            .values(
+                status=case((Broadcast.status == 'running', 'done'), else_=Broadcast.status),
+                owner=None, updated_at=datetime.utcnow(),
+            )
+            .returning(Broadcast.status)
+        )
+        session.commit()
+        return status
+
+def release_broadcast(broadcast_id: int, owner: str):
+    """Отпустить захват без завершения: рассылку продолжит следующий запуск"""
+    with Session() as session:
+        session.execute(
+            update(Broadcast).where(Broadcast.id == broadcast_id, Broadcast.owner == owner)
+            .values(owner=None)
+        )
+        session.commit()
+
+def cancel_broadcast(broadcast_id: int) -> bool:
+    """Отменить идущую рассылку; владелец увидит статус на следующей контрольной точке"""
+    with Session() as session:
+        result = session.execute(
+            update(Broadcast).where(Broadcast.id == broadcast_id, Broadcast.status == 'running')
+            .values(status='cancelled', updated_at=datetime.utcnow())
+        )
+        session.commit()
+        return result.rowcount == 1
+
+def get_unfinished_broadcasts() -> list[Broadcast]:
+    with Session(expire_on_commit=False) as session:
+        return list(session.scalars(
+            select(Broadcast).where(Broadcast.status == 'running').order_by(Broadcast.id)
+        ))
+
+def find_nearby(latitude: float, longitude: float, radius_m: float, limit: int = None,
+                exclude_id: int = None) -> list[tuple[UserData, float]]:
+    """Учреждения в радиусе radius_m метров, ближайшие первыми: [(запись, расстояние)].
+
+    Кандидаты отбираются по R*Tree-индексу user_data_geo внутри прямоугольника
+    вокруг точки, точное расстояние считается только для них.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_m)
+    with Session(expire_on_commit=False) as session:
+        candidate_ids = select(text("id")).select_from(text("user_data_geo")).where(
+            text("min_lat <= :max_lat AND max_lat >= :min_lat AND min_lon <= :max_lon AND max_lon >= :min_lon")
+        )
+        candidates = session.scalars(
+            select(UserData).where(UserData.id.in_(candidate_ids)),
+            {'min_lat': min_lat, 'max_lat': max_lat, 'min_lon': min_lon, 'max_lon': max_lon},
+        ).all()
+
+    found = []
+    for record in candidates:
+        if record.id == exclude_id:
+            continue
+        distance = haversine_m(latitude, longitude, record.latitude, record.longitude)
+        if distance <= radius_m:
+            found.append((record, distance))
+    found.sort(key=lambda item: item[1])
+    return found[:limit] if limit else found
+
+def search_data(match: str, before_id: int = None, limit: int = 20) -> list[UserData]:
+    """Записи под FTS5-запросом match (utils.search.match_query), новые первыми.
+
+    Страницы листаются по ключу: before_id — id последней записи прошлой
+    страницы. FTS5 отдаёт совпадения по убыванию rowid прямо из индекса,
+    поэтому страница не зависит ни от размера таблицы, ни от числа совпадений.
+    """
+    sql = "SELECT rowid FROM user_data_fts WHERE user_data_fts MATCH :match"
+    params = {'match': match, 'limit': limit}
+    if before_id is not None:
+        sql += " AND rowid < :before_id"
+        params['before_id'] = before_id
+    sql += " ORDER BY rowid DESC LIMIT :limit"
+
+    with Session() as session:
+        ids = session.scalars(text(sql), params).all()
+        if not ids:
+            return []
+        records = {record.id: record for record in session.scalars(select(UserData).where(UserData.id.in_(ids)))}
+    return [records[record_id] for record_id in ids if record_id in records]
+
+def count_search(match: str) -> int:
+    with Session() as session:
+        return session.scalar(
+            text("SELECT count(*) FROM user_data_fts WHERE user_data_fts MATCH :match"), {'match': match}
+        )
+
+def find_duplicate_locations(radius_m: float = 50) -> list[tuple[UserData, UserData, float]]:
+    """Пары учреждений ближе radius_m метров друг к другу: [(запись, запись, расстояние)].
+
+    Самосоединение R*Tree: для каждой точки индекс отдаёт только соседей из
+    маленького прямоугольника, поэтому сравнений порядка n·log n, а не n².
+    """
+    with Session(expire_on_commit=False) as session:
+        max_abs_lat = session.scalar(text("SELECT max(max(abs(min_lat)), max(abs(max_lat))) FROM user_data_geo"))
+        if max_abs_lat is None:
+            return []
+        dlat = lat_delta(radius_m)
+        # Одна полуширина по долготе на всю выборку — берём самую широкую (ближе к полюсу)
+        dlon = lon_delta(radius_m, max_abs_lat + dlat)
+        pairs = session.execute(text(
+            "SELECT a.id, b.id FROM user_data_geo AS a JOIN user_data_geo AS b "
+            "ON b.id > a.id "
+            "AND b.min_lat <= a.max_lat + :dlat AND b.max_lat >= a.min_lat - :dlat "
+            "AND b.min_lon <= a.max_lon + :dlon AND b.max_lon >= a.min_lon - :dlon"
+        ), {'dlat': dlat, 'dlon': dlon}).all()
+        ids = {record_id for pair in pairs for record_id in pair}
+        records = {r.id: r for r in session.scalars(select(UserData).where(UserData.id.in_(ids)))} if ids else {}
+
+    duplicates = []
+    for first_id, second_id in pairs:
+        first, second = records[first_id], records[second_id]
+        distance = haversine_m(first.latitude, first.longitude, second.latitude, second.longitude)
+        if distance <= radius_m:
+            duplicates.append((first, second, distance))
+    duplicates.sort(key=lambda item: item[2])
+    return duplicates
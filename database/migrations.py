@@ -0,0 +1,177 @@
+"""Версионированные миграции схемы SQLite.
+
+Номер последней применённой миграции хранится в PRAGMA user_version самого
+файла БД, поэтому рабочая база обновляется на месте при старте бота.
+Каждая миграция выполняется в своей транзакции вместе с записью версии и
+должна быть идемпотентной: свежая база сначала получает полную схему через
+create_all, а затем проходит все миграции по порядку.
+"""
+import logging
+
+from sqlalchemy import text
+
+from .models import Base, Broadcast
+
+logger = logging.getLogger(__name__)
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    rows = conn.exec_driver_sql(f"PRAGMA table_info({table})").all()
+    return any(row[1] == column for row in rows)
+
+
+def add_column(conn, table: str, column: str, ddl: str):
+    """ALTER TABLE ADD COLUMN, если колонки ещё нет"""
+    if not _has_column(conn, table, column):
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def _initial_schema(conn):
+    # Создаёт недостающие таблицы, существующие данные не трогает
+    Base.metadata.create_all(conn)
+
+
+def _user_data_telegram_created_index(conn):
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_user_data_telegram_created "
+        "ON user_data (telegram_id, created_at)"
+    )
+
+
+def _backfill_daily_counters(conn):
+    # Счётчики статистики появились позже самих данных
+    if conn.execute(text("SELECT 1 FROM daily_counters LIMIT 1")).first():
+        return
+    conn.exec_driver_sql(
+        "INSERT INTO daily_counters (day, institution_type, count) "
+        "SELECT date(created_at), coalesce(institution_type, ''), count(*) "
+        "FROM user_data WHERE created_at IS NOT NULL "
+        "GROUP BY date(created_at), coalesce(institution_type, '')"
+    )
+
+
+def _photo_metadata_columns(conn):
+    add_column(conn, 'user_data', 'photo_hash', 'VARCHAR')
+    add_column(conn, 'user_data', 'photo_width', 'INTEGER')
+    add_column(conn, 'user_data', 'photo_height', 'INTEGER')
+    add_column(conn, 'user_data', 'photo_bytes', 'INTEGER')
+
+
+def _photo_file_id_column(conn):
+    add_column(conn, 'user_data', 'photo_file_id', 'VARCHAR')
+
+
+def _broadcasts_table(conn):
+    Broadcast.__table__.create(conn, checkfirst=True)
+
+
+def _user_data_geo_index(conn):
+    # R*Tree по координатам; ведётся триггерами, поэтому любая вставка
+    # (save_data, пакетная запись, импорт) сразу попадает в индекс
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS user_data_geo "
+        "USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS user_data_geo_insert AFTER INSERT ON user_data "
+        "WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN "
+        "INSERT INTO user_data_geo VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude); "
+        "END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS user_data_geo_update AFTER UPDATE OF latitude, longitude ON user_data BEGIN "
+        "DELETE FROM user_data_geo WHERE id = old.id; "
+        "INSERT INTO user_data_geo SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude "
+        "WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL; "
+        "END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS user_data_geo_delete AFTER DELETE ON user_data BEGIN "
+        "DELETE FROM user_data_geo WHERE id = old.id; "
+        "END"
+    )
+    conn.exec_driver_sql(
+        "INSERT OR REPLACE INTO user_data_geo "
+        "SELECT id, latitude, latitude, longitude, longitude FROM user_data "
+        "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    )
+
+
+def _user_data_filter_indexes(conn):
+    # Индекс по одному столбцу хранит и rowid, поэтому «тип = ? AND id > ? ORDER BY id»
+    # читается по нему без сортировки
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_user_data_type ON user_data (institution_type)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_user_data_created ON user_data (created_at)")
+
+
+def _user_data_fts_index(conn):
+    # Полнотекстовый индекс FTS5 по названию, адресу и ориентиру. Хранит только
+    # индекс (content='user_data'), текст читается из самой таблицы. unicode61
+    # приводит к нижнему регистру и кириллицу; prefix ускоряет поиск по началу слова.
+    # Ведётся триггерами, как и user_data_geo
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS user_data_fts USING fts5("
+        "institution_name, address, landmark, content='user_data', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS user_data_fts_insert AFTER INSERT ON user_data BEGIN "
+        "INSERT INTO user_data_fts (rowid, institution_name, address, landmark) "
+        "VALUES (new.id, new.institution_name, new.address, new.landmark); "
+        "END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS user_data_fts_update "
+        "AFTER UPDATE OF institution_name, address, landmark ON user_data BEGIN "
+        "INSERT INTO user_data_fts (user_data_fts, rowid, institution_name, address, landmark) "
+        "VALUES ('delete', old.id, old.institution_name, old.address, old.landmark); "
+        "INSERT INTO user_data_fts (rowid, institution_name, address, landmark) "
+        "VALUES (new.id, new.institution_name, new.address, new.landmark); "
+        "END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS user_data_fts_delete AFTER DELETE ON user_data BEGIN "
+        "INSERT INTO user_data_fts (user_data_fts, rowid, institution_name, address, landmark) "
+        "VALUES ('delete', old.id, old.institution_name, old.address, old.landmark); "
+        "END"
+    )
+    conn.exec_driver_sql("INSERT INTO user_data_fts (user_data_fts) VALUES ('rebuild')")
+
+
+def _broadcast_owner_column(conn):
+    add_column(conn, 'broadcasts', 'owner', 'VARCHAR')
+
+
+# (версия, описание, функция) — только дописывать в конец, не переставлять
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "user_data (telegram_id, created_at) index", _user_data_telegram_created_index),
+    (3, "backfill daily_counters", _backfill_daily_counters),
+    (4, "user_data photo metadata columns", _photo_metadata_columns),
+    (5, "user_data photo_file_id column", _photo_file_id_column),
+    (6, "broadcasts table", _broadcasts_table),
+    (7, "user_data_geo R*Tree index", _user_data_geo_index),
+    (8, "user_data type and created_at indexes", _user_data_filter_indexes),
+    (9, "user_data_fts full-text index", _user_data_fts_index),
+    (10, "broadcasts owner column", _broadcast_owner_column),
+]
+
+
+def schema_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(engine) -> int:
+    """Применить все недостающие миграции, вернуть итоговую версию схемы"""
+    with engine.connect() as conn:
+        current = schema_version(conn)
+
+    for version, description, upgrade in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+        logger.info("Migration %s applied: %s", version, description)
+        current = version
+    return current
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, Index, Text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -6,6 +6,13 @@ Base = declarative_base()
 
 class UserData(Base):
     __tablename__ = 'user_data'
+    __table_args__ = (
+        # Лимит «раз в 24 часа» и последняя запись пользователя ищутся по этому индексу
+        Index('ix_user_data_telegram_created', 'telegram_id', 'created_at'),
+        # Фильтры отчётов (DataFilter): тип + id по порядку и диапазон дат
+        Index('ix_user_data_type', 'institution_type'),
+        Index('ix_user_data_created', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     telegram_id = Column(Integer, nullable=False)
@@ -20,3 +27,50 @@ class UserData(Base):
     longitude = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
     photo_path = Column(String, nullable=True)
+    # Метаданные сохранённого фото (заполняются при приёме, см. utils/photos.py)
+    photo_hash = Column(String, nullable=True)
+    photo_width = Column(Integer, nullable=True)
+    photo_height = Column(Integer, nullable=True)
+    photo_bytes = Column(Integer, nullable=True)
+    # file_id фото на серверах Telegram: повторная отправка без загрузки файла
+    photo_file_id = Column(String, nullable=True)
+
+
+class ExportWatermark(Base):
+    """До какой записи каждый админ уже выгружал каждый вид отчёта"""
+    __tablename__ = 'export_watermarks'
+
+    admin_id = Column(Integer, primary_key=True)
+    report_kind = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    last_created_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DailyCounter(Base):
+    """Счётчик заявок по дням и типам учреждений, ведётся в save_data"""
+    __tablename__ = 'daily_counters'
+
+    day = Column(Date, primary_key=True)
+    institution_type = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class Broadcast(Base):
+    """Рассылка админа всем пользователям; прогресс сохраняется по ходу отправки"""
+    __tablename__ = 'broadcasts'
+
+    id = Column(Integer, primary_key=True)
+    admin_id = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)  # HTML
+    status = Column(String, nullable=False, default='running')  # running / done / cancelled
+    total = Column(Integer, nullable=False, default=0)
+    delivered = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    # Получатели идут по возрастанию telegram_id; все до этого id уже обработаны
+    last_telegram_id = Column(Integer, nullable=False, default=0)
+    # Процесс, который сейчас отправляет рассылку (BroadcastRunner.owner); NULL — никто.
+    # Захват истекает, если владелец долго не сохранял прогресс (updated_at)
+    owner = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
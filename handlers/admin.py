@@ -1,91 +1,440 @@
 from aiogram import Router, F
-from aiogram.types import Message, FSInputFile  # ← ДОБАВИЛИ ИМПОРТ!
-from config import ADMINS
-from utils.exporter import export_to_excel, export_to_word
-from database.db import get_all_data
+from aiogram.filters import Command, CommandObject
+from aiogram import Bot
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
+from aiogram.fsm.context import FSMContext
+from config import ADMINS, DUPLICATE_RADIUS_M, NEARBY_DEFAULT_KM, NEARBY_LIMIT, FIND_PAGE_SIZE
+from states.form import BroadcastForm
+from utils.broadcast import broadcaster
+from utils.replies import ReplyComposer
+from utils.geo import parse_coordinates
+from utils.filters import parse_filter, FILTER_HELP
+from utils.search import match_query
+from handlers.user_form import send_user_photo, CAPTION_LIMIT
+from utils.reports import report_jobs, ReportCancelled
+from database.async_db import (
+    get_stats, get_export_watermark, set_export_watermark, max_data_id,
+    find_nearby, find_duplicate_locations, bulk_dump, bulk_load, count_data, get_data_page,
+    search_data, count_search, get_data_by_id,
+)
+from database.db import DataFilter
+from database.bulk import EXTENSIONS as BULK_FORMATS
+from database.cache import user_cache
 from keyboards.reply import admin_keyboard, main_menu_keyboard, back_to_admin_keyboard
+from keyboards.inline import broadcast_confirm_keyboard
 from datetime import datetime
 import logging
 import os
+import uuid
 
 logger = logging.getLogger(__name__)
 router = Router()
 
 @router.message(F.text == '/start', F.from_user.id.in_(ADMINS))
-async def admin_start_handler(message: Message):
-    await message.answer("👑 **Панель администратора СЭС**")
-    await message.answer("Выберите действие:", reply_markup=admin_keyboard)
+async def admin_start_handler(message: Message, reply: ReplyComposer):
+    reply.add("👑 **Панель администратора СЭС**")
+    reply.add("Выберите действие:", reply_markup=admin_keyboard)
 
-# 🔥 ИСПРАВЛЕННЫЙ ОБРАБОТЧИК EXCEL
-@router.message(F.text.contains("Excel"))
-async def export_excel_handler(message: Message):
-    logger.info(f"🎉 EXCEL НАЖАТА: '{message.text}'!")
-    await message.answer("📊 Создаю Excel-отчёт...")
-    
-    file_path = export_to_excel()
-    
-    if file_path and os.path.exists(file_path):
-        # ✅ ИСПОЛЬЗУЕМ FSInputFile вместо open()
-        document = FSInputFile(file_path)
-        total = len(get_all_data())
-        
-        await message.answer_document(
-            document,
-            caption=f"✅ **Отчёт СЭС** | {total} учреждений"
+# 📣 РАССЫЛКА (до остальных обработчиков: текст рассылки может содержать «Excel» и т.п.)
+@router.message(F.text == "📣 Рассылка", F.from_user.id.in_(ADMINS))
+async def broadcast_start_handler(message: Message, state: FSMContext):
+    if await broadcaster.is_running():
+        await message.answer("⏳ Предыдущая рассылка ещё идёт. Дождитесь её окончания или остановите её.")
+        return
+    await state.set_state(BroadcastForm.waiting_for_text)
+    await message.answer(
+        "📣 Пришлите текст рассылки. Его получат все пользователи, которые заполняли анкету.\n"
+        "Перед отправкой я покажу, как сообщение будет выглядеть.",
+        reply_markup=back_to_admin_keyboard
+    )
+
+@router.message(BroadcastForm.waiting_for_text, F.text != "🏠 Админ-панель", F.text)
+async def broadcast_text_handler(message: Message, state: FSMContext):
+    await state.update_data(text=message.html_text)
+    await state.set_state(BroadcastForm.confirmation)
+    # Предпросмотр — ровно то сообщение, которое получат пользователи
+    await message.answer(message.html_text, parse_mode='HTML', reply_markup=broadcast_confirm_keyboard)
+
+@router.callback_query(BroadcastForm.confirmation, F.data == "broadcast_confirm", F.from_user.id.in_(ADMINS))
+async def broadcast_confirm_handler(callback_query: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    await state.clear()
+    await callback_query.message.edit_reply_markup(reply_markup=None)
+    if await broadcaster.is_running():
+        await callback_query.answer("Предыдущая рассылка ещё идёт", show_alert=True)
+        return
+    broadcast_id = await broadcaster.start(callback_query.bot, callback_query.from_user.id, data['text'])
+    await callback_query.answer(f"Рассылка #{broadcast_id} запущена")
+
+@router.callback_query(F.data == "broadcast_drop", F.from_user.id.in_(ADMINS))
+async def broadcast_drop_handler(callback_query: CallbackQuery, state: FSMContext):
+    await state.clear()
+    await callback_query.answer("Рассылка отменена")
+    await callback_query.message.edit_text("✖️ Рассылка отменена")
+
+@router.callback_query(F.data.startswith("broadcast_cancel:"), F.from_user.id.in_(ADMINS))
+async def broadcast_cancel_handler(callback_query: CallbackQuery):
+    broadcast_id = int(callback_query.data.split(":", 1)[1])
+    if await broadcaster.cancel(broadcast_id):
+        await callback_query.answer("Останавливаю рассылку...")
+    else:
+        await callback_query.answer("Эта рассылка уже не идёт")
+
+def format_distance(meters: float) -> str:
+    return f"{meters:.0f} м" if meters < 1000 else f"{meters / 1000:.1f} км"
+
+# 📍 УЧРЕЖДЕНИЯ РЯДОМ С ТОЧКОЙ: /nearby <широта> <долгота> [радиус, км]
+@router.message(Command("nearby"), F.from_user.id.in_(ADMINS))
+async def nearby_handler(message: Message, command: CommandObject):
+    args = (command.args or "").replace(',', ' ').split()
+    coordinates = parse_coordinates(" ".join(args[:2]))
+    try:
+        radius_km = float(args[2]) if len(args) > 2 else NEARBY_DEFAULT_KM
+    except ValueError:
+        coordinates = None
+    if coordinates is None:
+        await message.answer(f"Формат: /nearby <широта> <долгота> [радиус, км]\nНапример: /nearby 41.311 69.279 {NEARBY_DEFAULT_KM:g}")
+        return
+
+    found = await find_nearby(*coordinates, radius_km * 1000, limit=NEARBY_LIMIT)
+    if not found:
+        await message.answer(f"📍 В радиусе {radius_km:g} км учреждений нет")
+        return
+    lines = [
+        f"{i}. {record.institution_name} ({record.institution_type}) — {format_distance(distance)}\n   {record.address}"
+        for i, (record, distance) in enumerate(found, 1)
+    ]
+    await message.answer(f"📍 Учреждения в радиусе {radius_km:g} км (ближайшие {len(found)}):\n\n" + "\n".join(lines))
+
+# 👯 ВОЗМОЖНЫЕ ДУБЛИ: учреждения ближе N метров друг к другу
+@router.message(Command("duplicates"), F.from_user.id.in_(ADMINS))
+async def duplicates_handler(message: Message, command: CommandObject):
+    try:
+        radius_m = float(command.args) if command.args else DUPLICATE_RADIUS_M
+    except ValueError:
+        await message.answer(f"Формат: /duplicates [радиус, м], по умолчанию {DUPLICATE_RADIUS_M}")
+        return
+
+    pairs = await find_duplicate_locations(radius_m)
+    if not pairs:
+        await message.answer(f"👯 Учреждений ближе {radius_m:g} м друг к другу нет")
+        return
+    lines = [
+        f"• #{a.id} {a.institution_name} ↔ #{b.id} {b.institution_name} — {format_distance(distance)}"
+        for a, b, distance in pairs[:NEARBY_LIMIT]
+    ]
+    more = f"\n…и ещё {len(pairs) - NEARBY_LIMIT}" if len(pairs) > NEARBY_LIMIT else ""
+    await message.answer(f"👯 Возможные дубли (ближе {radius_m:g} м): {len(pairs)}\n\n" + "\n".join(lines) + more)
+
+# 📦 СЫРАЯ ВЫГРУЗКА user_data: /dump [csv|csv.gz|columns] [фильтры]
+@router.message(Command("dump"), F.from_user.id.in_(ADMINS))
+async def dump_handler(message: Message, command: CommandObject):
+    fmt, _, filter_args = (command.args or "").strip().partition(" ")
+    if "=" in fmt:
+        fmt, filter_args = "", command.args
+    fmt = fmt or "csv.gz"
+    try:
+        if fmt not in BULK_FORMATS:
+            raise ValueError(f"Неизвестный формат «{fmt}»")
+        flt = parse_filter(filter_args)
+    except ValueError as e:
+        await message.answer(f"{e}\n\nФормат: /dump [{'|'.join(BULK_FORMATS)}] [фильтры], по умолчанию csv.gz\n{FILTER_HELP}")
+        return
+
+    status = await message.answer(f"📦 Выгружаю данные ({fmt}, {flt.describe()})...")
+    try:
+        path, total = await bulk_dump(fmt, flt)
+    except Exception as e:
+        logger.error("Dump failed: %s", e)
+        await status.edit_text("❌ Ошибка при выгрузке данных")
+        return
+    if not path:
+        await status.edit_text("❌ Нет данных для выгрузки")
+        return
+    try:
+        await message.answer_document(FSInputFile(path), caption=f"📦 user_data | {total} записей")
+    finally:
+        os.remove(path)
+    await status.edit_text(f"✅ Выгружено записей: {total}")
+
+# 📥 ЗАГРУЗКА ВЫГРУЗКИ: документ с подписью /import [new] (new — как новые записи, без исходных id)
+@router.message(Command("import"), F.document, F.from_user.id.in_(ADMINS))
+async def import_handler(message: Message, command: CommandObject, bot: Bot):
+    name = message.document.file_name or ""
+    if not name.endswith(tuple(BULK_FORMATS.values())):
+        await message.answer(f"Пришлите файл выгрузки /dump ({', '.join(BULK_FORMATS.values())}) с подписью /import")
+        return
+
+    keep_ids = (command.args or "").strip() != "new"
+    status = await message.answer("📥 Загружаю данные...")
+    # Расширение сохраняем: по нему load() определяет формат
+    tmp_path = f".import_{uuid.uuid4().hex}_{os.path.basename(name)}"
+    try:
+        await bot.download(message.document, destination=tmp_path)
+        inserted, skipped = await bulk_load(tmp_path, keep_ids)
+    except ValueError as e:
+        await status.edit_text(f"❌ {e}")
+        return
+    except Exception as e:
+        logger.error("Import of %s failed: %s", name, e)
+        await status.edit_text("❌ Ошибка при загрузке данных")
+        return
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if inserted:
+        report_jobs.invalidate()
+    await status.edit_text(f"✅ Загружено записей: {inserted}, пропущено (id уже есть): {skipped}")
+
+def report_cancel_keyboard(key: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="⛔ Отменить", callback_data=f"report_cancel:{key}")]
+    ])
+
+async def run_report(message: Message, kind: str, title: str, new_only: bool = False,
+                     flt: DataFilter = None):
+    """Запускает сборку отчёта в фоне и показывает прогресс в одном сообщении.
+
+    Статус, прогресс и итог — правки одного и того же сообщения; отдельно
+    отправляется только сам документ. new_only — выгрузить только записи,
+    появившиеся после прошлого экспорта этого админа; flt — только записи
+    под фильтром (такой отчёт не сдвигает отметку «новых записей»).
+    """
+    admin_id = message.from_user.id
+    after_id = await get_export_watermark(admin_id, kind) if new_only else None
+    key = report_jobs.job_key(kind, after_id, flt)
+
+    if report_jobs.is_running(key):
+        title = f"{title}\n⏳ Такой отчёт уже собирается — пришлю его, как только будет готов."
+    status = await message.answer(title, reply_markup=report_cancel_keyboard(key))
+
+    try:
+        files, _, until_id = await report_jobs.submit(
+            kind, status, after_id=after_id, current_max_id=await max_data_id(), flt=flt
         )
-        
-        # Удаляем файл после отправки
-        os.remove(file_path)
-        logger.info(f"Excel файл отправлен и удален: {file_path}")
+    except ReportCancelled:
+        await status.edit_text("⛔ Сборка отчёта отменена")
+        return
+    except Exception as e:
+        logger.error("Report %s failed: %s", key, e)
+        await status.edit_text("❌ Ошибка при создании отчёта")
+        return
+
+    if files:
+        if not flt:
+            # Следующая выгрузка «новых записей» начнётся после этого отчёта
+            await set_export_watermark(admin_id, kind, until_id)
+        await status.edit_text(f"✅ Готово: {report_jobs.title(kind, after_id, flt)}")
+    elif flt:
+        await status.edit_text(f"🔎 Под фильтр ({flt.describe()}) записей нет")
+    elif new_only:
+        await status.edit_text("🆕 Новых записей с прошлого экспорта нет")
     else:
-        await message.answer("❌ Нет данных для экспорта")
-    
-    await message.answer("✅ Готово!", reply_markup=back_to_admin_keyboard)
+        await status.edit_text("❌ Нет данных для экспорта")
+
+# 🔎 ОТЧЁТ ПО ФИЛЬТРУ: /report excel|word [фильтры] (до общих обработчиков Excel/Word)
+@router.message(Command("report"), F.from_user.id.in_(ADMINS))
+async def filtered_report_handler(message: Message, command: CommandObject):
+    kind, _, filter_args = (command.args or "").strip().partition(" ")
+    kind = {'excel': 'excel', 'word': 'word'}.get(kind.lower())
+    try:
+        if kind is None:
+            raise ValueError("Укажите формат: excel или word")
+        flt = parse_filter(filter_args)
+    except ValueError as e:
+        await message.answer(f"{e}\n\nФормат: /report excel|word [фильтры]\nНапример: /report excel тип=вуз дней=7\n{FILTER_HELP}")
+        return
+    await run_report(message, kind, f"🔎 Собираю отчёт: {flt.describe()}...", flt=flt or None)
+
+# 🔎 ПРОСМОТР ЗАПИСЕЙ ПО ФИЛЬТРУ: /find [фильтры], страницы листаются кнопкой
+def find_page_keyboard(last_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="Далее ▶", callback_data=f"find_next:{last_id}")]
+    ])
+
+async def send_find_page(message: Message, flt: DataFilter, after_id: int = None):
+    # На страницу берётся на одну запись больше: так видно, есть ли следующая
+    page = await get_data_page(flt, after_id=after_id, limit=FIND_PAGE_SIZE + 1)
+    has_more = len(page) > FIND_PAGE_SIZE
+    page = page[:FIND_PAGE_SIZE]
+    if not page:
+        await message.answer(f"🔎 Под фильтр ({flt.describe()}) записей нет")
+        return
+
+    header = f"🔎 {flt.describe()}"
+    if after_id is None:
+        header += f" — найдено: {await count_data(flt)}"
+    lines = [
+        f"#{record.id} {record.institution_name} ({record.institution_type or '—'})\n"
+        f"   {record.address or '—'}, {record.created_at.strftime('%d.%m.%Y') if record.created_at else '—'}"
+        for record in page
+    ]
+    await message.answer(
+        header + "\n\n" + "\n".join(lines),
+        reply_markup=find_page_keyboard(page[-1].id) if has_more else None,
+    )
+
+@router.message(Command("find"), F.from_user.id.in_(ADMINS))
+async def find_handler(message: Message, command: CommandObject, state: FSMContext):
+    try:
+        flt = parse_filter(command.args)
+    except ValueError as e:
+        await message.answer(f"{e}\n\nФормат: /find [фильтры]\n{FILTER_HELP}")
+        return
+    # Фильтр не влезает в callback_data (64 байта) — храним его в данных FSM
+    await state.update_data(find_filter=flt.to_dict())
+    await send_find_page(message, flt)
+
+@router.callback_query(F.data.startswith("find_next:"), F.from_user.id.in_(ADMINS))
+async def find_next_handler(callback_query: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    if 'find_filter' not in data:
+        await callback_query.answer("Поиск устарел, повторите /find")
+        return
+    await callback_query.answer()
+    await callback_query.message.edit_reply_markup(reply_markup=None)
+    after_id = int(callback_query.data.split(":", 1)[1])
+    await send_find_page(callback_query.message, DataFilter.from_dict(data['find_filter']), after_id)
+
+# 🔍 ПОЛНОТЕКСТОВЫЙ ПОИСК: /search <слова> по названию, адресу и ориентиру
+def search_page_keyboard(records: list, next_before_id: int | None) -> InlineKeyboardMarkup:
+    # Кнопки с номерами открывают карточку записи, «Далее» — следующую страницу
+    numbers = [
+        InlineKeyboardButton(text=str(i), callback_data=f"search_open:{record.id}")
+        for i, record in enumerate(records, 1)
+    ]
+    rows = [numbers[i:i + 5] for i in range(0, len(numbers), 5)]
+    if next_before_id is not None:
+        rows.append([InlineKeyboardButton(text="Далее ▶", callback_data=f"search_next:{next_before_id}")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+async def send_search_page(message: Message, query: str, before_id: int = None):
+    match = match_query(query)
+    page = await search_data(match, before_id=before_id, limit=FIND_PAGE_SIZE + 1)
+    has_more = len(page) > FIND_PAGE_SIZE
+    page = page[:FIND_PAGE_SIZE]
+    if not page:
+        await message.answer(f"🔍 По запросу «{query}» ничего не найдено")
+        return
+
+    header = f"🔍 «{query}»"
+    if before_id is None:
+        header += f" — найдено: {await count_search(match)}"
+    lines = [
+        f"{i}. #{record.id} {record.institution_name} ({record.institution_type or '—'})\n"
+        f"   {record.address or '—'}" + (f"; {record.landmark}" if record.landmark else "")
+        for i, record in enumerate(page, 1)
+    ]
+    await message.answer(
+        header + "\n\n" + "\n".join(lines),
+        reply_markup=search_page_keyboard(page, page[-1].id if has_more else None),
+    )
+
+@router.message(Command("search"), F.from_user.id.in_(ADMINS))
+async def search_handler(message: Message, command: CommandObject, state: FSMContext):
+    query = (command.args or "").strip()
+    if match_query(query) is None:
+        await message.answer("Формат: /search <часть названия, адреса или ориентира>\nНапример: /search лицей юнусабад")
+        return
+    await state.update_data(search_query=query)
+    await send_search_page(message, query)
+
+@router.callback_query(F.data.startswith("search_next:"), F.from_user.id.in_(ADMINS))
+async def search_next_handler(callback_query: CallbackQuery, state: FSMContext):
+    query = (await state.get_data()).get('search_query')
+    if not query:
+        await callback_query.answer("Поиск устарел, повторите /search")
+        return
+    await callback_query.answer()
+    # Как в /find: старая кнопка «Далее» больше не нажимается; номера записей остаются
+    markup = callback_query.message.reply_markup
+    rows = [
+        row for row in (markup.inline_keyboard if markup else [])
+        if not any((button.callback_data or "").startswith("search_next:") for button in row)
+    ]
+    await callback_query.message.edit_reply_markup(
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+    )
+    before_id = int(callback_query.data.split(":", 1)[1])
+    await send_search_page(callback_query.message, query, before_id)
+
+@router.callback_query(F.data.startswith("search_open:"), F.from_user.id.in_(ADMINS))
+async def search_open_handler(callback_query: CallbackQuery):
+    record = await get_data_by_id(int(callback_query.data.split(":", 1)[1]))
+    if record is None:
+        await callback_query.answer("Запись уже удалена")
+        return
+    await callback_query.answer()
+    card = (
+        f"#{record.id} {record.institution_name}\n"
+        f"Тип: {record.institution_type}\n"
+        f"Адрес: {record.address}\n"
+        f"Ориентир: {record.landmark or '—'}\n"
+        f"Координаты: {record.latitude}, {record.longitude}\n"
+        f"Телефон: {record.phone_number}\n"
+        f"ФИО: {record.full_name} ({record.username or '—'}, ID {record.telegram_id})\n"
+        f"Дата: {record.created_at.strftime('%d.%m.%Y %H:%M') if record.created_at else '—'}"
+    )
+    if len(card) > CAPTION_LIMIT or not await send_user_photo(callback_query.message, record, caption=card):
+        await callback_query.message.answer(card)
+
+# 🆕 ТОЛЬКО НОВЫЕ ЗАПИСИ (до общих обработчиков Excel/Word)
+@router.message(F.text.startswith("🆕"), F.text.contains("Excel"), F.from_user.id.in_(ADMINS))
+async def export_new_excel_handler(message: Message):
+    await run_report(message, 'excel', "🆕 Выгружаю новые записи в Excel...", new_only=True)
+
+@router.message(F.text.startswith("🆕"), F.text.contains("Word"), F.from_user.id.in_(ADMINS))
+async def export_new_word_handler(message: Message):
+    await run_report(message, 'word', "🆕 Выгружаю новые записи в Word...", new_only=True)
+
+# 🔥 ИСПРАВЛЕННЫЙ ОБРАБОТЧИК EXCEL
+@router.message(F.text.contains("Excel"), F.from_user.id.in_(ADMINS))
+async def export_excel_handler(message: Message):
+    logger.debug("Admin %s requested Excel report", message.from_user.id)
+    await run_report(message, 'excel', "📊 Создаю Excel-отчёт...")
 
 # 📝 ОБРАБОТЧИК WORD (тоже исправляем)
-@router.message(F.text.contains("Word"))
+@router.message(F.text.contains("Word"), F.from_user.id.in_(ADMINS))
 async def export_word_handler(message: Message):
-    logger.info(f"📝 WORD НАЖАТА: '{message.text}'!")
-    await message.answer("📝 Создаю Word-отчёт...")
-    
-    file_path = export_to_word()
-    
-    if file_path and os.path.exists(file_path):
-        # ✅ ИСПОЛЬЗУЕМ FSInputFile
-        document = FSInputFile(file_path)
-        total = len(get_all_data())
-        
-        await message.answer_document(
-            document,
-            caption=f"✅ **Отчёт СЭС (Word)** | {total} учреждений"
-        )
-        
-        os.remove(file_path)
-        logger.info(f"Word файл отправлен и удален: {file_path}")
+    logger.debug("Admin %s requested Word report", message.from_user.id)
+    await run_report(message, 'word', "📝 Создаю Word-отчёт...")
+
+@router.callback_query(F.data.startswith("report_cancel:"), F.from_user.id.in_(ADMINS))
+async def cancel_report_handler(callback_query: CallbackQuery):
+    key = callback_query.data.split(":", 1)[1]
+    if report_jobs.cancel(key):
+        await callback_query.answer("Отменяю сборку отчёта...")
     else:
-        await message.answer("❌ Нет данных для экспорта")
-    
-    await message.answer("✅ Готово!", reply_markup=back_to_admin_keyboard)
+        await callback_query.answer("Этот отчёт уже не собирается")
 
-@router.message(F.text.contains("Статистика"))
+@router.message(F.text.contains("Статистика"), F.from_user.id.in_(ADMINS))
 async def stats_handler(message: Message):
-    logger.info(f"📈 СТАТИСТИКА НАЖАТА: '{message.text}'!")
-    data = get_all_data()
-    total = len(data)
-    
-    # Подсчет по типам
-    schools = sum(1 for d in data if d.institution_type == "Школа")
-    colleges = sum(1 for d in data if d.institution_type == "Техникум / Колледж")
-    universities = sum(1 for d in data if d.institution_type == "Университет")
-    
+    logger.debug("Admin %s requested stats", message.from_user.id)
+    stats = await get_stats(days=7)
+    by_type = stats['by_type']
+
     stats_text = (
         f"📊 **Статистика учреждений:**\n\n"
-        f"🏫 Всего: {total}\n"
-        f"📚 Школ: {schools}\n"
-        f"🎓 Техникумов/Колледжей: {colleges}\n"
-        f"🏛 Университетов: {universities}"
+        f"🏫 Всего: {stats['total']}\n"
+        f"📚 Школ: {by_type.get('Школа', 0)}\n"
+        f"🎓 Техникумов/Колледжей: {by_type.get('Техникум / Колледж', 0)}\n"
+        f"🏛 Университетов: {by_type.get('Университет', 0)}"
+    )
+
+    if stats['by_day']:
+        lines = []
+        for day, counts in stats['by_day'].items():
+            details = ", ".join(f"{t or '—'}: {c}" for t, c in sorted(counts.items()))
+            lines.append(f"{day.strftime('%d.%m')} — {sum(counts.values())} ({details})")
+        stats_text += "\n\n📅 **За последние 7 дней:**\n" + "\n".join(lines)
+
+    cache = user_cache.stats()
+    stats_text += (
+        f"\n\n🗄 Кэш пользователей: {cache['size']} записей, "
+        f"попаданий {cache['hits']}, промахов {cache['misses']} ({cache['hit_ratio']:.0%})"
     )
-    
+
     await message.answer(stats_text, reply_markup=back_to_admin_keyboard)
 
 @router.message(F.text == "🔙 В главное меню")
@@ -93,6 +442,10 @@ async def back_to_main_menu(message: Message):
     await message.answer("Переход в главное меню...", reply_markup=main_menu_keyboard)
 
 @router.message(F.text == "🏠 Админ-панель")
-async def back_to_admin(message: Message):
-    if message.from_user.id in ADMINS:
-        await message.answer("👑 Панель администратора:", reply_markup=admin_keyboard)
\ No newline at end of file
+async def back_to_admin(message: Message, state: FSMContext):
+    # Не-админ мог нажать устаревшую кнопку: его анкету не трогаем, а сам текст
+    # не должен уйти в обработчики анкеты как ответ
+    if message.from_user.id not in ADMINS:
+        return
+    await state.clear()
+    await message.answer("👑 Панель администратора:", reply_markup=admin_keyboard)
\ No newline at end of file
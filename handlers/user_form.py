@@ -1,14 +1,17 @@
 from aiogram import Router, F
-from aiogram.types import Message, Contact, Location, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile, CallbackQuery
+from aiogram.types import Message, Contact, Location, FSInputFile, CallbackQuery
 from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
 from states.form import Form  # ← ГЛАВНОЕ! СОСТОЯНИЯ FSM
 from keyboards.reply import (
     contact_keyboard, institution_type_keyboard, location_keyboard, 
     confirmation_keyboard, photo_keyboard, main_menu_keyboard,
     admin_keyboard, back_to_admin_keyboard
 )
-from database.db import save_data, get_user_data, can_add_data
+from database.async_db import save_data, get_user_data, can_add_data, set_photo_file_id, find_nearby
 from database.models import UserData
+from utils.photos import photo_ingestor
+from utils.replies import ReplyComposer
 from datetime import timedelta, datetime
 import logging
 import os
@@ -16,48 +19,74 @@ import os
 logger = logging.getLogger(__name__)
 router = Router()
 
-from config import ADMINS
+from config import ADMINS, DUPLICATE_RADIUS_M
 
 @router.message(F.text == '/start', F.from_user.id.in_(ADMINS))
-async def admin_start_handler(message: Message):
+async def admin_start_handler(message: Message, reply: ReplyComposer):
     """Админ заходит — показывает админ-клавиатуру"""
-    await message.answer(
-        "👑 **Панель администратора СЭС**\n"
-        "Выберите действие:"
-    )
-    await message.answer("Админ-меню:", reply_markup=admin_keyboard)
+    reply.add("👑 **Панель администратора СЭС**\nВыберите действие:", reply_markup=admin_keyboard)
 
 @router.message(F.text == "📝 Добавить учреждение")
-async def add_institution_handler(message: Message, state: FSMContext):
+async def add_institution_handler(message: Message, state: FSMContext, reply: ReplyComposer):
     # Проверяем, можно ли добавлять
-    if not can_add_data(message.from_user.id):
-        await message.answer("Вы уже отправляли данные недавно. Подождите 24 часа перед добавлением новых.")
-        await message.answer("Вернитесь в меню:", reply_markup=main_menu_keyboard)
+    if not await can_add_data(message.from_user.id):
+        reply.add("Вы уже отправляли данные недавно. Подождите 24 часа перед добавлением новых.")
+        reply.add("Вернитесь в меню:", reply_markup=main_menu_keyboard)
         return
     
     # Если можно — запускаем процесс
     await message.answer("Давайте добавим учреждение. Сначала поделитесь номером телефона.", reply_markup=contact_keyboard)
     await state.set_state(Form.waiting_for_contact)
 
+async def send_user_photo(message: Message, user_data: UserData, caption: str = None, reply_markup=None) -> bool:
+    """Отправить фото заявки: по file_id, если Telegram уже видел файл, иначе загрузить.
+
+    caption и reply_markup уходят тем же сообщением. False — фото у заявки нет.
+    """
+    if user_data.photo_file_id:
+        try:
+            await message.answer_photo(user_data.photo_file_id, caption=caption, reply_markup=reply_markup)
+            return True
+        except TelegramBadRequest as e:
+            logger.warning("file_id for record %s rejected, re-uploading: %s", user_data.id, e)
+
+    if user_data.photo_path and os.path.exists(user_data.photo_path):
+        sent = await message.answer_photo(FSInputFile(user_data.photo_path), caption=caption, reply_markup=reply_markup)
+        await set_photo_file_id(user_data, sent.photo[-1].file_id)
+        return True
+    return False
+
+def user_data_summary(user_data: UserData) -> str:
+    return (
+        f"Ваши данные:\n"
+        f"Тип: {user_data.institution_type}\n"
+        f"Название: {user_data.institution_name}\n"
+        f"Адрес: {user_data.address}\n"
+        f"Ориентир: {user_data.landmark}\n"
+        f"Координаты: {user_data.latitude}, {user_data.longitude}\n"
+        f"Номер: {user_data.phone_number}\n"
+        f"Фото: {'отправлено' if user_data.photo_path else 'не отправлено'}\n"
+        f"Дата: {user_data.created_at}"
+    )
+
+CAPTION_LIMIT = 1024  # Подпись к фото в Telegram короче обычного сообщения
+
+async def show_user_data(message: Message, user_data: UserData):
+    """Сводка заявки подписью к фото и главное меню — одним сообщением, если влезает"""
+    summary = user_data_summary(user_data)
+    if len(summary) <= CAPTION_LIMIT:
+        if await send_user_photo(message, user_data, caption=summary, reply_markup=main_menu_keyboard):
+            return
+        await message.answer(summary, reply_markup=main_menu_keyboard)
+    else:
+        await message.answer(summary, reply_markup=main_menu_keyboard)
+        await send_user_photo(message, user_data)
+
 @router.message(F.text == "👁 Посмотреть мои данные")
 async def view_my_data_message(message: Message):
-    user_data = get_user_data(message.from_user.id)
+    user_data = await get_user_data(message.from_user.id)
     if user_data:
-        summary = (
-            f"Ваши данные:\n"
-            f"Тип: {user_data.institution_type}\n"
-            f"Название: {user_data.institution_name}\n"
-            f"Адрес: {user_data.address}\n"
-            f"Ориентир: {user_data.landmark}\n"
-            f"Координаты: {user_data.latitude}, {user_data.longitude}\n"
-            f"Номер: {user_data.phone_number}\n"
-            f"Фото: {'отправлено' if user_data.photo_path else 'не отправлено'}\n"
-            f"Дата: {user_data.created_at}"
-        )
-        await message.answer(summary, reply_markup=main_menu_keyboard)
-        # Отправляем фото, если есть (bot автоматически доступен в message)
-        if user_data.photo_path and os.path.exists(user_data.photo_path):
-            await message.answer_photo(FSInputFile(user_data.photo_path))
+        await show_user_data(message, user_data)
     else:
         await message.answer("Данные не найдены. Добавьте их сначала.", reply_markup=main_menu_keyboard)
 
@@ -108,17 +137,23 @@ async def process_landmark(message: Message, state: FSMContext):
     await state.set_state(Form.waiting_for_location)
 
 @router.message(Form.waiting_for_location, F.location)
-async def process_location(message: Message, state: FSMContext):
+async def process_location(message: Message, state: FSMContext, reply: ReplyComposer):
     location: Location = message.location
     data = await state.get_data()
     data['latitude'] = location.latitude
     data['longitude'] = location.longitude
     await state.set_data(data)
-    await message.answer("Можете отправить фото местоположения (необязательно) или пропустить.", reply_markup=photo_keyboard)
+
+    # Возможно, это учреждение уже зарегистрировал кто-то другой
+    nearby = await find_nearby(location.latitude, location.longitude, DUPLICATE_RADIUS_M, limit=3)
+    if nearby:
+        lines = "\n".join(f"• {record.institution_name}, {record.address} ({distance:.0f} м)" for record, distance in nearby)
+        reply.add(f"ℹ️ Рядом уже зарегистрировано:\n{lines}\nЕсли это ваше учреждение, повторно добавлять его не нужно.")
+    reply.add("Можете отправить фото местоположения (необязательно) или пропустить.", reply_markup=photo_keyboard)
     await state.set_state(Form.waiting_for_photo)
 
 @router.message(Form.waiting_for_photo, F.text == "⏭ Пропустить")
-async def skip_photo(message: Message, state: FSMContext):
+async def skip_photo(message: Message, state: FSMContext, reply: ReplyComposer):
     data = await state.get_data()
     summary = (
         "Проверьте, верно ли всё указано:\n"
@@ -130,19 +165,20 @@ async def skip_photo(message: Message, state: FSMContext):
         f"Номер: {data['phone_number']}\n"
         f"Фото: не отправлено"
     )
-    await message.answer(summary, reply_markup=confirmation_keyboard)
+    reply.add(summary, reply_markup=confirmation_keyboard)
     await state.set_state(Form.confirmation)
 
 @router.message(Form.waiting_for_photo, F.photo)
-async def process_photo(message: Message, state: FSMContext):
+async def process_photo(message: Message, state: FSMContext, reply: ReplyComposer):
     try:
         photo = message.photo[-1]
-        file_info = await message.bot.get_file(photo.file_id)
-        file_path = f"photos/{message.from_user.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        await message.bot.download_file(file_info.file_path, file_path)
+        # Скачивание, дедупликация по хешу и уменьшение — в очереди приёма фото
+        photo_meta = await photo_ingestor.ingest(message.bot, photo)
         
         data = await state.get_data()
-        data['photo_path'] = file_path
+        data.update(photo_meta)
+        # file_id полученного фото: при просмотре отправим его, а не файл с диска
+        data['photo_file_id'] = photo.file_id
         await state.set_data(data)
         
         summary = (
@@ -155,28 +191,30 @@ async def process_photo(message: Message, state: FSMContext):
             f"Номер: {data['phone_number']}\n"
             f"Фото: отправлено"
         )
-        await message.answer(summary, reply_markup=confirmation_keyboard)
+        reply.add(summary, reply_markup=confirmation_keyboard)
         await state.set_state(Form.confirmation)
     except Exception as e:
-        logger.error(f"Error processing photo: {e}")
-        await message.answer("Ошибка при загрузке фото. Попробуйте еще раз или пропустите.")
-        await message.answer("Отправьте фото или пропустите.", reply_markup=photo_keyboard)
+        logger.error("Error processing photo: %s", e)
+        reply.add("Ошибка при загрузке фото. Попробуйте еще раз или пропустите.", reply_markup=photo_keyboard)
 
 @router.message(Form.confirmation, F.text == "✅ Подтвердить")
-async def confirm(message: Message, state: FSMContext):
+async def confirm(message: Message, state: FSMContext, reply: ReplyComposer):
     data = await state.get_data()
-    if save_data(data):
-        await message.answer("Спасибо! Ваши данные успешно отправлены.")
-        # Inline для быстрого просмотра
-        inline_kb = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="👁  данные", callback_data="view_my_data")]
-        ])
-        await message.answer("Если хотите убедиться, нажмите ниже.", reply_markup=inline_kb)
-        # Главное меню
-        await message.answer("Что дальше?", reply_markup=main_menu_keyboard)
+    # Одно сообщение с главным меню. Отдельная inline-кнопка просмотра убрана
+    # намеренно: у сообщения одна клавиатура, а «👁 Посмотреть мои данные» есть
+    # в главном меню. view_my_data_callback остаётся для старых сообщений
+    if await save_data(data):
+        reply.add(
+            "Спасибо! Ваши данные успешно отправлены.\n"
+            "Проверить их можно кнопкой «👁 Посмотреть мои данные».",
+            reply_markup=main_menu_keyboard,
+        )
     else:
-        await message.answer("Данные не сохранены: вы уже отправляли недавно. Подождите 24 часа.")
-        await message.answer("Вернитесь в меню:", reply_markup=main_menu_keyboard)
+        reply.add(
+            "Данные не сохранены: вы уже отправляли недавно. Подождите 24 часа.\n"
+            "Вернитесь в меню:",
+            reply_markup=main_menu_keyboard,
+        )
     await state.clear()
 
 @router.message(Form.confirmation, F.text == "🔄 Изменить")
@@ -186,37 +224,22 @@ async def change(message: Message, state: FSMContext):
 
 @router.callback_query(F.data == "view_my_data")
 async def view_my_data_callback(callback_query: CallbackQuery):
-    user_data = get_user_data(callback_query.from_user.id)
+    await callback_query.answer()
+    user_data = await get_user_data(callback_query.from_user.id)
     if user_data:
-        summary = (
-            f"Ваши данные:\n"
-            f"Тип: {user_data.institution_type}\n"
-            f"Название: {user_data.institution_name}\n"
-            f"Адрес: {user_data.address}\n"
-            f"Ориентир: {user_data.landmark}\n"
-            f"Координаты: {user_data.latitude}, {user_data.longitude}\n"
-            f"Номер: {user_data.phone_number}\n"
-            f"Фото: {'отправлено' if user_data.photo_path else 'не отправлено'}\n"
-            f"Дата: {user_data.created_at}"
-        )
-        await callback_query.message.answer(summary)
-        if user_data.photo_path and os.path.exists(user_data.photo_path):
-            await callback_query.message.answer_photo(FSInputFile(user_data.photo_path))
+        await show_user_data(callback_query.message, user_data)
     else:
-        await callback_query.message.answer("Данные не найдены.")
-    await callback_query.answer()
-    # После просмотра — главное меню
-    await callback_query.message.answer("Вернитесь в меню:", reply_markup=main_menu_keyboard)
+        await callback_query.message.answer("Данные не найдены.", reply_markup=main_menu_keyboard)
 
 # Обработка ошибок
 @router.message()
-async def error_handler(message: Message, state: FSMContext):
+async def error_handler(message: Message, state: FSMContext, reply: ReplyComposer):
     current_state = await state.get_state()
     if current_state:
-        logger.error(f"Error in state {current_state}: {message.text}")
-        await message.answer("Произошла ошибка. Давайте начнем заново.")
+        logger.warning("Unexpected input in state %s", current_state, extra={'sample': True})
+        reply.add("Произошла ошибка. Давайте начнем заново.")
         await state.clear()
-    await message.answer("Главное меню:", reply_markup=main_menu_keyboard)
+    reply.add("Главное меню:", reply_markup=main_menu_keyboard)
 
 
 # Админ может вернуться в панель из главного меню
@@ -0,0 +1,15 @@
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+# Подтверждение рассылки
+broadcast_confirm_keyboard = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="📣 Отправить всем", callback_data="broadcast_confirm"),
+        InlineKeyboardButton(text="✖️ Отмена", callback_data="broadcast_drop"),
+    ]
+])
+
+
+def broadcast_cancel_keyboard(broadcast_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="⛔ Остановить рассылку", callback_data=f"broadcast_cancel:{broadcast_id}")]
+    ])
@@ -54,7 +54,8 @@ admin_keyboard = ReplyKeyboardMarkup(
     keyboard=[
         [KeyboardButton(text="📊 Экспорт Excel")],
         [KeyboardButton(text="📝  Word")],
-        [KeyboardButton(text="📈 Статистика")],
+        [KeyboardButton(text="🆕 Новые в Excel"), KeyboardButton(text="🆕 Новые в Word")],
+        [KeyboardButton(text="📈 Статистика"), KeyboardButton(text="📣 Рассылка")],
         [KeyboardButton(text="🔙 В главное меню")]
     ],
     resize_keyboard=True,
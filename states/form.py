@@ -8,4 +8,9 @@ class Form(StatesGroup):
     waiting_for_landmark = State()
     waiting_for_location = State()
     waiting_for_photo = State()
-    confirmation = State()
\ No newline at end of file
+    confirmation = State()
+
+
+class BroadcastForm(StatesGroup):
+    waiting_for_text = State()
+    confirmation = State()
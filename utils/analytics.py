@@ -0,0 +1,186 @@
+"""Сводная аналитика по user_data для листа «Сводка» в Excel-отчёте.
+
+Нужные колонки читаются из SQLite пачками кортежей и раскладываются в
+колоночные массивы (zip(*rows) — на стороне C), строки-категории (тип,
+район) кодируются целыми числами. Агрегаты считаются по целым массивам:
+через NumPy (bincount / unique), если он установлен, иначе через
+array + collections.Counter — тоже без Python-цикла по каждой записи.
+
+Район извлекается из свободного текста адреса регулярным выражением;
+разбор кэшируется по уникальным адресам.
+"""
+import logging
+import re
+from array import array
+from collections import Counter
+from contextlib import closing
+from datetime import date, timedelta
+from itertools import compress
+
+from database.db import DataFilter, engine
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен
+    np = None
+
+logger = logging.getLogger(__name__)
+
+FETCH_SIZE = 50_000
+TOP_DISTRICTS = 15
+TOP_SUBMITTERS = 10
+EPOCH = date(1970, 1, 1)
+NO_DISTRICT = 'Не указан'
+
+# «Юнусабадский район», «Чиланзарский р-н», «Yunusobod tumani», «район Сергели»
+_DISTRICT_RE = re.compile(
+    r"([\w'ʻ’\-]+)\s+(?:район|р-н|р\.|тумани|tumani)(?![\w])|(?:район|р-н)\s+([\w'ʻ’\-]+)",
+    re.IGNORECASE,
+)
+
+_COLUMNS_SQL = (
+    "SELECT CAST(julianday(created_at) - 2440587.5 AS INTEGER), "
+    "coalesce(institution_type, ''), coalesce(address, ''), telegram_id, "
+    "photo_path IS NOT NULL AND photo_path != '' "
+    "FROM user_data WHERE created_at IS NOT NULL"
+)
+
+
+def extract_district(address: str) -> str:
+    match = _DISTRICT_RE.search(address)
+    if not match:
+        return NO_DISTRICT
+    return (match.group(1) or match.group(2)).strip("-'ʻ’").capitalize()
+
+
+class Columns:
+    """Колоночное представление user_data: целочисленные массивы и словари кодов"""
+
+    def __init__(self):
+        self.day = array('l')          # дни с 1970-01-01
+        self.type_code = array('l')
+        self.district_code = array('l')
+        self.telegram_id = array('q')
+        self.has_photo = array('b')
+        self.types: list[str] = []
+        self.districts: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+
+class _Codes(dict):
+    """Словарь «строка -> код категории».
+
+    Уже встречавшиеся строки ищутся через dict.__getitem__ прямо из map()
+    без Python-вызова на строку; новая строка проходит transform (например,
+    разбор района) один раз в __missing__.
+    """
+
+    def __init__(self, labels: list[str], transform=None):
+        super().__init__()
+        self.labels = labels
+        self.transform = transform
+        self._label_codes: dict[str, int] = {}
+
+    def __missing__(self, value: str) -> int:
+        label = self.transform(value) if self.transform else value
+        code = self._label_codes.get(label)
+        if code is None:
+            code = self._label_codes[label] = len(self.labels)
+            self.labels.append(label)
+        self[value] = code
+        return code
+
+
+def load_columns(after_id: int = None, until_id: int = None, flt: DataFilter = None) -> Columns:
+    """Прочитать нужные колонки user_data с id в (after_id, until_id], подходящих под фильтр"""
+    sql, params = _COLUMNS_SQL, {}
+    if flt:
+        clauses, params = flt.conditions()
+        sql += "".join(f" AND {clause}" for clause in clauses)
+    if after_id is not None:
+        sql += " AND id > :after_id"
+        params['after_id'] = after_id
+    if until_id is not None:
+        sql += " AND id <= :until_id"
+        params['until_id'] = until_id
+
+    columns = Columns()
+    type_codes = _Codes(columns.types)
+    district_codes = _Codes(columns.districts, extract_district)
+
+    with engine.connect() as conn:
+        # Курсор драйвера напрямую: обычные кортежи без Row-обёрток SQLAlchemy
+        with closing(conn.connection.driver_connection.cursor()) as cursor:
+            cursor.execute(sql, params)
+            while rows := cursor.fetchmany(FETCH_SIZE):
+                days, types, addresses, telegram_ids, photos = zip(*rows)
+                columns.day.extend(days)
+                columns.type_code.extend(map(type_codes.__getitem__, types))
+                columns.district_code.extend(map(district_codes.__getitem__, addresses))
+                columns.telegram_id.extend(telegram_ids)
+                columns.has_photo.extend(photos)
+    return columns
+
+
+def _as_numpy(values: array):
+    return np.frombuffer(values, dtype=np.dtype(values.typecode))
+
+
+def _counts(values: array, size: int = None) -> list[tuple[int, int]]:
+    """[(значение, количество)] по массиву целых; size — число кодов категории"""
+    if np is None:
+        return sorted(Counter(values).items())
+    if size is not None:
+        counts = np.bincount(_as_numpy(values), minlength=size)
+        return [(code, int(count)) for code, count in enumerate(counts) if count]
+    keys, counts = np.unique(_as_numpy(values), return_counts=True)
+    return list(zip(keys.tolist(), counts.tolist()))
+
+
+def _photos_by_type(columns: Columns) -> list[int]:
+    if np is None:
+        counter = Counter(compress(columns.type_code, columns.has_photo))
+        return [counter.get(code, 0) for code in range(len(columns.types))]
+    weights = _as_numpy(columns.has_photo).astype(np.int64)
+    return np.bincount(_as_numpy(columns.type_code), weights=weights, minlength=len(columns.types)).astype(int).tolist()
+
+
+def _top(pairs: list[tuple[int, int]], n: int = None) -> list[tuple[int, int]]:
+    return sorted(pairs, key=lambda item: (-item[1], item[0]))[:n]
+
+
+def compute(columns: Columns) -> dict:
+    """Все агрегаты сводки по колоночным массивам"""
+    total = len(columns)
+    if not total:
+        return {'total': 0, 'photos': 0, 'photo_ratio': 0.0, 'unique_submitters': 0,
+                'by_type': [], 'by_district': [], 'by_day': [], 'top_submitters': []}
+
+    photos_by_type = _photos_by_type(columns)
+    photos = sum(photos_by_type)
+    submitters = _counts(columns.telegram_id)
+
+    return {
+        'total': total,
+        'photos': photos,
+        'photo_ratio': photos / total,
+        'unique_submitters': len(submitters),
+        'by_type': [
+            (columns.types[code] or '—', count, photos_by_type[code] / count)
+            for code, count in _top(_counts(columns.type_code, len(columns.types)))
+        ],
+        'by_district': [
+            (columns.districts[code], count)
+            for code, count in _top(_counts(columns.district_code, len(columns.districts)), TOP_DISTRICTS)
+        ],
+        'by_day': [(EPOCH + timedelta(days=day), count) for day, count in _counts(columns.day)],
+        'top_submitters': _top(submitters, TOP_SUBMITTERS),
+    }
+
+
+def build_summary(after_id: int = None, until_id: int = None, flt: DataFilter = None) -> dict:
+    summary = compute(load_columns(after_id=after_id, until_id=until_id, flt=flt))
+    logger.info("Analytics computed over %s records (%s)", summary['total'], 'numpy' if np is not None else 'array')
+    return summary
@@ -0,0 +1,208 @@
+"""Рассылка сообщения админа всем пользователям из user_data.
+
+Получатели читаются из БД порциями по BROADCAST_CHUNK уникальных telegram_id
+по возрастанию. Порция отправляется параллельно, но темп задаёт своё ведро
+токенов BROADCAST_RATE — ниже общего лимита бота, чтобы ответам
+пользователям оставался запас. Лимиты Telegram и RetryAfter обрабатывает
+ещё и OutgoingRateLimiter сессии (utils/sender.py).
+
+После каждой порции прогресс (последний telegram_id, доставлено, ошибок)
+сохраняется в таблицу broadcasts. Прерванная перезапуском рассылка
+продолжается со следующей порции при старте бота; в худшем случае
+повторно уходит только незавершённая порция.
+
+Ботов-воркеров может быть несколько, поэтому рассылку отправляет только
+процесс, который атомарно захватил её в БД (broadcasts.owner). Отмена —
+тоже статус в БД: владелец видит его на следующей контрольной точке, в
+каком бы процессе админ ни нажал кнопку.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramBadRequest, TelegramForbiddenError,
+    TelegramNetworkError, TelegramRetryAfter,
+)
+
+from config import BROADCAST_RATE, BROADCAST_CHUNK, BROADCAST_MAX_RETRIES, BROADCAST_LEASE_SEC
+from database.async_db import (
+    broadcast_recipients, create_broadcast, claim_broadcast, checkpoint_broadcast,
+    finish_broadcast, release_broadcast, cancel_broadcast, get_unfinished_broadcasts,
+)
+from keyboards.inline import broadcast_cancel_keyboard
+from utils.sender import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 5  # секунд между обновлениями сообщения со статусом
+CLAIM_INTERVAL = 60    # секунд между попытками подобрать брошенные рассылки
+
+
+class BroadcastRunner:
+    def __init__(self, rate: float = BROADCAST_RATE, chunk: int = BROADCAST_CHUNK,
+                 max_retries: int = BROADCAST_MAX_RETRIES):
+        self.bucket = TokenBucket(rate)
+        self.chunk = chunk
+        self.max_retries = max_retries
+        self.lease = timedelta(seconds=BROADCAST_LEASE_SEC)
+        # Уникален для процесса: им помечаются захваченные рассылки
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._watcher: asyncio.Task | None = None
+
+    async def is_running(self) -> bool:
+        """Идёт ли какая-нибудь рассылка (в любом процессе)"""
+        return bool(await get_unfinished_broadcasts())
+
+    async def start(self, bot: Bot, admin_id: int, text: str) -> int:
+        """Создать рассылку и запустить её в фоне, вернуть id"""
+        broadcast = await create_broadcast(admin_id, text, owner=self.owner)
+        logger.info("Broadcast %s started by %s: %s recipients", broadcast.id, admin_id, broadcast.total)
+        self._launch(bot, broadcast)
+        return broadcast.id
+
+    async def resume(self, bot: Bot):
+        """Startup-хук: продолжить рассылки, прерванные остановкой бота.
+
+        Рассылку продолжает только процесс, который первым её захватил. Захват
+        упавшего процесса истекает не сразу (BROADCAST_LEASE_SEC), поэтому
+        попытки повторяются в фоне каждые CLAIM_INTERVAL секунд.
+        """
+        await self._claim_unfinished(bot)
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(bot))
+
+    async def _claim_unfinished(self, bot: Bot):
+        for broadcast in await get_unfinished_broadcasts():
+            if broadcast.id in self._tasks or not await claim_broadcast(broadcast.id, self.owner, self.lease):
+                continue
+            logger.info("Resuming broadcast %s after telegram_id %s", broadcast.id, broadcast.last_telegram_id)
+            self._launch(bot, broadcast)
+
+    async def _watch(self, bot: Bot):
+        while True:
+            await asyncio.sleep(CLAIM_INTERVAL)
+            try:
+                await self._claim_unfinished(bot)
+            except Exception:
+                logger.exception("Failed to claim unfinished broadcasts")
+
+    async def cancel(self, broadcast_id: int) -> bool:
+        """Отменить рассылку; False — она уже не идёт"""
+        return await cancel_broadcast(broadcast_id)
+
+    def _launch(self, bot: Bot, broadcast):
+        task = asyncio.create_task(self._run(bot, broadcast))
+        self._tasks[broadcast.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast.id, None))
+
+    @staticmethod
+    def _status_text(broadcast, delivered: int, failed: int, title: str = "📣 Рассылка") -> str:
+        return (
+            f"{title} #{broadcast.id}: {delivered + failed}/{broadcast.total}\n"
+            f"✅ Доставлено: {delivered}\n❌ Не доставлено: {failed}"
+        )
+
+    async def _run(self, bot: Bot, broadcast):
+        """Отправить рассылку; при сбое отпустить захват, чтобы её подобрал _watch"""
+        try:
+            await self._broadcast(bot, broadcast)
+        except asyncio.CancelledError:
+            raise  # Остановка бота: захват отпускает shutdown()
+        except Exception:
+            logger.exception("Broadcast %s failed, releasing it for a retry", broadcast.id)
+            try:
+                await release_broadcast(broadcast.id, self.owner)
+            except Exception:
+                logger.exception("Failed to release broadcast %s", broadcast.id)
+
+    async def _edit_status(self, status, text: str, **kwargs):
+        if status is None:
+            return
+        try:
+            await status.edit_text(text, **kwargs)
+        except TelegramAPIError as e:
+            logger.debug("Broadcast status edit skipped: %s", e)
+
+    async def _broadcast(self, bot: Bot, broadcast):
+        delivered, failed, cursor = broadcast.delivered, broadcast.failed, broadcast.last_telegram_id
+        try:
+            status = await bot.send_message(
+                broadcast.admin_id, self._status_text(broadcast, delivered, failed),
+                reply_markup=broadcast_cancel_keyboard(broadcast.id),
+            )
+        except TelegramAPIError as e:
+            # Статус — только удобство для админа; рассылка идёт и без него
+            logger.warning("Broadcast %s status message failed: %s", broadcast.id, e)
+            status = None
+        started = last_edit = time.monotonic()
+
+        while True:
+            chat_ids = await broadcast_recipients(cursor, self.chunk)
+            if not chat_ids:
+                break
+            results = await asyncio.gather(*(self._send(bot, chat_id, broadcast.text) for chat_id in chat_ids))
+            delivered += sum(results)
+            failed += len(results) - sum(results)
+            cursor = chat_ids[-1]
+            state = await checkpoint_broadcast(
+                broadcast.id, self.owner, delivered=delivered, failed=failed, last_telegram_id=cursor
+            )
+            if state != 'running':
+                break  # Отменена или перехвачена другим процессом
+
+            if time.monotonic() - last_edit >= PROGRESS_INTERVAL:
+                last_edit = time.monotonic()
+                await self._edit_status(status, self._status_text(broadcast, delivered, failed),
+                                        reply_markup=status and status.reply_markup)
+
+        state = await finish_broadcast(broadcast.id, self.owner)
+        if state is None:
+            logger.warning("Broadcast %s was taken over by another process, stopping here", broadcast.id)
+            return
+        cancelled = state == 'cancelled'
+        logger.info("Broadcast %s %s in %.1fs: %s delivered, %s failed", broadcast.id,
+                    'cancelled' if cancelled else 'finished', time.monotonic() - started, delivered, failed)
+
+        title = "⛔ Рассылка остановлена" if cancelled else "✅ Рассылка завершена"
+        await self._edit_status(status, self._status_text(broadcast, delivered, failed, title))
+
+    async def _send(self, bot: Bot, chat_id: int, text: str) -> bool:
+        """Отправить одно сообщение. False — пользователь недоступен или попытки кончились"""
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(chat_id, text, parse_mode='HTML')
+                return True
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Бот заблокирован, чат удалён и т.п. — повтор не поможет
+                logger.debug("Broadcast to %s failed: %s", chat_id, e, extra={'sample': True})
+                return False
+            except TelegramRetryAfter as e:
+                # Повторы сессии исчерпаны — ждём сами и пробуем ещё раз
+                await asyncio.sleep(e.retry_after)
+            except TelegramNetworkError as e:
+                logger.warning("Network error sending broadcast to %s: %s", chat_id, e, extra={'sample': True})
+                await asyncio.sleep(2 ** attempt)
+        return False
+
+    async def shutdown(self):
+        """Остановить отправку; рассылки остаются running и продолжатся при следующем старте"""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        tasks = dict(self._tasks)
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for broadcast_id in tasks:
+            await release_broadcast(broadcast_id, self.owner)
+
+
+broadcaster = BroadcastRunner()
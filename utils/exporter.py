@@ -1,15 +1,20 @@
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 from openpyxl.drawing.image import Image as XLImage
-from database.db import get_all_data, backup_db
+from database.db import DataFilter, iter_all_data
 from database.models import UserData
 from datetime import datetime
+from itertools import chain
 import logging
 import os
-import tempfile
+import uuid
+from copy import copy, deepcopy
 from pathlib import Path
-from PIL import Image
+from utils import thumbnails
+from utils.analytics import build_summary
+from config import WORD_VOLUME_MAX_BYTES
 
 logger = logging.getLogger(__name__)
 
@@ -35,232 +40,381 @@ def resolve_photo_path(photo_path: str) -> str | None:
         return str(candidate)
     return None
 
-def export_to_excel() -> str:
-    """Создает красиво оформленный Excel-файл со встроенными фото"""
-    backup_db()
-    data = get_all_data()
-    
-    if not data:
-        logger.warning("No data to export")
-        return None
-    
-    # Создаем книгу и лист
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Данные учреждений"
-    
-    # Русские заголовки
-    headers = [
-        'ID', 'Telegram ID', 'ФИО', 'Username', 'Телефон', 'Тип', 
-        'Название', 'Адрес', 'Ориентир', 'Широта', 'Долгота', 
-        'Фото', 'Дата создания'
-    ]
-    
-    # Добавляем заголовки
-    ws.append(headers)
-    
-    # Стили для заголовков
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="3673A5", end_color="3673A5", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
+# Русские заголовки
+EXCEL_HEADERS = [
+    'ID', 'Telegram ID', 'ФИО', 'Username', 'Телефон', 'Тип',
+    'Название', 'Адрес', 'Ориентир', 'Широта', 'Долгота',
+    'Фото', 'Дата создания'
+]
+
+# Фиксированная ширина колонок: в потоковом режиме нельзя пройтись по ячейкам после записи
+EXCEL_COLUMN_WIDTHS = [8, 14, 20, 16, 16, 16, 20, 20, 20, 10, 10, 12, 17]
+
+PHOTO_COLUMN = 12  # Колонка L
+
+DATA_SHEET = "Данные учреждений"
+SUMMARY_SHEET = "Сводка"
+SUMMARY_COLUMN_WIDTHS = [34, 14, 14]
+
+
+def _register_excel_styles(wb: Workbook):
+    """Общие именованные стили — один экземпляр на всю книгу вместо объекта на каждую ячейку"""
     border = Border(
         left=Side(style='thin'), right=Side(style='thin'),
         top=Side(style='thin'), bottom=Side(style='thin')
     )
-    
-    # Форматируем заголовки
-    for col in range(1, len(headers) + 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = headers[col-1]
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = border
-    
-    # Список временных файлов для удаления после сохранения
-    temp_files = []
-    
-    # Заполняем данными
-    for row_idx, record in enumerate(data, start=2):
-        ws.append([
-            record.id,
-            record.telegram_id,
-            record.full_name or '',
-            record.username or '',
-            record.phone_number or '',
-            record.institution_type or '',
-            record.institution_name or '',
-            record.address or '',
-            record.landmark or '',
-            f"{record.latitude:.4f}" if record.latitude else '',
-            f"{record.longitude:.4f}" if record.longitude else '',
-            '',  # ← Колонка для фото (оставляем пустой)
-            record.created_at.strftime('%d.%m.%Y %H:%M') if record.created_at else ''
-        ])
-        
-        # Форматируем строку данных
-        for col in range(1, 14):
-            cell = ws.cell(row=row_idx, column=col)
-            cell.alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
-            cell.border = border
-        
-        # ✅ ВСТАВЛЯЕМ ФОТО В ЯЧЕЙКУ
-        resolved_path = resolve_photo_path(record.photo_path) if record.photo_path else None
-        if resolved_path:
-            try:
-                # Оптимизируем фото для Excel (уменьшаем размер)
-                img = Image.open(resolved_path)
-
-                # Уменьшаем до разумного размера (макс 300px по ширине)
-                max_width = 300
-                if img.width > max_width:
-                    ratio = max_width / img.width
-                    new_height = int(img.height * ratio)
-                    img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-
-                # Сохраняем временно с уникальным именем в безопасном tmp-файле
-                tf = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-                tf_name = tf.name
-                tf.close()
-                img.save(tf_name, "JPEG", quality=85)
-                temp_files.append(tf_name)  # Запоминаем для удаления
-
-                # Вставляем в Excel
-                excel_img = XLImage(tf_name)
-
-                # Масштабируем для ячейки (высота ~80 пикселей)
-                excel_img.width = 80
-                excel_img.height = 80
-
-                # Привязываем к ячейке L (колонка "Фото")
-                cell_address = f"L{row_idx}"
-                ws.add_image(excel_img, cell_address)
-
-                logger.info(f"Фото добавлено для записи {record.id} (from {resolved_path})")
-            except Exception as e:
-                logger.error(f"Ошибка при добавлении фото {resolved_path}: {e}")
-                # Если фото не удалось добавить, пишем текст
-                ws.cell(row=row_idx, column=12).value = "Ошибка загрузки"
-    
-    # Автоподгонка ширины колонок
-    for column in ws.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        
-        # Для колонки с фото делаем фиксированную ширину
-        if column_letter == 'L':
-            ws.column_dimensions[column_letter].width = 12
-            continue
-        
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 20)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Высота строк (увеличиваем для фото)
-    ws.row_dimensions[1].height = 20  # Заголовок
-    for row_idx in range(2, len(data) + 2):
-        # Проверяем, есть ли фото в этой строке
-        record = data[row_idx - 2]
-        resolved_for_row = resolve_photo_path(record.photo_path) if record.photo_path else None
-        if resolved_for_row:
-            ws.row_dimensions[row_idx].height = 60  # Высота для фото
-        else:
-            ws.row_dimensions[row_idx].height = 20  # Обычная высота
-    
-    # Имя файла с датой
+    header_style = NamedStyle(name='ses_header')
+    header_style.font = Font(bold=True, color="FFFFFF")
+    header_style.fill = PatternFill(start_color="3673A5", end_color="3673A5", fill_type="solid")
+    header_style.alignment = Alignment(horizontal="center", vertical="center")
+    header_style.border = border
+
+    cell_style = NamedStyle(name='ses_cell')
+    cell_style.alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
+    cell_style.border = border
+
+    wb.add_named_style(header_style)
+    wb.add_named_style(cell_style)
+
+
+def _styled_row(ws, values: list, template: WriteOnlyCell) -> list:
+    """Строка ячеек со стилем шаблонной ячейки (копируется только массив индексов стиля)"""
+    row = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell._style = copy(template._style)
+        row.append(cell)
+    return row
+
+
+def _style_template(ws, style: str) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws)
+    cell.style = style
+    return cell
+
+
+def _excel_row_values(record: UserData) -> list:
+    return [
+        record.id,
+        record.telegram_id,
+        record.full_name or '',
+        record.username or '',
+        record.phone_number or '',
+        record.institution_type or '',
+        record.institution_name or '',
+        record.address or '',
+        record.landmark or '',
+        f"{record.latitude:.4f}" if record.latitude else '',
+        f"{record.longitude:.4f}" if record.longitude else '',
+        '',  # ← Колонка для фото (оставляем пустой)
+        record.created_at.strftime('%d.%m.%Y %H:%M') if record.created_at else ''
+    ]
+
+
+def _excel_photo(resolved_path: str) -> XLImage:
+    """Миниатюра из кэша, отмасштабированная под ячейку"""
+    excel_img = XLImage(thumbnails.get_thumbnail(resolved_path, thumbnails.EXCEL_WIDTH))
+
+    # Масштабируем для ячейки (высота ~80 пикселей)
+    excel_img.width = 80
+    excel_img.height = 80
+    return excel_img
+
+
+def _write_summary(ws, summary: dict):
+    """Лист «Сводка»: итоги, разбивки по типам, районам, отправителям и дням"""
+    for col, width in enumerate(SUMMARY_COLUMN_WIDTHS, start=1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+    header = _style_template(ws, 'ses_header')
+    cell = _style_template(ws, 'ses_cell')
+
+    def table(title: list, rows: list):
+        ws.append([])
+        ws.append(_styled_row(ws, title, header))
+        for row in rows:
+            ws.append(_styled_row(ws, list(row), cell))
+
+    ws.append(_styled_row(ws, ["Показатель", "Значение"], header))
+    for row in [
+        ("Всего записей", summary['total']),
+        ("Уникальных отправителей", summary['unique_submitters']),
+        ("С фото", summary['photos']),
+        ("Доля с фото", f"{summary['photo_ratio']:.1%}"),
+    ]:
+        ws.append(_styled_row(ws, list(row), cell))
+
+    table(["Тип учреждения", "Записей", "С фото"],
+          [(name, count, f"{ratio:.1%}") for name, count, ratio in summary['by_type']])
+    table(["Район (по адресу)", "Записей"], summary['by_district'])
+    table(["Отправитель (Telegram ID)", "Заявок"], summary['top_submitters'])
+    table(["День", "Записей"], [(day.strftime('%d.%m.%Y'), count) for day, count in summary['by_day']])
+
+
+def report_file_path(prefix: str, ext: str, after_id: int = None, flt: DataFilter = None) -> str:
+    # Имя файла с датой; суффикс делает путь уникальным для каждой сборки —
+    # два отчёта за одну минуту не перезапишут и не удалят файлы друг друга
     timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-    file_path = f'data_{timestamp}.xlsx'
-    
-    # ✅ СОХРАНЯЕМ ФАЙЛ (теперь Excel читает временные файлы)
-    wb.save(file_path)
-    
-    # ✅ УДАЛЯЕМ ВРЕМЕННЫЕ ФАЙЛЫ ПОСЛЕ СОХРАНЕНИЯ
-    for temp_file in temp_files:
-        try:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-                logger.debug(f"Удален временный файл: {temp_file}")
-        except Exception as e:
-            logger.error(f"Не удалось удалить временный файл {temp_file}: {e}")
-    
-    logger.info(f"Exported {len(data)} records to {file_path}")
+    if after_id is not None:
+        prefix = f"{prefix}_new"
+    if flt:
+        prefix = f"{prefix}_filtered"
+    return f'{prefix}_{timestamp}_{uuid.uuid4().hex[:8]}.{ext}'
+
+
+def export_to_excel(progress=None, after_id: int = None, until_id: int = None, flt: DataFilter = None) -> str:
+    """Создает красиво оформленный Excel-файл со встроенными фото.
+
+    Книга пишется в потоковом режиме (write_only): строки читаются из БД
+    порциями через iter_all_data() и сразу сбрасываются на диск, поэтому
+    потребление памяти не зависит от количества записей.
+    progress(done) вызывается после каждой записанной строки.
+    after_id/until_id — выгрузить только записи с id в (after_id, until_id],
+    flt — только записи под фильтром (условия выполняет SQLite).
+    """
+    records = iter_all_data(after_id=after_id, until_id=until_id, flt=flt)
+    first = next(records, None)
+
+    if first is None:
+        logger.warning("No data to export")
+        return None
+
+    wb = Workbook(write_only=True)
+    _register_excel_styles(wb)
+    # Сводка — первым листом; считается отдельным колоночным проходом по тем же записям
+    _write_summary(wb.create_sheet(SUMMARY_SHEET), build_summary(after_id=after_id, until_id=until_id, flt=flt))
+    ws = wb.create_sheet(DATA_SHEET)
+
+    # Размеры колонок задаются до записи строк
+    for col, width in enumerate(EXCEL_COLUMN_WIDTHS, start=1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+
+    ws.row_dimensions[1].height = 20  # Заголовок
+    ws.append(_styled_row(ws, EXCEL_HEADERS, _style_template(ws, 'ses_header')))
+
+    cell_template = _style_template(ws, 'ses_cell')
+
+    total = 0
+
+    # Миниатюры берутся из постоянного кэша и не должны вытесняться до wb.save()
+    with thumbnails.pinned():
+        for row_idx, record in enumerate(chain([first], records), start=2):
+            total += 1
+            values = _excel_row_values(record)
+            resolved_path = resolve_photo_path(record.photo_path) if record.photo_path else None
+            row_height = 20  # Обычная высота
+
+            # ✅ ВСТАВЛЯЕМ ФОТО В ЯЧЕЙКУ
+            if resolved_path:
+                try:
+                    # Привязываем к ячейке L (колонка "Фото")
+                    ws.add_image(_excel_photo(resolved_path), f"{get_column_letter(PHOTO_COLUMN)}{row_idx}")
+                    row_height = 60  # Высота для фото
+                    logger.debug("Фото добавлено для записи %s (from %s)", record.id, resolved_path,
+                                 extra={'sample': True})
+                except Exception as e:
+                    logger.error("Ошибка при добавлении фото %s: %s", resolved_path, e, extra={'sample': True})
+                    # Если фото не удалось добавить, пишем текст
+                    values[PHOTO_COLUMN - 1] = "Ошибка загрузки"
+
+            ws.row_dimensions[row_idx].height = row_height
+            ws.append(_styled_row(ws, values, cell_template))
+            # Строка уже записана в поток — размеры больше не нужны
+            del ws.row_dimensions[row_idx]
+            if progress:
+                progress(total)
+
+        file_path = report_file_path('data', 'xlsx', after_id, flt)
+
+        # ✅ СОХРАНЯЕМ ФАЙЛ (картинки читаются из кэша миниатюр при сохранении)
+        wb.save(file_path)
+
+    logger.info("Exported %s records to %s", total, file_path)
     return file_path
 
-def export_to_word() -> str:
-    """Экспорт в Word с фото"""
-    backup_db()
-    data = get_all_data()
-    if not data:
+
+# Подписи строк таблицы одной записи в Word
+WORD_FIELDS = [
+    'Тип', 'Адрес', 'Ориентир', 'Координаты', 'Телефон',
+    'ФИО', 'Username', 'Telegram ID', 'Дата создания', 'Фото',
+]
+WORD_TITLE = 'Отчёт СЭС - Учреждения'
+# Примерный вклад текста и разметки одной записи в размер .docx, байт
+WORD_RECORD_OVERHEAD = 2_000
+
+
+def _word_values(record: UserData) -> list[str]:
+    return [
+        record.institution_type or '',
+        record.address or '',
+        record.landmark or '',
+        f"{record.latitude}, {record.longitude}" if record.latitude else '',
+        record.phone_number or '',
+        record.full_name or '',
+        record.username or '',
+        str(record.telegram_id),
+        record.created_at.strftime('%d.%m.%Y %H:%M') if record.created_at else '',
+    ]
+
+
+def _record_table_template(doc):
+    """Таблица записи, оформленная один раз: стиль, подписи и заглушки значений.
+
+    Для каждой записи копируется её XML-элемент — без add_table и поиска
+    стиля на каждую запись.
+    """
+    table = doc.add_table(rows=len(WORD_FIELDS), cols=2)
+    table.style = 'Light Grid Accent 1'
+    for row, label in zip(table.rows, WORD_FIELDS):
+        row.cells[0].text = label
+        row.cells[1].text = '-'
+    element = table._tbl
+    element.getparent().remove(element)
+    return element
+
+
+def _word_thumbnail(record: UserData) -> str | None:
+    resolved_path = resolve_photo_path(record.photo_path) if record.photo_path else None
+    if not resolved_path:
         return None
-        
-    from docx import Document
+    try:
+        return thumbnails.get_thumbnail(resolved_path, thumbnails.WORD_WIDTH)
+    except Exception as e:
+        logger.error("Ошибка при подготовке фото для Word %s: %s", resolved_path, e, extra={'sample': True})
+        return ''
+
+
+def _add_word_record(doc, template, idx: int, record: UserData, thumbnail: str | None):
+    """Заголовок и копия таблицы-шаблона с данными одной записи.
+
+    thumbnail — путь к уменьшенному фото, None — фото нет, '' — фото не удалось подготовить.
+    """
     from docx.shared import Inches
-    
-    doc = Document()
-    doc.add_heading('Отчёт СЭС - Учреждения', 0)
-    
-    for idx, record in enumerate(data, 1):
-        doc.add_heading(f'{idx}. {record.institution_name}', level=1)
-        
-        # Создаём таблицу для каждой записи
-        table = doc.add_table(rows=10, cols=2)
-        table.style = 'Light Grid Accent 1'
-        
-        # Заполняем данные
-        table.rows[0].cells[0].text = 'Тип'
-        table.rows[0].cells[1].text = record.institution_type or ''
-        
-        table.rows[1].cells[0].text = 'Адрес'
-        table.rows[1].cells[1].text = record.address or ''
-        
-        table.rows[2].cells[0].text = 'Ориентир'
-        table.rows[2].cells[1].text = record.landmark or ''
-        
-        table.rows[3].cells[0].text = 'Координаты'
-        table.rows[3].cells[1].text = f"{record.latitude}, {record.longitude}" if record.latitude else ''
-        
-        table.rows[4].cells[0].text = 'Телефон'
-        table.rows[4].cells[1].text = record.phone_number or ''
-        
-        table.rows[5].cells[0].text = 'ФИО'
-        table.rows[5].cells[1].text = record.full_name or ''
-        
-        table.rows[6].cells[0].text = 'Username'
-        table.rows[6].cells[1].text = record.username or ''
-        
-        table.rows[7].cells[0].text = 'Telegram ID'
-        table.rows[7].cells[1].text = str(record.telegram_id)
-        
-        table.rows[8].cells[0].text = 'Дата создания'
-        table.rows[8].cells[1].text = record.created_at.strftime('%d.%m.%Y %H:%M') if record.created_at else ''
-        
-        # ✅ ДОБАВЛЯЕМ ФОТО
-        resolved_path = resolve_photo_path(record.photo_path) if record.photo_path else None
-        if resolved_path:
-            table.rows[9].cells[0].text = 'Фото'
-            try:
-                # Вставляем фото в ячейку
-                paragraph = table.rows[9].cells[1].paragraphs[0]
-                run = paragraph.add_run()
-                run.add_picture(resolved_path, width=Inches(2.5))
-                logger.info(f"Фото добавлено в Word для записи {record.id}")
-            except Exception as e:
-                logger.error(f"Ошибка при добавлении фото в Word: {e}")
-                table.rows[9].cells[1].text = 'Ошибка загрузки фото'
+    from docx.table import _Cell
+
+    doc.add_heading(f'{idx}. {record.institution_name}', level=1)
+    # Разделитель между записями; таблица вставляется перед ним
+    separator = doc.add_paragraph()
+    tbl = deepcopy(template)
+    separator._p.addprevious(tbl)
+
+    value_texts = tbl.xpath('./w:tr/w:tc[2]/w:p/w:r/w:t')
+    for text_element, value in zip(value_texts, _word_values(record)):
+        text_element.text = value
+
+    # ✅ ДОБАВЛЯЕМ ФОТО (уже уменьшенное — в документ не попадает оригинал)
+    photo_text = value_texts[len(WORD_FIELDS) - 1]
+    if thumbnail:
+        photo_text.text = ''
+        cell = _Cell(tbl.xpath('./w:tr/w:tc[2]')[len(WORD_FIELDS) - 1], doc._body)
+        cell.paragraphs[0].add_run().add_picture(thumbnail, width=Inches(2.5))
+    else:
+        photo_text.text = 'Ошибка загрузки фото' if thumbnail == '' else 'Не отправлено'
+
+
+class WordVolumes:
+    """Word-отчёт томами: новый файл начинается, когда текущий подходит к max_bytes.
+
+    Размер тома оценивается по объёму вставленных миниатюр и числу записей,
+    поэтому каждый файл помещается в лимит документа Telegram, а в памяти
+    одновременно держится только один том. Первый том пишется в path,
+    следующие — в path с суффиксом _part2, _part3...
+    """
+
+    def __init__(self, path: str, start_idx: int = 0, base_path: str = None,
+                 max_bytes: int = WORD_VOLUME_MAX_BYTES):
+        from docx import Document
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.idx = start_idx
+        self.paths: list[str] = []
+        if base_path:
+            # Дописываем в готовый том: его размер уже известен
+            self._open(Document(base_path), os.path.getsize(base_path), empty=False)
         else:
-            table.rows[9].cells[0].text = 'Фото'
-            table.rows[9].cells[1].text = 'Не отправлено'
-        
-        # Добавляем разделитель между записями
-        doc.add_paragraph()
-    
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-    file_path = f'data_word_{timestamp}.docx'
-    doc.save(file_path)
-    logger.info(f"Exported {len(data)} records to Word")
-    return file_path
\ No newline at end of file
+            self._open(self._new_document(), 0, empty=True)
+
+    def _new_document(self):
+        from docx import Document
+
+        doc = Document()
+        volume = len(self.paths) + 1
+        doc.add_heading(WORD_TITLE if volume == 1 else f'{WORD_TITLE} (часть {volume})', 0)
+        return doc
+
+    def _open(self, doc, size: int, empty: bool):
+        self.doc = doc
+        self.size = size
+        self.empty = empty
+        self.template = _record_table_template(doc)
+
+    def volume_path(self, number: int) -> str:
+        if number == 1:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f"{root}_part{number}{ext}"
+
+    def _save(self):
+        path = self.volume_path(len(self.paths) + 1)
+        self.doc.save(path)
+        self.paths.append(path)
+        self.doc = self.template = None
+
+    def add(self, record: UserData):
+        thumbnail = _word_thumbnail(record)
+        record_size = WORD_RECORD_OVERHEAD + (os.path.getsize(thumbnail) if thumbnail else 0)
+        if not self.empty and self.size + record_size > self.max_bytes:
+            self._save()
+            self._open(self._new_document(), 0, empty=True)
+
+        self.idx += 1
+        _add_word_record(self.doc, self.template, self.idx, record, thumbnail)
+        self.size += record_size
+        self.empty = False
+
+    def close(self) -> list[str]:
+        """Сохранить последний том и вернуть пути всех томов"""
+        if self.doc is not None:
+            self._save()
+        return self.paths
+
+
+def export_to_word(progress=None, after_id: int = None, until_id: int = None,
+                   flt: DataFilter = None) -> list[str] | None:
+    """Экспорт в Word с фото; возвращает пути томов. progress(done) вызывается после каждой записи."""
+    records = iter_all_data(after_id=after_id, until_id=until_id, flt=flt)
+    first = next(records, None)
+    if first is None:
+        return None
+
+    volumes = WordVolumes(report_file_path('data_word', 'docx', after_id, flt))
+    total = 0
+    # Миниатюры не должны вытесняться из кэша, пока том не сохранён
+    with thumbnails.pinned():
+        for total, record in enumerate(chain([first], records), 1):
+            volumes.add(record)
+            if progress:
+                progress(total)
+        paths = volumes.close()
+
+    logger.info("Exported %s records to Word (%s files)", total, len(paths))
+    return paths
+
+
+def append_to_word(base_path: str, out_path: str, start_idx: int, progress=None,
+                   after_id: int = None, until_id: int = None) -> tuple[int, list[str]]:
+    """Дописать записи из (after_id, until_id] в последний том base_path, нумерация с start_idx + 1.
+
+    Если том переполняется, дальше создаются новые. Возвращает (добавлено записей, пути томов).
+    """
+    volumes = WordVolumes(out_path, start_idx=start_idx, base_path=base_path)
+    added = 0
+    with thumbnails.pinned():
+        for added, record in enumerate(iter_all_data(after_id=after_id, until_id=until_id), 1):
+            volumes.add(record)
+            if progress:
+                progress(added)
+        paths = volumes.close()
+
+    logger.info("Appended %s records to Word report %s (%s files)", added, out_path, len(paths))
+    return added, paths
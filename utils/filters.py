@@ -0,0 +1,82 @@
+"""Разбор фильтров из аргументов админ-команд в DataFilter.
+
+Фильтр задаётся парами ключ=значение, значение с пробелами — в кавычках:
+    тип=вуз дней=7
+    с=01.10.2025 по=15.10.2025 текст="лицей 5"
+    id=123456789
+"""
+import shlex
+from datetime import datetime, timedelta
+
+from database.db import DataFilter
+
+FILTER_HELP = (
+    "Фильтры (ключ=значение):\n"
+    "• тип=школа | колледж | вуз\n"
+    "• дней=7 — за последние N дней\n"
+    "• с=01.10.2025 по=15.10.2025 — диапазон дат (включительно)\n"
+    "• id=123456789 — заявки одного пользователя\n"
+    "• текст=\"лицей\" — в названии или адресе"
+)
+
+INSTITUTION_TYPES = {
+    'школа': 'Школа',
+    'колледж': 'Техникум / Колледж',
+    'техникум': 'Техникум / Колледж',
+    'вуз': 'Университет',
+    'университет': 'Университет',
+}
+
+KEYS = {
+    'тип': 'type', 'type': 'type',
+    'дней': 'days', 'days': 'days',
+    'с': 'from', 'from': 'from',
+    'по': 'to', 'to': 'to',
+    'id': 'user', 'user': 'user',
+    'текст': 'text', 'text': 'text',
+}
+
+
+def _parse_date(value: str) -> datetime:
+    for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"Не понял дату «{value}», нужно ДД.ММ.ГГГГ")
+
+
+def parse_filter(args: str | None) -> DataFilter:
+    """'тип=вуз дней=7' -> DataFilter; ValueError с понятным текстом при ошибке"""
+    try:
+        tokens = shlex.split(args or "")
+    except ValueError:
+        raise ValueError("Незакрытая кавычка в фильтре")
+
+    flt = DataFilter()
+    for token in tokens:
+        name, sep, value = token.partition('=')
+        key = KEYS.get(name.lower())
+        if not sep or key is None or not value:
+            raise ValueError(f"Не понял фильтр «{token}»")
+
+        if key == 'type':
+            institution_type = INSTITUTION_TYPES.get(value.lower())
+            if institution_type is None:
+                raise ValueError(f"Неизвестный тип «{value}», есть: школа, колледж, вуз")
+            flt.institution_type = institution_type
+        elif key == 'days':
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError("дней= — целое число больше нуля")
+            flt.created_from = datetime.utcnow() - timedelta(days=int(value))
+        elif key == 'from':
+            flt.created_from = _parse_date(value)
+        elif key == 'to':
+            flt.created_before = _parse_date(value) + timedelta(days=1)
+        elif key == 'user':
+            if not value.isdigit():
+                raise ValueError("id= — числовой Telegram ID")
+            flt.telegram_id = int(value)
+        else:
+            flt.text = value
+    return flt
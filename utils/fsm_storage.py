@@ -0,0 +1,153 @@
+"""Постоянное хранилище FSM: анкета переживает перезапуск бота.
+
+KVStorage хранит состояние и данные формы в key-value хранилище с
+интерфейсом Redis (get / set(ex=...) / delete). По умолчанию это SQLiteKV —
+таблица в файле SQLite, которую могут делить несколько процессов бота на
+одной машине. Для нескольких машин подойдёт настоящий redis.asyncio.Redis
+(FSM_STORAGE=redis) — код хранилища при этом не меняется.
+
+Значения сериализуются компактным JSON, у каждого ключа есть TTL: брошенная
+на полпути анкета сама исчезает через FSM_TTL секунд.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Mapping, Optional, Protocol
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import FSM_STORAGE, FSM_DB_PATH, FSM_REDIS_URL, FSM_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class KVClient(Protocol):
+    """Минимальное подмножество команд Redis, нужное хранилищу"""
+
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    async def set(self, key: str, value: bytes, ex: Optional[int] = None) -> Any: ...
+
+    async def delete(self, *keys: str) -> Any: ...
+
+
+class SQLiteKV:
+    """Локальная замена Redis поверх таблицы SQLite с истечением ключей"""
+
+    PURGE_EVERY = 500  # Раз в сколько записей удалять просроченные ключи
+
+    def __init__(self, path: str):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fsm-sqlite')
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA busy_timeout = 5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm_kv ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        self._writes = 0
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args))
+
+    def _get(self, key: str) -> Optional[bytes]:
+        row = self._conn.execute(
+            "SELECT value FROM fsm_kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: bytes, ex: Optional[int]):
+        expires_at = time.time() + ex if ex else None
+        self._conn.execute(
+            "INSERT INTO fsm_kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value, expires_at),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._purge_expired()
+
+    def _delete(self, keys: tuple) -> int:
+        return self._conn.executemany("DELETE FROM fsm_kv WHERE key = ?", [(k,) for k in keys]).rowcount
+
+    def _purge_expired(self) -> int:
+        removed = self._conn.execute(
+            "DELETE FROM fsm_kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        ).rowcount
+        if removed:
+            logger.info("FSM storage: %s expired keys removed", removed)
+        return removed
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, value: bytes, ex: Optional[int] = None):
+        await self._run(self._set, key, value, ex)
+
+    async def delete(self, *keys: str) -> int:
+        return await self._run(self._delete, keys)
+
+    async def purge_expired(self) -> int:
+        return await self._run(self._purge_expired)
+
+    async def aclose(self):
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
+
+
+class KVStorage(BaseStorage):
+    """FSM-хранилище aiogram поверх любого клиента с интерфейсом KVClient"""
+
+    def __init__(self, client: KVClient, ttl: Optional[int] = FSM_TTL,
+                 key_builder: Optional[KeyBuilder] = None):
+        self.client = client
+        self.ttl = ttl or None
+        self.key_builder = key_builder or DefaultKeyBuilder(prefix='fsm')
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        redis_key = self.key_builder.build(key, 'state')
+        if state is None:
+            await self.client.delete(redis_key)
+            return
+        value = state.state if isinstance(state, State) else state
+        await self.client.set(redis_key, value.encode(), ex=self.ttl)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        value = await self.client.get(self.key_builder.build(key, 'state'))
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        redis_key = self.key_builder.build(key, 'data')
+        if not data:
+            await self.client.delete(redis_key)
+            return
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+        await self.client.set(redis_key, payload, ex=self.ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self.client.get(self.key_builder.build(key, 'data'))
+        return json.loads(value) if value else {}
+
+    async def close(self) -> None:
+        if hasattr(self.client, 'aclose'):
+            await self.client.aclose()
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Хранилище FSM по настройке FSM_STORAGE: sqlite (по умолчанию), redis или memory"""
+    if FSM_STORAGE == 'memory':
+        return MemoryStorage()
+    if FSM_STORAGE == 'redis':
+        from redis.asyncio import Redis  # Необязательная зависимость, только для этого режима
+
+        logger.info("FSM storage: redis")
+        return KVStorage(Redis.from_url(FSM_REDIS_URL))
+    logger.info("FSM storage: sqlite (%s)", FSM_DB_PATH)
+    return KVStorage(SQLiteKV(FSM_DB_PATH))
@@ -0,0 +1,51 @@
+"""Геометрия для поиска учреждений по координатам.
+
+Поиск идёт в два шага: R*Tree-индекс user_data_geo (database/migrations.py)
+отбирает точки внутри прямоугольника вокруг центра, а точное расстояние
+по формуле гаверсинусов считается только для этих кандидатов.
+"""
+import math
+
+EARTH_RADIUS_M = 6_371_000
+METERS_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_M / 180
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние между двумя точками в метрах"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def lat_delta(radius_m: float) -> float:
+    """Полуширина прямоугольника по широте, градусы"""
+    return radius_m / METERS_PER_DEGREE_LAT
+
+
+def lon_delta(radius_m: float, lat: float) -> float:
+    """Полуширина прямоугольника по долготе на широте lat, градусы"""
+    cos_lat = math.cos(math.radians(min(abs(lat), 89.9)))
+    return min(180.0, radius_m / (METERS_PER_DEGREE_LAT * cos_lat))
+
+
+def bounding_box(lat: float, lon: float, radius_m: float) -> tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) — прямоугольник, содержащий круг радиуса radius_m"""
+    dlat = lat_delta(radius_m)
+    dlon = lon_delta(radius_m, abs(lat) + dlat)
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def parse_coordinates(text: str) -> tuple[float, float] | None:
+    """'41.31, 69.24' или '41.31 69.24' -> (41.31, 69.24); None, если это не координаты"""
+    parts = text.replace(',', ' ').split()
+    if len(parts) != 2:
+        return None
+    try:
+        lat, lon = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
@@ -0,0 +1,113 @@
+"""Неблокирующее структурированное логирование.
+
+Обработчики и exporter только кладут LogRecord в очередь (QueueHandler), а
+форматирование и запись в stderr выполняет отдельный поток QueueListener —
+event loop не ждёт ввода-вывода. Сообщения пишутся как
+logger.info("текст %s", arg): при выключенном уровне (или отброшенной
+сэмплингом записи) строка вообще не собирается. Текст сообщения
+подставляется в вызывающем потоке — в лог попадают значения на момент
+вызова, даже если объект потом изменится, — а JSON, трейсбеки и запись
+выполняет поток слушателя.
+
+Формат вывода — JSON по строке на запись (LOG_FORMAT=text — обычный текст для
+разработки). Уровни задаются в config.py: общий LOG_LEVEL и LOG_LEVELS по
+модулям. Шумные построчные сообщения помечаются extra={'sample': True} и
+проходят только раз в LOG_SAMPLE_EVERY повторов одного шаблона.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+from config import LOG_FORMAT, LOG_LEVEL, LOG_LEVELS, LOG_SAMPLE_EVERY
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# Стандартные атрибуты LogRecord; всё остальное — поля из extra
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'sample'}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Из записей с extra={'sample': True} пропускает первую и затем каждую N-ю по шаблону"""
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = every
+        self._seen: dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every <= 1 or not getattr(record, 'sample', False):
+            return True
+        key = (record.name, record.msg)
+        seen = self._seen.get(key, 0)
+        self._seen[key] = seen + 1
+        if seen % self.every:
+            return False
+        record.sampled_1_in = self.every
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который в вызывающем потоке только подставляет аргументы.
+
+    Стандартный prepare() форматирует запись целиком (вместе с трейсбеком) до
+    постановки в очередь. Здесь msg % args собирается сразу — аргументы могут
+    измениться, пока запись ждёт в очереди, — а exc_info остаётся в записи и
+    форматируется уже в потоке слушателя (внутри процесса это безопасно).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record = copy.copy(record)
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def setup_logging():
+    """Настроить корневой логгер: очередь + поток записи. Повторный вызов ничего не делает"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+    for name, level in LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Дописать хвост очереди при выходе процесса
+    atexit.register(_listener.stop)
@@ -0,0 +1,318 @@
+"""Метрики бота в формате Prometheus.
+
+Небольшой реестр счётчиков и гистограмм без внешних зависимостей: значения
+копятся в памяти процесса и отдаются текстом на GET /metrics. В webhook-режиме
+эндпоинт живёт на том же aiohttp-сервере, в polling-режиме поднимается
+отдельный маленький сервер на METRICS_PORT.
+
+Что меряется:
+- апдейты (тип, обработан ли) и время обработки каждого хендлера;
+- переходы состояний анкеты (FSM);
+- время SQL-запросов и вызовов функций БД из потока-исполнителя,
+  ожидание в очереди к этому потоку и размер пачек записи;
+- длительность и размер отчётов, время скачивания и обработки фото.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable
+
+from aiogram import BaseMiddleware, Dispatcher, Router
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType
+from aiogram.types import TelegramObject, Update
+from aiohttp import web
+
+from config import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм времени, секунды
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+# Границы корзин размеров файлов, байты
+SIZE_BUCKETS = (10_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 20_000_000, 50_000_000, 100_000_000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Metric:
+    """Базовая метрика с метками. Обновления потокобезопасны (БД пишет из своего потока)"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _labels(self, key: tuple, **extra: Any) -> Dict[str, str]:
+        labels = dict(zip(self.labelnames, key))
+        labels.update(extra)
+        return labels
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key: tuple, value: Any) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _render_value(self, key: tuple, value: float) -> list[str]:
+        return [f"{self.name}{_format_labels(self._labels(key))} {value}"]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, amount: float, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [счётчики корзин..., +Inf], сумма
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            state[1] += amount
+
+    @contextmanager
+    def time(self, **labels: Any):
+        """Замерить время блока в секундах"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: Any) -> int:
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def total(self, **labels: Any) -> float:
+        state = self._values.get(self._key(labels))
+        return state[1] if state else 0.0
+
+    def quantile(self, q: float, **labels: Any) -> float:
+        """Оценка квантиля по корзинам с интерполяцией внутри корзины (как histogram_quantile)"""
+        state = self._values.get(self._key(labels))
+        if not state or not sum(state[0]):
+            return 0.0
+        counts = state[0]
+        rank = q * sum(counts)
+        cumulative, lower = 0, 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        # Квантиль попал в +Inf — известна только нижняя граница
+        return lower
+
+    def _render_value(self, key: tuple, value: list) -> list[str]:
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(self._labels(key, le=le))} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self._labels(key))} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self._labels(key))} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+UPDATES = registry.counter(
+    'bot_updates_total', 'Received updates', ('event_type', 'handled'))
+UPDATE_SECONDS = registry.histogram(
+    'bot_update_seconds', 'Full update processing time including middlewares', ('event_type',))
+HANDLER_SECONDS = registry.histogram(
+    'bot_handler_seconds', 'Handler execution time', ('handler',))
+HANDLER_ERRORS = registry.counter(
+    'bot_handler_errors_total', 'Handlers that raised an exception', ('handler',))
+FSM_TRANSITIONS = registry.counter(
+    'bot_fsm_transitions_total', 'Form state transitions', ('from_state', 'to_state'))
+DB_QUERY_SECONDS = registry.histogram(
+    'bot_db_query_seconds', 'SQL statement execution time', ('statement',))
+DB_CALL_SECONDS = registry.histogram(
+    'bot_db_call_seconds', 'Database function time in the DB executor thread', ('func',))
+DB_QUEUE_SECONDS = registry.histogram(
+    'bot_db_queue_seconds', 'Time a database call waited for the DB executor thread',
+    buckets=(0.0001, 0.0005) + LATENCY_BUCKETS)
+DB_WRITE_BATCH = registry.histogram(
+    'bot_db_write_batch_size', 'Submissions saved per write transaction', buckets=(1, 2, 5, 10, 20, 50, 100))
+EXPORT_SECONDS = registry.histogram(
+    'bot_export_seconds', 'Report build time', ('kind', 'scope'))
+EXPORT_BYTES = registry.histogram(
+    'bot_export_bytes', 'Report file size', ('kind', 'scope'), buckets=SIZE_BUCKETS)
+PHOTO_DOWNLOAD_SECONDS = registry.histogram(
+    'bot_photo_download_seconds', 'Photo download time from Telegram')
+PHOTO_STORE_SECONDS = registry.histogram(
+    'bot_photo_store_seconds', 'Photo hashing, dedup and resize time')
+PHOTO_BYTES = registry.histogram(
+    'bot_photo_bytes', 'Stored photo size', buckets=SIZE_BUCKETS)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware диспетчера: поток апдейтов и полное время обработки"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> Any:
+        event_type = event.event_type
+        started = time.perf_counter()
+        result = UNHANDLED
+        try:
+            result = await handler(event, data)
+            return result
+        finally:
+            UPDATE_SECONDS.observe(time.perf_counter() - started, event_type=event_type)
+            UPDATES.inc(event_type=event_type, handled=result is not UNHANDLED)
+
+
+_UNCHANGED = object()
+
+
+class RecordingFSMContext(FSMContext):
+    """FSMContext, который запоминает последний set_state хендлера.
+
+    Переход виден без лишнего чтения из хранилища (SQLite/Redis) после
+    каждого апдейта: старое состояние — raw_state, новое — записанное здесь.
+    """
+
+    def __init__(self, context: FSMContext):
+        super().__init__(storage=context.storage, key=context.key)
+        self.new_state = _UNCHANGED
+
+    async def set_state(self, state: StateType = None) -> None:
+        await super().set_state(state)
+        self.new_state = state.state if isinstance(state, State) else state
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware роутера: время конкретного хендлера и переходы FSM"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        handler_object = data.get('handler')
+        name = handler_object.callback.__name__ if handler_object else 'unknown'
+        state = data.get('state')
+        if state is not None:
+            data['state'] = state = RecordingFSMContext(state)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+            if state is not None and state.new_state is not _UNCHANGED:
+                before = data.get('raw_state')
+                if state.new_state != before:
+                    FSM_TRANSITIONS.inc(from_state=before or 'none', to_state=state.new_state or 'none')
+
+
+def setup_metrics(dp: Dispatcher, routers: Iterable[Router]):
+    """Подключить middleware метрик к диспетчеру и роутерам с хендлерами"""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_metrics = HandlerMetricsMiddleware()
+    for router in routers:
+        router.message.middleware(handler_metrics)
+        router.callback_query.middleware(handler_metrics)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(body=registry.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+
+class MetricsServer:
+    """Отдельный HTTP-сервер /metrics для polling-режима"""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    async def start(self):
+        if not self.port:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', metrics_handler)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Metrics available at http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer()
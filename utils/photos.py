@@ -0,0 +1,138 @@
+"""Приём фото от пользователей.
+
+Фото скачивается потоком во временный файл (aiogram пишет чанки через
+aiofiles), а хеширование, дедупликация и уменьшение выполняются в потоке,
+вне event loop. Загрузки идут через ограниченную очередь с несколькими
+воркерами, так что всплеск фото не создаёт сотни параллельных скачиваний.
+
+Файлы хранятся по хешу содержимого: одинаковые загрузки занимают место
+один раз, а рядом с photo_path в БД сохраняются хеш, размеры и объём файла.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+
+from aiogram import Bot
+from aiogram.types import PhotoSize
+from PIL import Image, ImageOps
+
+from config import PHOTOS_DIR, PHOTO_MAX_SIDE, PHOTO_JPEG_QUALITY, PHOTO_WORKERS, PHOTO_QUEUE_SIZE
+from utils import thumbnails
+from utils.metrics import PHOTO_DOWNLOAD_SECONDS, PHOTO_STORE_SECONDS, PHOTO_BYTES
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK = 1024 * 1024
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_photo(tmp_path: str) -> dict:
+    """Положить скачанный файл в хранилище и вернуть метаданные для записи.
+
+    Выполняется в потоке: хеш, дедупликация, при необходимости уменьшение
+    до PHOTO_MAX_SIDE по длинной стороне и пересжатие в JPEG.
+    """
+    digest = _file_sha256(tmp_path)
+    final_path = os.path.join(PHOTOS_DIR, f"{digest[:32]}.jpg")
+
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        logger.info("Duplicate photo upload, reusing %s", final_path)
+    else:
+        with Image.open(tmp_path) as img:
+            needs_resize = PHOTO_MAX_SIDE and max(img.size) > PHOTO_MAX_SIDE
+            if needs_resize or img.format != 'JPEG':
+                img = ImageOps.exif_transpose(img)
+                if needs_resize:
+                    img.thumbnail((PHOTO_MAX_SIDE, PHOTO_MAX_SIDE), Image.Resampling.LANCZOS)
+                part_path = f"{final_path}.{uuid.uuid4().hex}.part"
+                img.convert('RGB').save(part_path, "JPEG", quality=PHOTO_JPEG_QUALITY, optimize=True)
+                os.replace(part_path, final_path)
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, final_path)
+
+    with Image.open(final_path) as img:
+        width, height = img.size
+    # Миниатюры для экспорта готовим сразу, пока файл горячий в кэше ОС
+    thumbnails.warm(final_path)
+
+    return {
+        'photo_path': final_path,
+        'photo_hash': digest,
+        'photo_width': width,
+        'photo_height': height,
+        'photo_bytes': os.path.getsize(final_path),
+    }
+
+
+class PhotoIngestor:
+    """Ограниченная очередь загрузки фото с пулом воркеров"""
+
+    def __init__(self, workers: int = PHOTO_WORKERS, queue_size: int = PHOTO_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def _ensure_started(self):
+        if not self._tasks:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def ingest(self, bot: Bot, photo: PhotoSize) -> dict:
+        """Скачать и сохранить фото, вернуть метаданные (photo_path, photo_hash, ...)"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        # При заполненной очереди обработчик подождёт здесь — это и есть ограничение нагрузки
+        await self._queue.put((bot, photo, future))
+        return await future
+
+    async def _worker(self):
+        while True:
+            bot, photo, future = await self._queue.get()
+            try:
+                result = await self._process(bot, photo)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, bot: Bot, photo: PhotoSize) -> dict:
+        tmp_path = os.path.join(PHOTOS_DIR, f".incoming_{uuid.uuid4().hex}.part")
+        try:
+            started = time.perf_counter()
+            file_info = await bot.get_file(photo.file_id)
+            await bot.download_file(file_info.file_path, tmp_path)
+            downloaded = time.perf_counter()
+            PHOTO_DOWNLOAD_SECONDS.observe(downloaded - started)
+
+            meta = await asyncio.to_thread(store_photo, tmp_path)
+            PHOTO_STORE_SECONDS.observe(time.perf_counter() - downloaded)
+            PHOTO_BYTES.observe(meta['photo_bytes'])
+            return meta
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+
+photo_ingestor = PhotoIngestor()
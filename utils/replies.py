@@ -0,0 +1,74 @@
+"""Сборка ответа обработчика в минимальное число сообщений.
+
+Обработчик получает аргумент reply (ReplyComposer) и складывает в него
+строки ответа через reply.add(); после выхода из обработчика middleware
+отправляет их одним сообщением. Клавиатура у сообщения может быть только
+одна, поэтому части с клавиатурой закрывают текущее сообщение: «текст» +
+«текст с меню» уходят одним запросом, а два разных меню — двумя.
+
+Для долгих операций вместо новых сообщений редактируется одно статусное
+(см. run_report в handlers/admin.py и utils/reports.py).
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Router
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4096  # Максимальная длина текста сообщения в Telegram
+SEPARATOR = '\n\n'
+
+
+class ReplyComposer:
+    def __init__(self, message: Message):
+        self.message = message
+        self._parts: list[tuple[str, Any]] = []
+
+    def add(self, text: str, reply_markup: Any = None):
+        """Добавить часть ответа; reply_markup закрывает текущее сообщение"""
+        self._parts.append((text, reply_markup))
+
+    def _messages(self) -> list[tuple[str, Any]]:
+        messages, texts = [], []
+        for text, markup in self._parts:
+            if texts and len(SEPARATOR.join(texts + [text])) > MESSAGE_LIMIT:
+                messages.append((SEPARATOR.join(texts), None))
+                texts = []
+            texts.append(text)
+            if markup is not None:
+                messages.append((SEPARATOR.join(texts), markup))
+                texts = []
+        if texts:
+            messages.append((SEPARATOR.join(texts), None))
+        return messages
+
+    async def flush(self) -> Message | None:
+        """Отправить накопленное; вернуть последнее отправленное сообщение"""
+        sent = None
+        for text, markup in self._messages():
+            sent = await self.message.answer(text, reply_markup=markup)
+        self._parts.clear()
+        return sent
+
+
+class ReplyMiddleware(BaseMiddleware):
+    """Внутренний middleware: передаёт обработчику reply и отправляет его после выхода"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        message = event.message if isinstance(event, CallbackQuery) else event
+        if not isinstance(message, Message):
+            return await handler(event, data)
+        reply = data['reply'] = ReplyComposer(message)
+        result = await handler(event, data)
+        await reply.flush()
+        return result
+
+
+def setup_replies(*routers: Router):
+    middleware = ReplyMiddleware()
+    for router in routers:
+        router.message.middleware(middleware)
+        router.callback_query.middleware(middleware)
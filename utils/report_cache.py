@@ -0,0 +1,140 @@
+"""Кэш базового полного отчёта для инкрементальной сборки.
+
+Полный отчёт каждого формата хранится в REPORTS_CACHE_DIR вместе с
+метаданными (до какого id он собран и сколько в нём записей). Если новых
+записей нет, отдаётся копия кэша. Word-отчёт при появлении новых записей
+дописывается, а Excel собирается заново потоковым writer'ом: дописывание
+требует load_workbook() всей книги с картинками, и память растёт с
+размером таблицы — это дороже свежей потоковой сборки. Собирает эти
+файлы только процесс-воркер отчётов, и для каждого формата одновременно
+идёт не больше одной сборки.
+
+Word-отчёт может состоять из нескольких томов (WordVolumes в
+utils/exporter.py): новые записи дописываются в последний том, число
+томов хранится в метаданных.
+"""
+import json
+import logging
+import os
+import shutil
+
+from config import REPORTS_CACHE_DIR
+from database.db import count_data
+from utils.exporter import (
+    export_to_excel, export_to_word, append_to_word, report_file_path
+)
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'excel': 'xlsx', 'word': 'docx'}
+PREFIXES = {'excel': 'data', 'word': 'data_word'}
+# Форматы, в которые новые записи дописываются, а не собираются заново
+APPENDABLE = {'word'}
+
+
+def _base_path(kind: str, volume: int = 1) -> str:
+    suffix = '' if volume == 1 else f"_part{volume}"
+    return os.path.join(REPORTS_CACHE_DIR, f"{kind}_base{suffix}.{EXTENSIONS[kind]}")
+
+
+def _meta_path(kind: str) -> str:
+    return os.path.join(REPORTS_CACHE_DIR, f"{kind}_base.json")
+
+
+def _load_meta(kind: str) -> dict | None:
+    try:
+        with open(_meta_path(kind), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    volumes = meta.setdefault('volumes', 1)
+    if not all(os.path.exists(_base_path(kind, volume)) for volume in range(1, volumes + 1)):
+        return None
+    return meta
+
+
+def _save_meta(kind: str, meta: dict):
+    tmp = f"{_meta_path(kind)}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, _meta_path(kind))
+
+
+def cached_last_id(kind: str, until_id: int) -> int | None:
+    """До какого id собран кэшированный отчёт (None — кэша нет или он не годится).
+
+    Для формата без дописывания кэш годится, только если он собран ровно до until_id.
+    """
+    meta = _load_meta(kind)
+    if meta is None or meta['last_id'] > until_id:
+        return None
+    if kind not in APPENDABLE and meta['last_id'] != until_id:
+        return None
+    return meta['last_id']
+
+
+def invalidate():
+    """Забыть базовые отчёты: следующий полный экспорт соберётся с нуля.
+
+    Нужно, когда в user_data появились записи с id меньше уже собранных
+    (например, после загрузки выгрузки с исходными id).
+    """
+    for kind in EXTENSIONS:
+        try:
+            os.remove(_meta_path(kind))
+        except FileNotFoundError:
+            pass
+    logger.info("Cached base reports invalidated")
+
+
+def _store_volumes(kind: str, paths: list[str], first_volume: int = 1):
+    """Переместить собранные тома в кэш начиная с номера first_volume"""
+    for volume, path in enumerate(paths, first_volume):
+        os.replace(path, _base_path(kind, volume))
+    # Лишние тома от прошлой, более длинной сборки больше не нужны
+    volume = first_volume + len(paths)
+    while os.path.exists(_base_path(kind, volume)):
+        os.remove(_base_path(kind, volume))
+        volume += 1
+
+
+def build_full_report(kind: str, until_id: int, progress=None) -> list[str] | None:
+    """Полный отчёт по записям с id <= until_id: дописать кэш или собрать заново.
+
+    Возвращает пути к копиям файлов отчёта (Word — по одному на том),
+    которые можно отправить и удалить.
+    """
+    os.makedirs(REPORTS_CACHE_DIR, exist_ok=True)
+    meta = _load_meta(kind)
+    last_id = cached_last_id(kind, until_id)
+
+    if last_id is not None and last_id == until_id:
+        logger.info("Cached %s report is up to date (id <= %s)", kind, until_id)
+    elif last_id is not None:
+        volumes = meta['volumes']
+        base = _base_path(kind, volumes)
+        tmp = f"{_base_path(kind)}.tmp.{EXTENSIONS[kind]}"
+        added, paths = append_to_word(base, tmp, meta['count'], progress, after_id=last_id, until_id=until_id)
+        _store_volumes(kind, paths, first_volume=volumes)
+        meta = {'last_id': until_id, 'count': meta['count'] + added, 'volumes': volumes + len(paths) - 1}
+        _save_meta(kind, meta)
+    else:
+        builder = export_to_excel if kind == 'excel' else export_to_word
+        paths = builder(progress, until_id=until_id)
+        if not paths:
+            return None
+        if isinstance(paths, str):
+            paths = [paths]
+        _store_volumes(kind, paths)
+        meta = {'last_id': until_id, 'count': count_data(until_id=until_id), 'volumes': len(paths)}
+        _save_meta(kind, meta)
+        logger.info("Cached %s report rebuilt from scratch (%s records, %s files)", kind, meta['count'], len(paths))
+
+    file_path = report_file_path(PREFIXES[kind], EXTENSIONS[kind])
+    root, ext = os.path.splitext(file_path)
+    file_paths = []
+    for volume in range(1, meta['volumes'] + 1):
+        copy_path = file_path if volume == 1 else f"{root}_part{volume}{ext}"
+        shutil.copyfile(_base_path(kind, volume), copy_path)
+        file_paths.append(copy_path)
+    return file_paths
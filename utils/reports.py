@@ -0,0 +1,269 @@
+"""Фоновая сборка отчётов в отдельном процессе.
+
+Excel/Word собираются в ProcessPoolExecutor, поэтому PIL и python-docx
+не блокируют event loop бота. Процесс-воркер пишет прогресс в общий словарь
+(multiprocessing.Manager), а бот раз в несколько секунд редактирует
+сообщение со статусом. Одинаковые запросы склеиваются: пока отчёт
+собирается, новые желающие просто подписываются на тот же результат.
+
+Готовые документы (Word-отчёт бывает из нескольких томов) загружаются в Telegram один раз: остальным подписчикам и
+повторным запросам того же отчёта (если новых записей не появилось)
+отправляется уже известный file_id.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import FSInputFile, Message
+
+from database.db import DataFilter
+from utils.metrics import EXPORT_SECONDS, EXPORT_BYTES
+
+logger = logging.getLogger(__name__)
+
+REPORT_TITLES = {
+    'excel': 'Отчёт СЭС',
+    'word': 'Отчёт СЭС (Word)',
+}
+
+PROGRESS_INTERVAL = 3  # секунд между редактированиями сообщения со статусом
+PROGRESS_EVERY = 50    # как часто воркер отмечает прогресс (в строках)
+
+
+class ReportCancelled(Exception):
+    """Сборка отчёта отменена администратором"""
+
+
+def _init_worker():
+    from utils.logging_setup import setup_logging
+
+    setup_logging()
+
+
+def _build_report(kind: str, key: str, state, after_id: int = None,
+                  flt: DataFilter = None) -> tuple[list[str], int, int]:
+    """Точка входа в процессе-воркере.
+
+    after_id=None без фильтра — полный отчёт (через кэш базовых отчётов
+    utils/report_cache.py), иначе — только записи новее after_id и/или под фильтром flt.
+    Возвращает (пути файлов, записей в отчёте, until_id).
+    """
+    from database.db import count_data, max_data_id
+    from utils.exporter import export_to_excel, export_to_word
+    from utils import report_cache
+
+    until_id = max_data_id()
+    cached = after_id is None and not flt
+    pending_after = report_cache.cached_last_id(kind, until_id) if cached else after_id
+    state[f'{key}:total'] = count_data(after_id=pending_after, until_id=until_id, flt=flt)
+    last_mark = 0
+
+    def progress(done: int):
+        nonlocal last_mark
+        if done - last_mark < PROGRESS_EVERY:
+            return
+        last_mark = done
+        state[f'{key}:done'] = done
+        if state.get(f'{key}:cancel'):
+            raise ReportCancelled(key)
+
+    if cached:
+        files = report_cache.build_full_report(kind, until_id, progress)
+    else:
+        builders = {'excel': export_to_excel, 'word': export_to_word}
+        files = builders[kind](progress, after_id=after_id, until_id=until_id, flt=flt)
+    if isinstance(files, str):
+        files = [files]
+    return files or [], count_data(after_id=after_id, until_id=until_id, flt=flt), until_id
+
+
+class ReportJob:
+    def __init__(self, key: str, kind: str, after_id: int = None, flt: DataFilter = None):
+        self.key = key
+        self.kind = kind
+        self.after_id = after_id
+        self.flt = flt
+        self.subscribers: list[Message] = []
+        self.future: asyncio.Future | None = None
+        self.cancelled = False
+
+
+class ReportJobs:
+    """Очередь фоновых отчётов: не больше одной сборки на каждый вид отчёта"""
+
+    def __init__(self, max_workers: int = 1):
+        self.max_workers = max_workers
+        self._pool: ProcessPoolExecutor | None = None
+        self._manager = None
+        self._state = None
+        self._jobs: dict[str, ReportJob] = {}
+        # key -> (until_id, [file_id], total): последние отправленные документы каждого отчёта
+        self._documents: dict[str, tuple[int, list[str], int]] = {}
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            # spawn: не форкаем процесс, в котором уже крутятся потоки и event loop
+            ctx = multiprocessing.get_context('spawn')
+            self._manager = ctx.Manager()
+            self._state = self._manager.dict()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=ctx, initializer=_init_worker
+            )
+
+    @staticmethod
+    def job_key(kind: str, after_id: int = None, flt: DataFilter = None) -> str:
+        key = kind if after_id is None else f"{kind}:new:{after_id}"
+        return f"{key}:f:{flt.key()}" if flt else key
+
+    def is_running(self, key: str) -> bool:
+        return key in self._jobs
+
+    @staticmethod
+    def title(kind: str, after_id: int = None, flt: DataFilter = None) -> str:
+        title = REPORT_TITLES[kind]
+        if after_id is not None:
+            title = f"{title}, новые записи"
+        return f"{title} ({flt.describe()})" if flt else title
+
+    async def submit(self, kind: str, status: Message, after_id: int = None,
+                     current_max_id: int = None, flt: DataFilter = None) -> tuple[list[str], int, int]:
+        """Запросить отчёт. status — сообщение, в котором показывается прогресс.
+
+        after_id — выгрузить только записи новее этого id, flt — только под фильтром.
+        current_max_id — текущий max(id); если отчёт с тех пор не менялся,
+        сохранённые документы отправляются по file_id без сборки.
+        Если такой отчёт уже собирается, сообщение подписывается на текущую сборку.
+        Возвращает (документы — пустой список, если данных нет; записей в отчёте;
+        id последней попавшей записи).
+        """
+        key = self.job_key(kind, after_id, flt)
+        cached = self._documents.get(key)
+        if cached and current_max_id is not None and cached[0] == current_max_id:
+            until_id, file_ids, total = cached
+            title = self.title(kind, after_id, flt)
+            for number, file_id in enumerate(file_ids, 1):
+                await status.answer_document(file_id, caption=self._caption(title, total, number, len(file_ids)))
+            logger.info("Report %s is unchanged, resent by file_id", key)
+            return file_ids, total, until_id
+
+        job = self._jobs.get(key)
+        if job is None:
+            self._ensure_pool()
+            job = ReportJob(key=key, kind=kind, after_id=after_id, flt=flt)
+            job.subscribers.append(status)
+            self._jobs[key] = job
+            job.future = asyncio.ensure_future(self._run(job))
+        else:
+            logger.info("Report %s already in progress, subscribing", key)
+            job.subscribers.append(status)
+        return await asyncio.shield(job.future)
+
+    def cancel(self, key: str) -> bool:
+        job = self._jobs.get(key)
+        if job is None:
+            return False
+        job.cancelled = True
+        self._state[f'{job.key}:cancel'] = True
+        return True
+
+    async def _run(self, job: ReportJob) -> tuple[list[str], int, int]:
+        loop = asyncio.get_running_loop()
+        for suffix in ('done', 'total', 'cancel'):
+            self._state.pop(f'{job.key}:{suffix}', None)
+
+        started = time.monotonic()
+        work = loop.run_in_executor(
+            self._pool, _build_report, job.kind, job.key, self._state, job.after_id, job.flt
+        )
+        progress_task = asyncio.create_task(self._report_progress(job))
+        try:
+            files, total, until_id = await work
+            if job.cancelled:
+                raise ReportCancelled(job.key)
+            elapsed = time.monotonic() - started
+            scope = 'full' if job.after_id is None else 'new'
+            if job.flt:
+                scope = 'filtered'
+            EXPORT_SECONDS.observe(elapsed, kind=job.kind, scope=scope)
+            for file_path in files:
+                if os.path.exists(file_path):
+                    EXPORT_BYTES.observe(os.path.getsize(file_path), kind=job.kind, scope=scope)
+            logger.info("Report %s built in %.1fs (%s files)", job.key, elapsed, len(files))
+            await self._deliver(job, files, total, until_id)
+            return files, total, until_id
+        finally:
+            progress_task.cancel()
+            self._jobs.pop(job.key, None)
+
+    async def _report_progress(self, job: ReportJob):
+        last_text = None
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            done = self._state.get(f'{job.key}:done', 0)
+            total = self._state.get(f'{job.key}:total')
+            if not total:
+                continue
+            text = f"⏳ {self.title(job.kind, job.after_id, job.flt)}: строка {done}/{total}"
+            if text == last_text:
+                continue
+            last_text = text
+            for status in list(job.subscribers):
+                try:
+                    await status.edit_text(text, reply_markup=status.reply_markup)
+                except TelegramAPIError as e:
+                    logger.debug("Progress edit skipped: %s", e)
+
+    @staticmethod
+    def _caption(title: str, total: int, number: int, count: int) -> str:
+        caption = f"✅ **{title}** | {total} учреждений"
+        return caption if count == 1 else f"{caption} | часть {number}/{count}"
+
+    async def _deliver(self, job: ReportJob, files: list[str], total: int, until_id: int):
+        """Отправить готовые файлы всем подписчикам и удалить их.
+
+        Каждый файл загружается один раз, остальным уходит полученный file_id.
+        """
+        if not files:
+            return
+        missing = [file_path for file_path in files if not os.path.exists(file_path)]
+        if missing:
+            for file_path in set(files) - set(missing):
+                os.remove(file_path)
+            raise FileNotFoundError(f"Report files disappeared before upload: {', '.join(missing)}")
+        title = self.title(job.kind, job.after_id, job.flt)
+        file_ids = []
+        try:
+            for number, file_path in enumerate(files, 1):
+                caption = self._caption(title, total, number, len(files))
+                document = FSInputFile(file_path)
+                for status in job.subscribers:
+                    sent = await status.answer_document(document, caption=caption)
+                    if isinstance(document, FSInputFile):
+                        document = sent.document.file_id
+                        file_ids.append(document)
+            self._documents[job.key] = (until_id, file_ids, total)
+        finally:
+            for file_path in files:
+                os.remove(file_path)
+            logger.info("Report files sent and removed: %s", ', '.join(files))
+
+    def invalidate(self):
+        """Забыть отправленные документы и базовые отчёты (данные изменились задним числом)"""
+        from utils import report_cache
+
+        self._documents.clear()
+        report_cache.invalidate()
+
+    async def shutdown(self):
+        for key in list(self._jobs):
+            self.cancel(key)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
+
+
+report_jobs = ReportJobs()
@@ -0,0 +1,23 @@
+"""Полнотекстовый поиск учреждений по названию, адресу и ориентиру.
+
+Индекс user_data_fts (FTS5, database/migrations.py) ведётся триггерами на
+user_data. Токенизатор unicode61 сам приводит и латиницу, и кириллицу к
+нижнему регистру, поэтому «ЛИЦЕЙ», «Лицей» и «лицей» находятся одинаково.
+"""
+import re
+
+MAX_TERMS = 8
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def match_query(text: str) -> str | None:
+    """'лиц юнусаб' -> '"лиц"* "юнусаб"*': все слова обязательны, каждое — как начало слова.
+
+    Из запроса берутся только буквы и цифры, поэтому синтаксис FTS5
+    (кавычки, NEAR, OR, двоеточия) от пользователя не проходит. None — искать нечего.
+    """
+    terms = _TERM_RE.findall(text or "")[:MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
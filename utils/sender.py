@@ -0,0 +1,121 @@
+"""Ограничение исходящих сообщений под лимиты Telegram.
+
+OutgoingRateLimiter подключается к сессии бота как request-middleware, поэтому
+через него проходит всё, что бот отправляет: ответы обработчиков, статусы
+отчётов и рассылка. Для каждого запроса с chat_id нужно получить токен из
+общего ведра (SEND_RATE в секунду на весь бот) и из ведра этого чата
+(CHAT_SEND_RATE в секунду с небольшим запасом CHAT_SEND_BURST).
+
+На TelegramRetryAfter отправка приостанавливается целиком: ведро
+обнуляется на retry_after секунд, затем запрос повторяется (до
+SEND_MAX_RETRIES раз). Сетевые ошибки здесь не повторяются — запрос мог
+дойти, и повтор продублировал бы сообщение.
+"""
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from config import SEND_RATE, CHAT_SEND_RATE, CHAT_SEND_BURST, SEND_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+CHAT_BUCKETS_MAX = 10_000  # Сколько вёдер чатов держать, прежде чем чистить простаивающие
+
+
+class TokenBucket:
+    """Асинхронное ведро токенов: rate токенов в секунду, запас до capacity.
+
+    Ожидающие обслуживаются по очереди (asyncio.Lock справедлив), поэтому
+    длинная рассылка не вытесняет ответы пользователям, а лишь делит с ними поток.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Не выдавать токены seconds секунд (после RetryAfter)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+        self._updated = self._paused_until
+
+    @property
+    def idle(self) -> bool:
+        """Ведро полное и никто не ждёт — его можно выбросить"""
+        now = time.monotonic()
+        return not self._lock.locked() and now >= self._paused_until and \
+            self._tokens + (now - self._updated) * self.rate >= self.capacity
+
+
+class OutgoingRateLimiter(BaseRequestMiddleware):
+    """Request-middleware сессии бота: общий и по-чатовый лимит, повтор при RetryAfter"""
+
+    def __init__(self, rate: float = SEND_RATE, chat_rate: float = CHAT_SEND_RATE,
+                 chat_burst: int = CHAT_SEND_BURST, max_retries: int = SEND_MAX_RETRIES):
+        self.bucket = TokenBucket(rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chats: dict[int | str, TokenBucket] = {}
+        self.retry_after_count = 0
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= CHAT_BUCKETS_MAX:
+                self._chats = {key: b for key, b in self._chats.items() if not b.idle}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType], bot: Bot,
+                       method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        chat_bucket = self._chat_bucket(chat_id)
+        attempt = 0
+        while True:
+            await chat_bucket.acquire()
+            await self.bucket.acquire()
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after_count += 1
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning("Flood control on %s to %s, pausing sends for %ss",
+                               type(method).__name__, chat_id, e.retry_after)
+                self.bucket.pause(e.retry_after)
+                chat_bucket.pause(e.retry_after)
+            attempt += 1
+
+
+rate_limiter = OutgoingRateLimiter()
@@ -0,0 +1,148 @@
+"""Постоянный кэш уменьшенных фото для экспорта.
+
+Миниатюра ищется по ключу (абсолютный путь, mtime, размер файла, ширина),
+поэтому изменённое фото автоматически получает новую миниатюру.
+Кэш ограничен по объёму: при переполнении удаляются давно не использованные
+файлы (LRU по mtime миниатюры, который обновляется при каждом обращении).
+
+Отчёты собираются в процессе-воркере, а бот прогревает кэш в своём процессе,
+поэтому закрепление миниатюр на время экспорта — разделяемая блокировка
+flock на файле PIN_LOCK, а вытеснение берёт её эксклюзивно и пропускается,
+пока хоть один процесс держит отчёт открытым.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+from PIL import Image
+
+from config import THUMBS_DIR, THUMBS_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+EXCEL_WIDTH = 300  # Миниатюра для ячейки Excel
+WORD_WIDTH = 600   # ~2.5 дюйма при печати, вместо оригинала в несколько мегабайт
+
+PIN_LOCK = os.path.join(THUMBS_DIR, '.pins.lock')
+
+_lock = threading.Lock()
+_cache_bytes = None  # Текущий объём кэша процесса, считается один раз при первом обращении
+
+
+def _thumb_path(photo_path: str, width: int) -> str:
+    st = os.stat(photo_path)
+    key = f"{os.path.abspath(photo_path)}:{st.st_mtime_ns}:{st.st_size}:{width}"
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(THUMBS_DIR, digest[:2], f"{digest}.jpg")
+
+
+def _scan_size() -> int:
+    total = 0
+    for root, _, files in os.walk(THUMBS_DIR):
+        for name in files:
+            if not name.startswith('.'):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def get_thumbnail(photo_path: str, width: int = EXCEL_WIDTH) -> str:
+    """Вернуть путь к миниатюре фото, создав её при первом обращении"""
+    global _cache_bytes
+    thumb = _thumb_path(photo_path, width)
+    if os.path.exists(thumb):
+        os.utime(thumb)  # Отмечаем использование для LRU
+        return thumb
+
+    img = Image.open(photo_path)
+    if img.width > width:
+        img = img.resize((width, int(img.height * width / img.width)), Image.Resampling.LANCZOS)
+
+    os.makedirs(os.path.dirname(thumb), exist_ok=True)
+    # Уникальное имя: одно и то же фото могут обрабатывать несколько потоков сразу
+    tmp = f"{thumb}.{uuid.uuid4().hex}.tmp"
+    img.convert('RGB').save(tmp, "JPEG", quality=85)
+    os.replace(tmp, thumb)  # Атомарно: читатели не увидят недописанный файл
+
+    with _lock:
+        if _cache_bytes is None:
+            _cache_bytes = _scan_size()
+        else:
+            _cache_bytes += os.path.getsize(thumb)
+    evict()
+    logger.debug("Thumbnail created: %s (%spx)", thumb, width, extra={'sample': True})
+    return thumb
+
+
+def warm(photo_path: str):
+    """Заранее подготовить миниатюры для всех экспортов"""
+    for width in (EXCEL_WIDTH, WORD_WIDTH):
+        get_thumbnail(photo_path, width)
+
+
+@contextmanager
+def _pin_lock(operation: int):
+    """flock на PIN_LOCK; отдаёт False, если неблокирующий захват не удался"""
+    os.makedirs(THUMBS_DIR, exist_ok=True)
+    with open(PIN_LOCK, 'a') as f:
+        try:
+            fcntl.flock(f, operation)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def evict():
+    """Удалить давно не использованные миниатюры, если кэш больше лимита"""
+    global _cache_bytes
+    with _lock:
+        if _cache_bytes is None or _cache_bytes <= THUMBS_MAX_BYTES:
+            return
+        with _pin_lock(fcntl.LOCK_EX | fcntl.LOCK_NB) as acquired:
+            if not acquired:
+                return  # Идёт экспорт (в этом или другом процессе) — вытесним после него
+            entries = []
+            for root, _, files in os.walk(THUMBS_DIR):
+                for name in files:
+                    if name.startswith('.'):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue  # Удалена другим процессом
+                    entries.append((st.st_mtime, st.st_size, path))
+            entries.sort()
+
+            total = sum(size for _, size, _ in entries)
+            # Чистим с запасом до 90% лимита, чтобы не сканировать папку на каждой записи
+            target = THUMBS_MAX_BYTES * 0.9
+            removed = 0
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError as e:
+                    logger.error("Не удалось удалить миниатюру %s: %s", path, e)
+            _cache_bytes = total
+    logger.info("Thumbnail cache evicted %s files, %s bytes left", removed, total)
+
+
+@contextmanager
+def pinned():
+    """Не вытеснять миниатюры, пока открытый отчёт на них ссылается (в любом процессе)"""
+    try:
+        with _pin_lock(fcntl.LOCK_SH):
+            yield
+    finally:
+        evict()
@@ -0,0 +1,101 @@
+"""Режим webhook: aiohttp-сервер вместо long polling.
+
+Telegram сам присылает апдейты на WEBHOOK_PATH, а обработчик сразу отвечает
+200 и обрабатывает апдейт в фоне. Одновременно выполняется не больше
+HANDLER_CONCURRENCY обработчиков; если в работе уже WEBHOOK_MAX_PENDING
+апдейтов, сервер отвечает 503 и Telegram повторит доставку позже.
+Там же отдаются /health и метрики Prometheus на /metrics.
+При остановке сервер перестаёт принимать запросы и ждёт завершения уже
+начатых обработчиков (до SHUTDOWN_DRAIN_TIMEOUT секунд).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import (
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_MAX_PENDING, HANDLER_CONCURRENCY, SHUTDOWN_DRAIN_TIMEOUT,
+)
+from utils.metrics import metrics_handler
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """Фоновая обработка апдейтов с ограничением параллельности"""
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, concurrency: int = HANDLER_CONCURRENCY,
+                 max_pending: int = WEBHOOK_MAX_PENDING, **kwargs: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.max_pending = max_pending
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        async with self._semaphore:
+            await super()._background_feed_update(bot, update)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.in_flight >= self.max_pending:
+            logger.warning("Webhook overloaded (%s updates in flight), asking to retry", self.in_flight,
+                           extra={'sample': True})
+            return web.Response(status=503, text="Overloaded")
+        return await super().handle(request)
+
+    async def drain(self, timeout: float = SHUTDOWN_DRAIN_TIMEOUT):
+        """Дождаться уже принятых апдейтов перед остановкой"""
+        pending = set(self._background_feed_update_tasks)
+        if not pending:
+            return
+        logger.info("Draining %s in-flight updates...", len(pending))
+        done, not_done = await asyncio.wait(pending, timeout=timeout)
+        if not_done:
+            logger.warning("%s updates did not finish in %ss, cancelling", len(not_done), timeout)
+            for task in not_done:
+                task.cancel()
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    app = web.Application()
+    handler = LimitedRequestHandler(dp, bot, secret_token=WEBHOOK_SECRET or None)
+    started = time.monotonic()
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({
+            'status': 'ok',
+            'in_flight': handler.in_flight,
+            'uptime': round(time.monotonic() - started, 1),
+        })
+
+    async def on_shutdown(app: web.Application):
+        await handler.drain()
+
+    # Порядок важен: сначала дожидаемся обработчиков, потом закрываем сессию бота и БД
+    app.on_shutdown.append(on_shutdown)
+    handler.register(app, path=WEBHOOK_PATH)
+    app.router.add_get('/health', health)
+    app.router.add_get('/metrics', metrics_handler)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def set_webhook(bot: Bot, dispatcher: Dispatcher):
+    """Зарегистрировать webhook в Telegram (startup-хук диспетчера)"""
+    if not WEBHOOK_BASE_URL:
+        logger.warning("WEBHOOK_BASE_URL is not set, webhook is not registered in Telegram")
+        return
+    await bot.set_webhook(
+        url=f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET or None,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+    )
+    logger.info("Webhook set to %s%s", WEBHOOK_BASE_URL, WEBHOOK_PATH)